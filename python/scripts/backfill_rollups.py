@@ -0,0 +1,42 @@
+from __future__ import annotations
+
+import argparse
+
+from rich.console import Console
+from rich.table import Table
+
+from warehouse import rollups
+from warehouse.config import load_config
+
+console = Console()
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(description="Create the events rollups and backfill them from existing rows.")
+    parser.add_argument(
+        "--rollup",
+        action="append",
+        choices=sorted(rollups.ROLLUPS),
+        help="Rollup to rebuild (repeatable; defaults to all).",
+    )
+    parser.add_argument(
+        "--skip-projections",
+        action="store_true",
+        help="Do not materialize the customer projection for existing parts.",
+    )
+    args = parser.parse_args()
+
+    cfg = load_config()
+    rollups.ensure_rollups(config=cfg)
+    written = rollups.backfill_rollups(args.rollup, projections=not args.skip_projections, config=cfg)
+
+    table = Table(title="Rollup backfill")
+    table.add_column("rollup")
+    table.add_column("rows written", justify="right")
+    for name, rows in written.items():
+        table.add_row(name, f"{rows:,}")
+    console.print(table)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,661 @@
+from __future__ import annotations
+
+import argparse
+import json
+import platform
+import resource
+import subprocess
+import tempfile
+import time
+import tracemalloc
+from concurrent.futures import ProcessPoolExecutor
+from contextlib import contextmanager
+from dataclasses import asdict, dataclass, field
+from datetime import date, datetime, timedelta, timezone
+from pathlib import Path
+from typing import Callable, Iterator, Sequence
+
+import numpy as np
+import pandas as pd
+from rich.console import Console
+from rich.table import Table
+
+from warehouse import crud_s3, crud_tabular, crud_vector
+from warehouse.clickhouse import client_session
+from warehouse.config import load_config
+from warehouse.datasets import VectorDataset, read_vector_dataset
+from warehouse.s3_utils import build_s3_client
+from warehouse.synthetic import VECTOR_CATEGORIES, synthetic_events, write_synthetic_vectors
+
+console = Console()
+
+SCALES = {"10k": 10_000, "100k": 100_000, "1m": 1_000_000, "10m": 10_000_000}
+BENCH_PROFILE = crud_vector.VectorIndexProfile(name="bench")
+WORDS = np.array(
+    "wireless compact durable organic smart portable premium classic lightweight modular ergonomic "
+    "waterproof rechargeable vintage handmade adjustable breathable insulated foldable stainless "
+    "headphones jacket kettle notebook backpack lamp speaker sneakers blender monitor keyboard tent "
+    "for with and the a of in designed built tuned everyday travel office outdoor kitchen studio".split()
+)
+
+
+@dataclass
+class ScenarioResult:
+    """Metrics from one scenario; ``rows`` share the same keys so they render as one table."""
+
+    scenario: str
+    title: str
+    rows: list[dict] = field(default_factory=list)
+
+    def table(self) -> Table:
+        table = Table(title=self.title)
+        columns = list(self.rows[0]) if self.rows else []
+        for column in columns:
+            table.add_column(column, justify="right")
+        for row in self.rows:
+            table.add_row(*(_format_value(row[column]) for column in columns))
+        return table
+
+
+def _format_value(value) -> str:
+    if isinstance(value, float):
+        return f"{value:,.3f}" if abs(value) < 10 else f"{value:,.1f}"
+    if isinstance(value, int):
+        return f"{value:,}"
+    return str(value)
+
+
+def synthetic_texts(count: int, *, seed: int = 3) -> list[str]:
+    rng = np.random.default_rng(seed)
+    lengths = rng.integers(8, 64, count)
+    words = WORDS[rng.integers(0, len(WORDS), int(lengths.sum()))]
+    bounds = np.concatenate([[0], np.cumsum(lengths)])
+    return [" ".join(words[start:stop]) for start, stop in zip(bounds[:-1], bounds[1:])]
+
+
+def _chunks(df: pd.DataFrame, size: int) -> Iterator[pd.DataFrame]:
+    for offset in range(0, len(df), size):
+        yield df.iloc[offset : offset + size]
+
+
+def _peak_rss_mb() -> float:
+    # ru_maxrss is reported in KiB on Linux.
+    return resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024
+
+
+def _latency_stats(samples: Sequence[float]) -> dict:
+    millis = np.asarray(samples) * 1000
+    return {
+        "p50_ms": float(np.percentile(millis, 50)),
+        "p95_ms": float(np.percentile(millis, 95)),
+        "p99_ms": float(np.percentile(millis, 99)),
+    }
+
+
+def _percentile_ms(samples: Sequence[float], q: float) -> float:
+    return float(np.percentile(np.asarray(samples) * 1000, q))
+
+
+def _load_events(cfg, rows: int, block_size: int, seed: int) -> None:
+    crud_tabular.ensure_table(config=cfg)
+    with client_session(cfg) as client:
+        client.execute(f"TRUNCATE TABLE IF EXISTS {crud_tabular.TABULAR_TABLE}")
+    for chunk in _chunks(synthetic_events(rows, seed=seed), block_size):
+        crud_tabular.insert_events(chunk, block_size=block_size, config=cfg)
+
+
+def _run_tabular_insert(mode: str, rows: int, block_size: int, seed: int) -> dict:
+    cfg = load_config()
+    df = synthetic_events(rows, seed=seed)
+    crud_tabular.ensure_table(config=cfg)
+    with client_session(cfg) as client:
+        client.execute(f"TRUNCATE TABLE IF EXISTS {crud_tabular.TABULAR_TABLE}")
+
+    baseline_rss = _peak_rss_mb()
+    tracemalloc.start()
+    started = time.perf_counter()
+    inserted = crud_tabular.insert_events(df, mode=mode, block_size=block_size, config=cfg)
+    elapsed = time.perf_counter() - started
+    _, traced_peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "rows": inserted,
+        "rows_per_sec": inserted / elapsed if elapsed else float("inf"),
+        "seconds": elapsed,
+        "traced_peak_mb": traced_peak / 2**20,
+        "rss_growth_mb": _peak_rss_mb() - baseline_rss,
+    }
+
+
+def tabular_insert(args: argparse.Namespace) -> ScenarioResult:
+    result = ScenarioResult("tabular-insert", f"Tabular insert ({args.rows:,} rows, block {args.block_size:,})")
+    for mode in crud_tabular.INSERT_MODES:
+        # Each mode runs in a fresh process so peak RSS is not inherited from the previous run.
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result.rows.append(pool.submit(_run_tabular_insert, mode, args.rows, args.block_size, args.seed).result())
+    return result
+
+
+def fetch_events_latency(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    _load_events(cfg, args.rows, args.block_size, args.seed)
+
+    result = ScenarioResult(
+        "fetch-events", f"fetch_events(limit={args.limit}) over {args.rows:,} events, {args.queries} calls"
+    )
+    for result_format in ("rows", "numpy", "pandas"):
+        latency = []
+        for _ in range(args.queries):
+            started = time.perf_counter()
+            crud_tabular.fetch_events(limit=args.limit, result_format=result_format, config=cfg)
+            latency.append(time.perf_counter() - started)
+        result.rows.append({"result_format": result_format, "calls": args.queries, **_latency_stats(latency)})
+    return result
+
+
+def s3_pruning(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    events = synthetic_events(args.rows, seed=args.seed)
+    flat_key = crud_s3.stage_sample_dataset(
+        file_format="parquet", chunks=_chunks(events, args.block_size), config=cfg
+    )
+    crud_s3.stage_partitioned_dataset(chunks=_chunks(events, args.block_size), config=cfg)
+
+    start_date = date(2025, 1, 1)
+    end_date = start_date + timedelta(days=args.days - 1)
+    params = {"start_date": start_date, "end_date": end_date}
+    flat_query = (
+        f"SELECT count() FROM {crud_s3.s3_table_function(flat_key, config=cfg)} "
+        "WHERE toDate(event_time) BETWEEN %(start_date)s AND %(end_date)s"
+    )
+    pruned_query, pruned_params = crud_s3.partitioned_events_query(
+        start_date=start_date, end_date=end_date, select="count()", config=cfg
+    )
+
+    result = ScenarioResult("s3-pruning", f"S3 scan for {args.days} day(s) out of {args.rows:,} events")
+    with client_session(cfg) as client:
+        for label, query, query_params in (
+            ("single object", flat_query, params),
+            ("hive partitioned", pruned_query, pruned_params),
+        ):
+            started = time.perf_counter()
+            [(matched,)] = client.execute(query, query_params)
+            elapsed = time.perf_counter() - started
+            progress = client.last_query.progress
+            result.rows.append(
+                {
+                    "layout": label,
+                    "matched_rows": matched,
+                    "rows_read": progress.rows,
+                    "bytes_read": progress.bytes,
+                    "seconds": elapsed,
+                }
+            )
+    return result
+
+
+def s3_throughput(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    events = synthetic_events(args.rows, seed=args.seed)
+    s3 = build_s3_client(cfg)
+
+    result = ScenarioResult("s3-throughput", f"S3 stage and scan ({args.rows:,} events)")
+    with client_session(cfg) as client:
+        for file_format in ("parquet", "csv"):
+            started = time.perf_counter()
+            key = crud_s3.stage_sample_dataset(
+                file_format=file_format, chunks=_chunks(events, args.block_size), config=cfg
+            )
+            stage_seconds = time.perf_counter() - started
+            object_bytes = s3.head_object(Bucket=cfg.s3.bucket, Key=key)["ContentLength"]
+
+            started = time.perf_counter()
+            client.execute(
+                f"SELECT count(), sum(amount) FROM {crud_s3.s3_table_function(key, file_format=file_format, config=cfg)}"
+            )
+            scan_seconds = time.perf_counter() - started
+            progress = client.last_query.progress
+            result.rows.append(
+                {
+                    "format": file_format,
+                    "object_mb": object_bytes / 2**20,
+                    "stage_rows_per_sec": args.rows / stage_seconds,
+                    "stage_mb_per_sec": object_bytes / 2**20 / stage_seconds,
+                    "scan_rows_per_sec": progress.rows / scan_seconds,
+                    "scan_mb_per_sec": progress.bytes / 2**20 / scan_seconds,
+                }
+            )
+    return result
+
+
+def _vector_dimension(cfg) -> int:
+    with client_session(cfg) as client:
+        rows = client.execute(f"SELECT length(embedding) FROM {crud_vector.VECTOR_TABLE} LIMIT 1")
+    if not rows:
+        raise SystemExit(f"{crud_vector.VECTOR_TABLE} is empty; run bootstrap_clickhouse.py first.")
+    return int(rows[0][0])
+
+
+def _random_queries(count: int, dimension: int, *, seed: int = 11) -> np.ndarray:
+    queries = np.random.default_rng(seed).standard_normal((count, dimension), dtype=np.float32)
+    return queries / np.linalg.norm(queries, axis=1, keepdims=True)
+
+
+def recall_at_k(approx_ids: Sequence[int], exact_ids: Sequence[int]) -> float:
+    if not exact_ids:
+        return 1.0
+    return len(set(approx_ids) & set(exact_ids)) / len(exact_ids)
+
+
+@contextmanager
+def _synthetic_vector_file(cfg, rows: int, dimension: int, seed: int) -> Iterator[VectorDataset]:
+    """Yield synthetic vectors memory-mapped from a scratch file under the data directory.
+
+    The matrix is written one chunk at a time, so large ``--rows`` never hold
+    (or copy) the whole matrix in memory.
+    """
+    cfg.paths.data_dir.mkdir(parents=True, exist_ok=True)
+    with tempfile.TemporaryDirectory(prefix="benchmark-", dir=cfg.paths.data_dir) as scratch:
+        path = Path(scratch) / "vectors.npy"
+        write_synthetic_vectors(path, rows, dimension, seed=seed)
+        yield read_vector_dataset(path)
+
+
+def _build_vector_table(cfg, args: argparse.Namespace, profile: crud_vector.VectorIndexProfile) -> None:
+    with _synthetic_vector_file(cfg, args.rows, args.dimension, args.seed) as records:
+        crud_vector.ensure_table(config=cfg, records=records, profile=profile, recreate=True)
+        crud_vector.load_sample_vectors(config=cfg, records=records, profile=profile)
+
+
+def _exact_ids(cfg, queries: np.ndarray, k: int, profile: crud_vector.VectorIndexProfile) -> list[list[int]]:
+    return [
+        [row[0] for row in crud_vector.similarity_search(v, limit=k, mode="exact", profile=profile, config=cfg)]
+        for v in queries
+    ]
+
+
+def vector_search(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    _build_vector_table(cfg, args, BENCH_PROFILE)
+    queries = _random_queries(args.queries, args.dimension, seed=args.seed)
+    exact = _exact_ids(cfg, queries, args.k, BENCH_PROFILE)
+
+    result = ScenarioResult(
+        "vector-search", f"similarity_search over {args.rows:,} x {args.dimension} vectors (k={args.k})"
+    )
+    recalls, latency = [], []
+    started_all = time.perf_counter()
+    for vector, exact_ids in zip(queries, exact):
+        started = time.perf_counter()
+        rows = crud_vector.similarity_search(vector, limit=args.k, profile=BENCH_PROFILE, config=cfg)
+        latency.append(time.perf_counter() - started)
+        recalls.append(recall_at_k([row[0] for row in rows], exact_ids))
+    total = time.perf_counter() - started_all
+    result.rows.append(
+        {
+            "mode": "single",
+            "batch": 1,
+            "queries_per_sec": len(queries) / total,
+            **_latency_stats(latency),
+            f"recall@{args.k}": float(np.mean(recalls)),
+        }
+    )
+
+    recalls, latency = [], []
+    started_all = time.perf_counter()
+    for offset in range(0, len(queries), args.batch_size):
+        batch = queries[offset : offset + args.batch_size]
+        started = time.perf_counter()
+        found = crud_vector.similarity_search_batch(batch, k=args.k, profile=BENCH_PROFILE, config=cfg)
+        latency.append(time.perf_counter() - started)
+        for ids, exact_ids in zip(found.item_ids, exact[offset : offset + args.batch_size]):
+            recalls.append(recall_at_k([int(i) for i in ids if i >= 0], exact_ids))
+    total = time.perf_counter() - started_all
+    result.rows.append(
+        {
+            "mode": "batched",
+            "batch": args.batch_size,
+            "queries_per_sec": len(queries) / total,
+            **_latency_stats(latency),
+            f"recall@{args.k}": float(np.mean(recalls)),
+        }
+    )
+    return result
+
+
+def vector_profiles(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    queries = _random_queries(args.queries, args.dimension, seed=args.seed)
+    selected = args.profile or sorted(crud_vector.INDEX_PROFILES)
+
+    result = ScenarioResult(
+        "vector-profiles",
+        f"Index profiles: {args.rows:,} x {args.dimension} vectors, {args.queries} queries, k={args.k}",
+    )
+    for name in selected:
+        profile = crud_vector.INDEX_PROFILES[name]
+        started = time.perf_counter()
+        _build_vector_table(cfg, args, profile)
+        build_seconds = time.perf_counter() - started
+
+        recalls, ann_latency, exact_latency = [], [], []
+        for vector in queries:
+            started = time.perf_counter()
+            exact = crud_vector.similarity_search(vector, limit=args.k, mode="exact", profile=profile, config=cfg)
+            exact_latency.append(time.perf_counter() - started)
+            started = time.perf_counter()
+            approx = crud_vector.similarity_search(vector, limit=args.k, profile=profile, config=cfg)
+            ann_latency.append(time.perf_counter() - started)
+            recalls.append(recall_at_k([row[0] for row in approx], [row[0] for row in exact]))
+
+        result.rows.append(
+            {
+                "profile": name,
+                "build_seconds": build_seconds,
+                f"recall@{args.k}": float(np.mean(recalls)),
+                **_latency_stats(ann_latency),
+                "exact_p50_ms": _percentile_ms(exact_latency, 50),
+            }
+        )
+    return result
+
+
+def vector_rerank(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    queries = _random_queries(args.queries, args.dimension, seed=args.seed)
+    profile = crud_vector.INDEX_PROFILES[(args.profile or ["i8"])[0]]
+    _build_vector_table(cfg, args, profile)
+    exact = _exact_ids(cfg, queries, args.k, profile)
+
+    result = ScenarioResult(
+        "vector-rerank", f"Two-stage search on profile '{profile.name}' ({args.rows:,} vectors, k={args.k})"
+    )
+    variants = [(None, 1)] + [(where, factor) for where in ("local", "server") for factor in args.oversample or (2, 4, 8)]
+    for rerank, oversample in variants:
+        recalls, latency = [], []
+        for vector, exact_ids in zip(queries, exact):
+            started = time.perf_counter()
+            rows = crud_vector.similarity_search(
+                vector, limit=args.k, rerank=rerank, oversample=oversample, profile=profile, config=cfg
+            )
+            latency.append(time.perf_counter() - started)
+            recalls.append(recall_at_k([row[0] for row in rows], exact_ids))
+        result.rows.append(
+            {
+                "rerank": rerank or "none",
+                "oversample": oversample,
+                f"recall@{args.k}": float(np.mean(recalls)),
+                **_latency_stats(latency),
+            }
+        )
+    return result
+
+
+def vector_filtered(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    _build_vector_table(cfg, args, BENCH_PROFILE)
+    queries = _random_queries(args.queries, args.dimension, seed=args.seed)
+    filters = {
+        "1 category": {"categories": VECTOR_CATEGORIES[:1]},
+        "half the categories": {"categories": VECTOR_CATEGORIES[: len(VECTOR_CATEGORIES) // 2]},
+        "0.5% of ids": {"where": "item_id <= %(max_id)s", "params": {"max_id": max(args.rows // 200, args.k)}},
+    }
+
+    result = ScenarioResult(
+        "vector-filtered", f"filtered_search over {args.rows:,} x {args.dimension} vectors (k={args.k})"
+    )
+    for label, predicate in filters.items():
+        exact = []
+        for vector in queries:
+            found = crud_vector.filtered_search(
+                vector, limit=args.k, strategy="prefilter", profile=BENCH_PROFILE, config=cfg, **predicate
+            )
+            exact.append([row[0] for row in found.rows])
+        # A forced prefilter skips the estimate, so the selectivity comes from the other strategies.
+        selectivity = None
+        for strategy in crud_vector.FILTER_STRATEGIES:
+            recalls, latency, chosen, rounds = [], [], [], []
+            for vector, exact_ids in zip(queries, exact):
+                started = time.perf_counter()
+                found = crud_vector.filtered_search(
+                    vector, limit=args.k, strategy=strategy, profile=BENCH_PROFILE, config=cfg, **predicate
+                )
+                latency.append(time.perf_counter() - started)
+                recalls.append(recall_at_k([row[0] for row in found.rows], exact_ids))
+                chosen.append(found.strategy)
+                rounds.append(found.rounds)
+                if found.selectivity is not None:
+                    selectivity = found.selectivity
+            result.rows.append(
+                {
+                    "filter": label,
+                    "selectivity": selectivity,
+                    "strategy": strategy,
+                    "chosen": max(set(chosen), key=chosen.count),
+                    "mean_rounds": float(np.mean(rounds)),
+                    f"recall@{args.k}": float(np.mean(recalls)),
+                    **_latency_stats(latency),
+                }
+            )
+    return result
+
+
+def hybrid_search(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    texts = np.asarray(synthetic_texts(args.rows, seed=args.seed), dtype=str)
+    with _synthetic_vector_file(cfg, args.rows, args.dimension, args.seed) as vectors:
+        records = VectorDataset(vectors.item_ids, vectors.categories, vectors.vectors, texts)
+        crud_vector.ensure_table(config=cfg, records=records, profile=BENCH_PROFILE, recreate=True)
+        crud_vector.load_sample_vectors(config=cfg, records=records, profile=BENCH_PROFILE)
+
+        # Each query targets one item: three consecutive words of its text and a perturbed copy of its vector.
+        rng = np.random.default_rng(args.seed)
+        targets = rng.choice(args.rows, size=min(args.queries, args.rows), replace=False)
+        queries = []
+        for index in targets:
+            words = str(texts[index]).split()
+            start = int(rng.integers(0, max(len(words) - 2, 1)))
+            noisy = vectors.vectors[index] + rng.standard_normal(args.dimension).astype(np.float32) * 0.05
+            phrase = " ".join(words[start : start + 3])
+            queries.append((int(vectors.item_ids[index]), phrase, noisy / np.linalg.norm(noisy)))
+
+    result = ScenarioResult(
+        "hybrid-search", f"hybrid_search over {args.rows:,} x {args.dimension} vectors with text (k={args.k})"
+    )
+    for fusion in crud_vector.FUSION_MODES:
+        stages: dict[str, list[float]] = {}
+        hits = {"lexical": 0, "vector": 0, "fused": 0}
+        for item_id, text, vector in queries:
+            found = crud_vector.hybrid_search(
+                text, vector, limit=args.k, fusion=fusion, profile=BENCH_PROFILE, config=cfg
+            )
+            for stage, seconds in found.timings.items():
+                stages.setdefault(stage, []).append(seconds)
+            hits["lexical"] += item_id in [row[0] for row in found.lexical[: args.k]]
+            hits["vector"] += item_id in [row[0] for row in found.vector[: args.k]]
+            hits["fused"] += item_id in [row[0] for row in found.rows]
+        result.rows.append(
+            {
+                "fusion": fusion,
+                **{f"{name}_hit@{args.k}": count / len(queries) for name, count in hits.items()},
+                **{f"{stage}_p50_ms": _percentile_ms(samples, 50) for stage, samples in stages.items()},
+                "total_p95_ms": _percentile_ms(stages["total"], 95),
+            }
+        )
+    return result
+
+
+def _run_vector_insert(mode: str, rows: int, dimension: int, block_rows: int, seed: int) -> dict:
+    cfg = load_config()
+    with _synthetic_vector_file(cfg, rows, dimension, seed) as dataset:
+        crud_vector.ensure_table(config=cfg, records=dataset, profile=BENCH_PROFILE, recreate=True)
+
+        baseline_rss = _peak_rss_mb()
+        tracemalloc.start()
+        started = time.perf_counter()
+        inserted = crud_vector.load_sample_vectors(
+            config=cfg, records=dataset, profile=BENCH_PROFILE, mode=mode, block_rows=block_rows
+        )
+        elapsed = time.perf_counter() - started
+        _, traced_peak = tracemalloc.get_traced_memory()
+        tracemalloc.stop()
+
+    return {
+        "mode": mode,
+        "rows": inserted,
+        "rows_per_sec": inserted / elapsed if elapsed else float("inf"),
+        "seconds": elapsed,
+        "traced_peak_mb": traced_peak / 2**20,
+        "rss_growth_mb": _peak_rss_mb() - baseline_rss,
+    }
+
+
+def vector_insert(args: argparse.Namespace) -> ScenarioResult:
+    result = ScenarioResult(
+        "vector-insert", f"Vector insert ({args.rows:,} x {args.dimension}, block {args.block_size:,})"
+    )
+    for mode in crud_vector.INSERT_MODES:
+        with ProcessPoolExecutor(max_workers=1) as pool:
+            result.rows.append(
+                pool.submit(_run_vector_insert, mode, args.rows, args.dimension, args.block_size, args.seed).result()
+            )
+    return result
+
+
+def vector_batch(args: argparse.Namespace) -> ScenarioResult:
+    cfg = load_config()
+    queries = _random_queries(args.queries, _vector_dimension(cfg), seed=args.seed)
+
+    result = ScenarioResult("vector-batch", f"{args.queries:,} similarity queries (k={args.k})")
+    # Each search mode is timed both ways, so the batch is only ever compared with the same search.
+    for mode in crud_vector.SEARCH_MODES:
+        started = time.perf_counter()
+        for vector in queries:
+            crud_vector.similarity_search(vector, limit=args.k, mode=mode, config=cfg)
+        single_elapsed = time.perf_counter() - started
+
+        started = time.perf_counter()
+        crud_vector.similarity_search_batch(queries, k=args.k, mode=mode, config=cfg)
+        batch_elapsed = time.perf_counter() - started
+
+        for label, elapsed in (("single calls", single_elapsed), ("one batch", batch_elapsed)):
+            result.rows.append(
+                {"mode": mode, "calls": label, "seconds": elapsed, "queries_per_sec": args.queries / elapsed}
+            )
+    return result
+
+
+def embedding_throughput(args: argparse.Namespace) -> ScenarioResult:
+    from warehouse.embeddings import DEFAULT_EMBED_BATCH_SIZE, iter_embeddings
+
+    cfg = load_config()
+    texts = synthetic_texts(args.rows, seed=args.seed)
+    result = ScenarioResult("embedding-throughput", f"Embedding {args.rows:,} synthetic texts ({cfg.models.active})")
+    for batch_size in args.embed_batch_size or (DEFAULT_EMBED_BATCH_SIZE,):
+        started = time.perf_counter()
+        embedded = sum(len(block) for block in iter_embeddings(texts, batch_size=batch_size, config=cfg))
+        elapsed = time.perf_counter() - started
+        result.rows.append(
+            {"batch_size": batch_size, "texts": embedded, "seconds": elapsed, "texts_per_sec": embedded / elapsed}
+        )
+    return result
+
+
+SCENARIOS: dict[str, Callable[[argparse.Namespace], ScenarioResult]] = {
+    "embedding-throughput": embedding_throughput,
+    "fetch-events": fetch_events_latency,
+    "hybrid-search": hybrid_search,
+    "s3-pruning": s3_pruning,
+    "s3-throughput": s3_throughput,
+    "tabular-insert": tabular_insert,
+    "vector-batch": vector_batch,
+    "vector-filtered": vector_filtered,
+    "vector-insert": vector_insert,
+    "vector-profiles": vector_profiles,
+    "vector-rerank": vector_rerank,
+    "vector-search": vector_search,
+}
+
+
+def _git_revision() -> str:
+    try:
+        return subprocess.run(
+            ["git", "rev-parse", "HEAD"], capture_output=True, text=True, check=True, cwd=Path(__file__).parent
+        ).stdout.strip()
+    except (OSError, subprocess.CalledProcessError):
+        return "unknown"
+
+
+def write_report(path: Path, args: argparse.Namespace, results: Sequence[ScenarioResult]) -> None:
+    """Write results as JSON with enough context (revision, parameters, host) to diff two runs."""
+    report = {
+        "created_at": datetime.now(timezone.utc).isoformat(),
+        "git_revision": _git_revision(),
+        "python": platform.python_version(),
+        "platform": platform.platform(),
+        "parameters": {name: value for name, value in vars(args).items() if name not in ("output", "scenario")},
+        "results": [asdict(result) for result in results],
+    }
+    path.write_text(json.dumps(report, indent=2) + "\n")
+
+
+def build_parser() -> argparse.ArgumentParser:
+    parser = argparse.ArgumentParser(description="Benchmark warehouse ingestion and query paths")
+    parser.add_argument("scenario", nargs="+", choices=sorted(SCENARIOS), help="Scenario(s) to run, in order.")
+    parser.add_argument("--rows", type=int, default=1_000_000, help="Synthetic row, vector, or text count.")
+    parser.add_argument("--scale", choices=list(SCALES), help="Shorthand for --rows (10k, 100k, 1m, 10m).")
+    parser.add_argument("--seed", type=int, default=7, help="Seed for every synthetic dataset and query set.")
+    parser.add_argument(
+        "--block-size",
+        type=int,
+        default=crud_tabular.DEFAULT_INSERT_BLOCK_SIZE,
+        help="Rows per INSERT block (also the chunk size for S3 staging).",
+    )
+    parser.add_argument("--queries", type=int, default=1_000, help="Number of vector queries or fetch calls.")
+    parser.add_argument("--k", type=int, default=10, help="Neighbours per vector query.")
+    parser.add_argument("--limit", type=int, default=100, help="Rows per fetch_events call.")
+    parser.add_argument("--batch-size", type=int, default=100, help="Queries per similarity_search_batch call.")
+    parser.add_argument("--dimension", type=int, default=768, help="Synthetic embedding dimension.")
+    parser.add_argument(
+        "--profile",
+        action="append",
+        choices=sorted(crud_vector.INDEX_PROFILES),
+        help="Vector index profile to evaluate (repeatable; defaults to all).",
+    )
+    parser.add_argument(
+        "--oversample", type=int, action="append", help="Rerank oversample factor (repeatable; defaults to 2, 4, 8)."
+    )
+    parser.add_argument(
+        "--embed-batch-size", type=int, action="append", help="Embedding batch size (repeatable; defaults to 64)."
+    )
+    parser.add_argument("--days", type=int, default=7, help="Date range width for time-bounded scans.")
+    parser.add_argument("--output", type=Path, help="Write the results as JSON to this path.")
+    return parser
+
+
+def run_scenarios(argv: Sequence[str] | None = None) -> tuple[argparse.Namespace, list[ScenarioResult]]:
+    """Parse ``argv`` like the command line and run each scenario in order, printing its table."""
+    args = build_parser().parse_args(argv)
+    if args.scale:
+        args.rows = SCALES[args.scale]
+
+    results = []
+    for scenario in args.scenario:
+        console.rule(f"Benchmark: {scenario}")
+        result = SCENARIOS[scenario](args)
+        console.print(result.table())
+        results.append(result)
+    return args, results
+
+
+def main() -> None:
+    args, results = run_scenarios()
+    if args.output:
+        write_report(args.output, args, results)
+        console.print(f"[green]Results written to[/green] {args.output}")
+
+
+if __name__ == "__main__":
+    main()
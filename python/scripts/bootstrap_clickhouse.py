@@ -6,6 +6,7 @@ from warehouse import config
 from warehouse import crud_tabular
 from warehouse import crud_vector
 from warehouse import crud_s3
+from warehouse import rollups
 from warehouse.datasets import load_vector_items
 
 console = Console()
@@ -18,12 +19,13 @@ def main() -> None:
 
     console.print("[bold]Setting up tabular table[/bold]")
     crud_tabular.ensure_table(config=cfg)
+    rollups.ensure_rollups(config=cfg)
     inserted = crud_tabular.load_sample_data(config=cfg)
     console.print(f"Loaded {inserted} tabular records")
 
     console.print("[bold]Setting up vector table[/bold]")
     try:
-        vector_records = list(load_vector_items(config=cfg))
+        vector_records = load_vector_items(config=cfg)
     except FileNotFoundError as exc:
         console.print(f"[red]Vector dataset missing:[/red] {exc}")
         console.print("Run python python/scripts/generate_vector_dataset.py before bootstrapping.")
@@ -31,7 +33,7 @@ def main() -> None:
 
     crud_vector.ensure_table(config=cfg, records=vector_records)
     vectors = crud_vector.load_sample_vectors(config=cfg, records=vector_records)
-    console.print(f"Loaded {vectors} vector records")
+    console.print(f"Upserted {vectors} new or changed vector records")
 
     console.print("[bold]Staging S3 dataset[/bold]")
     key = crud_s3.stage_sample_dataset(config=cfg)
@@ -40,7 +40,7 @@ def main() -> None:
 
     console.print("[bold]Vector similarity[/bold]")
     try:
-        records = list(load_vector_items(config=cfg))
+        records = load_vector_items(config=cfg)
     except FileNotFoundError:
         console.print(
             "[yellow]Vector dataset not found. Run python python/scripts/generate_vector_dataset.py first.[/yellow]"
@@ -55,7 +55,7 @@ def main() -> None:
 
     console.print("[bold]S3-backed dataset[/bold]")
     crud_s3.create_s3_mapped_table(config=cfg)
-    s3_rows = crud_s3.query_s3_dataset(config=cfg)
+    s3_rows = crud_s3.query_s3_dataset(limit=10, config=cfg)
     display_rows("s3 events (function)", s3_rows)
 
     console.print("[green]CRUD demo complete[/green]")
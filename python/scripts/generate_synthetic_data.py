@@ -0,0 +1,118 @@
+from __future__ import annotations
+
+import argparse
+import json
+import time
+from pathlib import Path
+
+from rich.console import Console
+
+from warehouse import synthetic
+from warehouse.config import load_config
+from warehouse.datasets import DEFAULT_CHUNK_ROWS, TABULAR_PARQUET_FILENAME, VECTOR_EMBEDDINGS_FILENAME
+
+console = Console()
+
+
+def model_dimension(model_name: str, models_dir: Path) -> int:
+    """Read the embedding width from the downloaded model's config without loading the weights."""
+    from warehouse.embeddings import model_directory
+
+    config_path = model_directory(model_name, models_dir) / "config.json"
+    if not config_path.exists():
+        raise SystemExit(
+            f"Model config not found at {config_path}. Pass --dimension or run python/scripts/download_models.py."
+        )
+    return int(json.loads(config_path.read_text())["hidden_size"])
+
+
+def main() -> None:
+    parser = argparse.ArgumentParser(
+        description="Generate seeded synthetic events and clustered vectors at benchmark scale."
+    )
+    parser.add_argument("--events", type=int, default=0, help="Number of events to generate (0 skips events).")
+    parser.add_argument("--vectors", type=int, default=0, help="Number of vectors to generate (0 skips vectors).")
+    parser.add_argument(
+        "--events-output",
+        type=Path,
+        help="Events file; .csv or .parquet (defaults to assets/data/tabular_events.parquet).",
+    )
+    parser.add_argument(
+        "--vectors-output",
+        type=Path,
+        help="Vector matrix path; a .meta.npz sidecar is written next to it (defaults to assets/data/vector_items.npy).",
+    )
+    parser.add_argument("--seed", type=int, default=synthetic.DEFAULT_SEED, help="Seed for all generated data.")
+    parser.add_argument("--chunk-rows", type=int, default=DEFAULT_CHUNK_ROWS, help="Rows generated per chunk.")
+    parser.add_argument("--days", type=int, default=synthetic.DEFAULT_DAYS, help="Days of event history.")
+    parser.add_argument("--customers", type=int, default=synthetic.DEFAULT_CUSTOMERS, help="Distinct customer ids.")
+    parser.add_argument(
+        "--customer-skew",
+        type=float,
+        default=synthetic.DEFAULT_CUSTOMER_SKEW,
+        help="Zipf exponent for customer activity; larger values concentrate events on fewer customers.",
+    )
+    parser.add_argument(
+        "--dimension",
+        type=int,
+        help="Vector dimension (defaults to the active embedding model's hidden size).",
+    )
+    parser.add_argument("--clusters", type=int, default=synthetic.DEFAULT_CLUSTERS, help="Gaussian mixture components.")
+    parser.add_argument(
+        "--spread",
+        type=float,
+        default=synthetic.DEFAULT_CLUSTER_SPREAD,
+        help="Noise norm around each cluster centre; smaller values give tighter clusters.",
+    )
+    parser.add_argument("--overwrite", action="store_true", help="Allow overwriting existing files.")
+    args = parser.parse_args()
+
+    if not (args.events or args.vectors):
+        parser.error("Nothing to generate; pass --events and/or --vectors.")
+
+    cfg = load_config()
+
+    if args.events:
+        output = args.events_output or cfg.paths.data_dir / TABULAR_PARQUET_FILENAME
+        started = time.perf_counter()
+        written = synthetic.write_events(
+            synthetic.iter_synthetic_events(
+                args.events,
+                chunk_rows=args.chunk_rows,
+                seed=args.seed,
+                days=args.days,
+                customers=args.customers,
+                customer_skew=args.customer_skew,
+            ),
+            output,
+            overwrite=args.overwrite,
+        )
+        elapsed = time.perf_counter() - started
+        console.print(
+            f"[green]Wrote {written:,} events to[/green] {output} "
+            f"[dim]({elapsed:.1f}s, {written / elapsed:,.0f} rows/s)[/dim]"
+        )
+
+    if args.vectors:
+        dimension = args.dimension or model_dimension(cfg.models.active, cfg.paths.model_cache_dir)
+        output = args.vectors_output or cfg.paths.data_dir / VECTOR_EMBEDDINGS_FILENAME
+        started = time.perf_counter()
+        output = synthetic.write_synthetic_vectors(
+            output,
+            args.vectors,
+            dimension,
+            chunk_rows=args.chunk_rows,
+            overwrite=args.overwrite,
+            clusters=args.clusters,
+            spread=args.spread,
+            seed=args.seed,
+        )
+        elapsed = time.perf_counter() - started
+        console.print(
+            f"[green]Wrote {args.vectors:,} x {dimension} vectors to[/green] {output} "
+            f"[dim]({elapsed:.1f}s, {args.vectors / elapsed:,.0f} vectors/s)[/dim]"
+        )
+
+
+if __name__ == "__main__":
+    main()
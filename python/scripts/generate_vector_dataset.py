@@ -1,15 +1,22 @@
 from __future__ import annotations
 
 import argparse
-import json
 from pathlib import Path
 
+import numpy as np
 from rich.console import Console
 from rich.table import Table
 
 from warehouse.config import load_config
-from warehouse.datasets import VECTOR_DATASET_FILENAME
-from warehouse.embeddings import embed_texts
+from warehouse.datasets import (
+    VECTOR_DATASET_FILENAME,
+    VECTOR_EMBEDDINGS_FILENAME,
+    VectorDataset,
+    save_vector_dataset,
+    write_vector_jsonl,
+)
+from warehouse.embedding_cache import open_embedding_cache
+from warehouse.embeddings import iter_embeddings
 
 console = Console()
 
@@ -23,36 +30,26 @@ DUMMY_ITEMS = [
 ]
 
 
-def write_jsonl(records: list[dict], path: Path, overwrite: bool) -> None:
-    if path.exists() and not overwrite:
-        raise FileExistsError(f"Target file {path} already exists. Use --overwrite to regenerate.")
-
-    path.parent.mkdir(parents=True, exist_ok=True)
-    with path.open("w", encoding="utf-8") as fh:
-        for record in records:
-            fh.write(json.dumps(record, ensure_ascii=False) + "\n")
-
-
-def build_preview_table(records: list[dict]) -> Table:
+def build_preview_table(dataset: VectorDataset) -> Table:
     table = Table(title="Vector Dataset Preview")
     table.add_column("item_id", justify="right")
     table.add_column("category")
     table.add_column("text")
     table.add_column("vector-dim", justify="right")
 
-    for record in records:
+    for record in dataset:
         table.add_row(
-            str(record["item_id"]),
-            record["category"],
-            record["text"],
-            str(len(record["vector"])),
+            str(record.item_id),
+            record.category,
+            record.text or "",
+            str(len(record.vector)),
         )
     return table
 
 
 def main() -> None:
     parser = argparse.ArgumentParser(
-        description="Generate the vector dataset JSONL using the active embedding model.")
+        description="Generate the vector dataset using the active embedding model.")
     parser.add_argument(
         "--model",
         help="Optional Hugging Face model name to override ACTIVE_EMBEDDING_MODEL.",
@@ -60,13 +57,24 @@ def main() -> None:
     parser.add_argument(
         "--output",
         type=Path,
-        help="Optional output path (defaults to assets/data/vector_items.jsonl).",
+        help="Optional output path (defaults to assets/data/vector_items.npy or .jsonl, depending on --format).",
+    )
+    parser.add_argument(
+        "--format",
+        choices=("npy", "jsonl"),
+        default="npy",
+        help="npy writes a memory-mappable float32 matrix plus a .meta.npz sidecar; jsonl is the portable export.",
     )
     parser.add_argument(
         "--overwrite",
         action="store_true",
         help="Allow overwriting an existing dataset file.",
     )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="Re-encode every text instead of reusing vectors from assets/cache/embeddings.sqlite.",
+    )
     args = parser.parse_args()
 
     cfg = load_config()
@@ -74,30 +82,45 @@ def main() -> None:
 
     console.print(f"[bold cyan]Using embedding model:[/bold cyan] {model_name}")
 
+    cache = None if args.no_cache else open_embedding_cache(config=cfg)
     try:
-        vectors = embed_texts((item["text"] for item in DUMMY_ITEMS), model_name=model_name, config=cfg)
+        vectors = np.vstack(
+            list(
+                iter_embeddings(
+                    (item["text"] for item in DUMMY_ITEMS), cache=cache, model_name=model_name, config=cfg
+                )
+            )
+        )
     except FileNotFoundError as exc:
         console.print(f"[red]Embedding model not found:[/red] {exc}")
         console.print("Run python python/scripts/download_models.py to populate assets/models.")
         raise SystemExit(1) from exc
+    finally:
+        if cache is not None:
+            stats = cache.stats()
+            console.print(
+                f"[dim]Embedding cache: {stats.hits} hits, {stats.misses} misses, "
+                f"{stats.entries} entries ({stats.hit_ratio:.0%} hit ratio)[/dim]"
+            )
+            cache.close()
+
+    dataset = VectorDataset(
+        np.arange(1, len(DUMMY_ITEMS) + 1, dtype=np.uint32),
+        np.asarray([item["category"] for item in DUMMY_ITEMS], dtype=str),
+        vectors,
+        np.asarray([item["text"] for item in DUMMY_ITEMS], dtype=str),
+        model=model_name,
+    )
 
-    records: list[dict] = []
-    for idx, (item, vector) in enumerate(zip(DUMMY_ITEMS, vectors), start=1):
-        records.append(
-            {
-                "item_id": idx,
-                "category": item["category"],
-                "text": item["text"],
-                "model": model_name,
-                "vector": [float(v) for v in vector],
-            }
-        )
-
-    output_path = args.output or (cfg.paths.data_dir / VECTOR_DATASET_FILENAME)
-    write_jsonl(records, output_path, overwrite=args.overwrite)
+    if args.format == "jsonl":
+        output_path = args.output or (cfg.paths.data_dir / VECTOR_DATASET_FILENAME)
+        write_vector_jsonl(dataset, output_path, overwrite=args.overwrite)
+    else:
+        output_path = args.output or (cfg.paths.data_dir / VECTOR_EMBEDDINGS_FILENAME)
+        save_vector_dataset(dataset, output_path, overwrite=args.overwrite)
 
     console.print(f"[green]Vector dataset written to[/green] {output_path}")
-    console.print(build_preview_table(records))
+    console.print(build_preview_table(dataset))
 
 
 if __name__ == "__main__":
@@ -0,0 +1,350 @@
+from __future__ import annotations
+
+import asyncio
+import json
+import numbers
+import re
+import uuid
+import xml.etree.ElementTree as ElementTree
+from contextlib import asynccontextmanager
+from pathlib import Path
+from typing import Any, AsyncIterator, List, Optional, Sequence
+
+import httpx
+from botocore.client import BaseClient
+
+from .config import AppConfig, load_config
+from .crud_vector import (
+    DEFAULT_INDEX_PROFILE,
+    RERANK_MODES,
+    STALE_OVERSAMPLE,
+    VectorIndexProfile,
+    _candidates_exhausted,
+    _local_rerank,
+    _needs_wider_search,
+    _row_count_sql,
+    _search_settings,
+    _similarity_sql,
+    _vector_literal,
+)
+from .s3_utils import READ_SIZE, build_s3_client
+
+DEFAULT_TIMEOUT = 300.0
+_S3_NAMESPACE = {"s3": "http://s3.amazonaws.com/doc/2006-03-01/"}
+
+# Readonly queries stop on the server as soon as the client drops the connection,
+# which is what a cancelled task does.
+_HTTP_SETTINGS = {
+    "enable_http_compression": 1,
+    "cancel_http_readonly_queries_on_client_close": 1,
+    "output_format_json_quote_64bit_integers": 0,
+}
+
+
+# An error raised after the 200 status line is appended to the body as plain text.
+_EXCEPTION_CODE = re.compile(r"Code: (\d+)")
+_TEXT_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n"})
+_LITERAL_ESCAPES = str.maketrans({"\\": "\\\\", "\t": "\\t", "\n": "\\n", "'": "\\'"})
+
+
+def _param_literal(value: Any, *, nested: bool = False) -> str:
+    """Format a query parameter the way ClickHouse parses ``param_<name>`` values.
+
+    Top-level values are sent in the escaped text format; inside arrays,
+    tuples and maps they are literals, so strings are quoted.
+    """
+    if value is None:
+        return "NULL" if nested else "\\N"
+    if isinstance(value, bool):
+        return "1" if value else "0"
+    if isinstance(value, numbers.Real):
+        return str(value)
+    if isinstance(value, list):
+        return "[" + ",".join(_param_literal(item, nested=True) for item in value) + "]"
+    if isinstance(value, tuple):
+        return "(" + ",".join(_param_literal(item, nested=True) for item in value) + ")"
+    if isinstance(value, dict):
+        entries = (
+            f"{_param_literal(key, nested=True)}:{_param_literal(item, nested=True)}" for key, item in value.items()
+        )
+        return "{" + ",".join(entries) + "}"
+    if nested:
+        return "'" + str(value).translate(_LITERAL_ESCAPES) + "'"
+    return str(value).translate(_TEXT_ESCAPES)
+
+
+class ClickHouseHTTPError(RuntimeError):
+    """Raised when the ClickHouse HTTP interface answers with an error status."""
+
+    def __init__(self, message: str, *, code: Optional[int] = None, query_id: Optional[str] = None) -> None:
+        super().__init__(message)
+        self.code = code
+        self.query_id = query_id
+
+
+class AsyncClickHouse:
+    """asyncio client for ClickHouse's HTTP interface.
+
+    At most ``max_concurrency`` queries run at once (defaults to the configured
+    pool size); further calls wait their turn. Rows come back as JSON-decoded
+    lists. Parameters use the server-side ``{name:Type}`` placeholder syntax,
+    not the ``%(name)s`` substitution of the native client. Cancelling a task
+    closes its connection and kills the query on the server.
+
+    Pass ``transport`` (for example ``httpx.MockTransport``) or ``base_url`` to
+    run against a mock server.
+    """
+
+    def __init__(
+        self,
+        config: Optional[AppConfig] = None,
+        *,
+        max_concurrency: Optional[int] = None,
+        timeout: float = DEFAULT_TIMEOUT,
+        base_url: Optional[str] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+    ) -> None:
+        cfg = config or load_config()
+        settings = cfg.clickhouse
+        self.max_concurrency = max_concurrency or settings.pool_size
+        self._semaphore = asyncio.Semaphore(self.max_concurrency)
+        self._http = httpx.AsyncClient(
+            base_url=base_url or f"http://{settings.host}:{settings.http_port}",
+            headers={
+                "X-ClickHouse-User": settings.user,
+                "X-ClickHouse-Key": settings.password,
+                "X-ClickHouse-Database": settings.database,
+            },
+            timeout=timeout,
+            limits=httpx.Limits(max_connections=self.max_concurrency),
+            transport=transport,
+        )
+
+    async def __aenter__(self) -> "AsyncClickHouse":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+    def _request_params(
+        self, params: Optional[dict[str, Any]], settings: Optional[dict[str, Any]], query_id: str, fmt: Optional[str]
+    ) -> dict[str, Any]:
+        request: dict[str, Any] = {**_HTTP_SETTINGS, **(settings or {}), "query_id": query_id}
+        if fmt:
+            request["default_format"] = fmt
+        for name, value in (params or {}).items():
+            request[f"param_{name}"] = _param_literal(value)
+        return request
+
+    async def _kill(self, query_id: str) -> None:
+        try:
+            response = await self._http.post(
+                "/", content=f"KILL QUERY WHERE query_id = '{query_id}' ASYNC", params={"query_id": f"{query_id}-kill"}
+            )
+            await response.aclose()
+        except httpx.HTTPError:
+            # The query may already be gone along with its connection; nothing left to cancel.
+            pass
+
+    @asynccontextmanager
+    async def _stream(
+        self,
+        query: str,
+        params: Optional[dict[str, Any]],
+        settings: Optional[dict[str, Any]],
+        fmt: Optional[str],
+    ) -> AsyncIterator[httpx.Response]:
+        query_id = str(uuid.uuid4())
+        async with self._semaphore:
+            try:
+                async with self._http.stream(
+                    "POST", "/", content=query.encode(), params=self._request_params(params, settings, query_id, fmt)
+                ) as response:
+                    if response.status_code != 200:
+                        body = (await response.aread()).decode(errors="replace").strip()
+                        code = response.headers.get("X-ClickHouse-Exception-Code")
+                        raise ClickHouseHTTPError(body, code=int(code) if code else None, query_id=query_id)
+                    yield response
+            except asyncio.CancelledError:
+                await asyncio.shield(self._kill(query_id))
+                raise
+
+    async def iter_rows(
+        self,
+        query: str,
+        params: Optional[dict[str, Any]] = None,
+        *,
+        settings: Optional[dict[str, Any]] = None,
+    ) -> AsyncIterator[list]:
+        """Yield result rows as they arrive, one ``JSONCompactEachRow`` line at a time.
+
+        A query that fails after rows were already sent raises
+        ``ClickHouseHTTPError`` when the error text is reached.
+        """
+        async with self._stream(query, params, settings, "JSONCompactEachRow") as response:
+            lines = response.aiter_lines()
+            async for line in lines:
+                if not line:
+                    continue
+                try:
+                    row = json.loads(line)
+                except json.JSONDecodeError:
+                    row = None
+                if not isinstance(row, list):
+                    message = "\n".join([line, *[rest async for rest in lines]]).strip()
+                    code = _EXCEPTION_CODE.search(message)
+                    raise ClickHouseHTTPError(
+                        message,
+                        code=int(code.group(1)) if code else None,
+                        query_id=response.headers.get("X-ClickHouse-Query-Id"),
+                    )
+                yield row
+
+    async def execute(
+        self,
+        query: str,
+        params: Optional[dict[str, Any]] = None,
+        *,
+        settings: Optional[dict[str, Any]] = None,
+    ) -> List[list]:
+        return [row async for row in self.iter_rows(query, params, settings=settings)]
+
+    async def command(
+        self,
+        query: str,
+        params: Optional[dict[str, Any]] = None,
+        *,
+        settings: Optional[dict[str, Any]] = None,
+    ) -> str:
+        """Run a statement that returns no rows (DDL, INSERT ... SELECT) and return the raw response body."""
+        async with self._stream(query, params, settings, None) as response:
+            return (await response.aread()).decode()
+
+    async def similarity_search(
+        self,
+        query_vector: Sequence[float],
+        *,
+        limit: int = 3,
+        mode: str = "ann",
+        candidates: Optional[int] = None,
+        oversample: int = 1,
+        rerank: Optional[str] = None,
+        profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    ) -> List[tuple]:
+        """Async counterpart of :func:`warehouse.crud_vector.similarity_search`, without ``explain``."""
+        if len(query_vector) == 0:
+            raise ValueError("Query vector is empty")
+        if rerank not in RERANK_MODES:
+            raise ValueError(f"Unknown rerank mode '{rerank}'. Expected one of {RERANK_MODES}.")
+        if oversample < 1:
+            raise ValueError("oversample must be at least 1")
+
+        settings = _search_settings(mode, candidates)
+        literal = _vector_literal(query_vector)
+        fetch_limit = limit * oversample if rerank else limit
+        stale_oversample = STALE_OVERSAMPLE
+        table_rows: Optional[int] = None
+        while True:
+            query = _similarity_sql(
+                literal,
+                limit,
+                fetch_limit,
+                mode=mode,
+                rerank=rerank,
+                stale_oversample=stale_oversample,
+                profile=profile,
+            )
+            rows = [tuple(row) for row in await self.execute(query, settings=settings)]
+            if not _needs_wider_search(rows, mode, limit, fetch_limit, rerank, stale_oversample):
+                break
+            if table_rows is None:
+                table_rows = int((await self.execute(_row_count_sql(profile)))[0][0])
+            if _candidates_exhausted(fetch_limit, stale_oversample, table_rows):
+                break
+            stale_oversample *= 4
+        if rerank == "local":
+            rows = _local_rerank(rows, query_vector, limit, profile)
+        return rows
+
+
+class AsyncS3:
+    """asyncio access to the configured bucket through presigned URLs.
+
+    boto3 only signs the requests; the transfers themselves run on an
+    ``httpx.AsyncClient`` so they never block the event loop. At most
+    ``max_concurrency`` transfers run at once.
+    """
+
+    def __init__(
+        self,
+        config: Optional[AppConfig] = None,
+        *,
+        max_concurrency: int = 8,
+        timeout: float = DEFAULT_TIMEOUT,
+        client: Optional[BaseClient] = None,
+        transport: Optional[httpx.AsyncBaseTransport] = None,
+        expires_in: int = 3600,
+    ) -> None:
+        self.config = config or load_config()
+        self.expires_in = expires_in
+        self._s3 = client or build_s3_client(self.config)
+        self._semaphore = asyncio.Semaphore(max_concurrency)
+        self._http = httpx.AsyncClient(
+            timeout=timeout, limits=httpx.Limits(max_connections=max_concurrency), transport=transport
+        )
+
+    async def __aenter__(self) -> "AsyncS3":
+        return self
+
+    async def __aexit__(self, *exc_info) -> None:
+        await self.close()
+
+    async def close(self) -> None:
+        await self._http.aclose()
+
+    def _url(self, operation: str, **params: Any) -> str:
+        return self._s3.generate_presigned_url(
+            operation, Params={"Bucket": self.config.s3.bucket, **params}, ExpiresIn=self.expires_in
+        )
+
+    async def put_object(self, key: str, data: bytes) -> str:
+        """Upload ``data`` to ``key`` and return the object's ETag."""
+        async with self._semaphore:
+            response = await self._http.put(self._url("put_object", Key=key), content=data)
+            response.raise_for_status()
+        return response.headers.get("ETag", "").strip('"')
+
+    async def upload_file(self, source: Path, key: str) -> str:
+        if not source.exists():
+            raise FileNotFoundError(f"Local file not found: {source}")
+        data = await asyncio.to_thread(source.read_bytes)
+        return await self.put_object(key, data)
+
+    async def iter_object(self, key: str, *, chunk_size: int = READ_SIZE) -> AsyncIterator[bytes]:
+        async with self._semaphore:
+            async with self._http.stream("GET", self._url("get_object", Key=key)) as response:
+                response.raise_for_status()
+                async for chunk in response.aiter_bytes(chunk_size):
+                    yield chunk
+
+    async def get_object(self, key: str) -> bytes:
+        return b"".join([chunk async for chunk in self.iter_object(key)])
+
+    async def list_objects(self, prefix: str = "") -> List[str]:
+        keys: List[str] = []
+        token: Optional[str] = None
+        while True:
+            params: dict[str, Any] = {"Prefix": prefix}
+            if token:
+                params["ContinuationToken"] = token
+            async with self._semaphore:
+                response = await self._http.get(self._url("list_objects_v2", **params))
+                response.raise_for_status()
+            root = ElementTree.fromstring(response.content)
+            keys.extend(element.text or "" for element in root.findall("s3:Contents/s3:Key", _S3_NAMESPACE))
+            token = root.findtext("s3:NextContinuationToken", namespaces=_S3_NAMESPACE)
+            if not token:
+                return keys
@@ -1,16 +1,52 @@
 from __future__ import annotations
 
+import threading
+import time
+from collections import deque
 from contextlib import contextmanager
-from typing import Any, Iterable, Optional
+from dataclasses import dataclass, replace
+from typing import Any, Deque, Iterable, Iterator, Optional, Sequence, Tuple
 
-from clickhouse_driver import Client
+from clickhouse_driver import Client, errors
 
-from .config import AppConfig, load_config
+from .config import AppConfig, ClickHouseSettings, load_config
+from .instrumentation import InstrumentedClient, track_http
+from .query_cache import cache_key, cached, scoped_tables, server_identity
+
+DEFAULT_MAX_BLOCK_SIZE = 65_536
+RESULT_FORMATS = ("rows", "numpy", "pandas", "arrow")
+
+# Errors that leave the underlying socket in an unknown state; clients raising
+# them are discarded instead of being handed back to the pool.
+BROKEN_CONNECTION_ERRORS = (
+    errors.NetworkError,
+    errors.SocketTimeoutError,
+    errors.UnexpectedPacketFromServerError,
+    EOFError,
+    OSError,
+)
+
+
+def build_http_client(config: Optional[AppConfig] = None):
+    """Create a clickhouse-connect client on the HTTP port, used for Arrow-format transfers."""
+    import clickhouse_connect
+
+    cfg = config or load_config()
+    return clickhouse_connect.get_client(
+        host=cfg.clickhouse.host,
+        port=cfg.clickhouse.http_port,
+        username=cfg.clickhouse.user,
+        password=cfg.clickhouse.password,
+        database=cfg.clickhouse.database,
+        compress=True,
+        # Without a session id the client is safe to share between threads.
+        autogenerate_session_id=False,
+    )
 
 
 def build_client(config: Optional[AppConfig] = None) -> Client:
     cfg = config or load_config()
-    return Client(
+    return InstrumentedClient(
         host=cfg.clickhouse.host,
         port=cfg.clickhouse.native_port,
         user=cfg.clickhouse.user,
@@ -22,8 +58,213 @@ def build_client(config: Optional[AppConfig] = None) -> Client:
     )
 
 
+@dataclass(frozen=True)
+class PoolStats:
+    hits: int = 0
+    waits: int = 0
+    opens: int = 0
+    evictions: int = 0
+    discards: int = 0
+    in_use: int = 0
+    idle: int = 0
+    wait_seconds: float = 0.0
+
+
+class ClientPool:
+    """Thread-safe pool of native-protocol clients sharing one AppConfig.
+
+    Clients are handed out exclusively (a ``clickhouse_driver.Client`` is not
+    safe for concurrent use), pinged before reuse once they have been idle for
+    ``healthcheck_interval`` seconds, and closed after ``idle_timeout`` seconds
+    without use.
+    """
+
+    def __init__(
+        self,
+        config: AppConfig,
+        *,
+        max_size: Optional[int] = None,
+        idle_timeout: Optional[float] = None,
+        healthcheck_interval: Optional[float] = None,
+        acquire_timeout: Optional[float] = None,
+    ) -> None:
+        settings = config.clickhouse
+        self.config = config
+        self.max_size = max_size or settings.pool_size
+        self.idle_timeout = settings.pool_idle_timeout if idle_timeout is None else idle_timeout
+        self.healthcheck_interval = (
+            settings.pool_healthcheck_interval if healthcheck_interval is None else healthcheck_interval
+        )
+        self.acquire_timeout = settings.pool_acquire_timeout if acquire_timeout is None else acquire_timeout
+
+        self._idle: Deque[Tuple[Client, float]] = deque()
+        self._size = 0
+        self._closed = False
+        self._cond = threading.Condition()
+        self._stats = PoolStats()
+
+    def _bump(self, **deltas: int) -> None:
+        self._stats = replace(
+            self._stats, **{name: getattr(self._stats, name) + delta for name, delta in deltas.items()}
+        )
+
+    def _evict_idle_locked(self, now: float) -> None:
+        if self.idle_timeout <= 0:
+            return
+        # Oldest clients sit on the left; stop at the first one still fresh.
+        while self._idle and now - self._idle[0][1] > self.idle_timeout:
+            client, _ = self._idle.popleft()
+            self._size -= 1
+            self._bump(evictions=1)
+            client.disconnect()
+
+    def _is_healthy(self, client: Client, last_used: float) -> bool:
+        if time.monotonic() - last_used < self.healthcheck_interval:
+            return True
+        try:
+            return bool(client.connection.ping())
+        except BROKEN_CONNECTION_ERRORS:
+            return False
+
+    def acquire(self) -> Client:
+        deadline = time.monotonic() + self.acquire_timeout
+        waited = False
+
+        with self._cond:
+            while True:
+                if self._closed:
+                    raise RuntimeError("ClickHouse client pool is closed")
+                now = time.monotonic()
+                self._evict_idle_locked(now)
+                if self._idle:
+                    # LIFO reuse keeps the warmest sockets busy and lets the rest age out.
+                    client, last_used = self._idle.pop()
+                    break
+                if self._size < self.max_size:
+                    self._size += 1
+                    self._bump(opens=1)
+                    return build_client(self.config)
+                if not waited:
+                    self._bump(waits=1)
+                    waited = True
+                remaining = deadline - now
+                if remaining <= 0:
+                    raise TimeoutError(
+                        f"Timed out after {self.acquire_timeout}s waiting for a ClickHouse connection "
+                        f"(pool size {self.max_size})"
+                    )
+                self._cond.wait(remaining)
+
+        if self._is_healthy(client, last_used):
+            with self._cond:
+                self._bump(hits=1)
+            return client
+
+        # Reconnect in place: the slot stays reserved, only the socket is replaced.
+        client.disconnect()
+        with self._cond:
+            self._bump(discards=1, opens=1)
+        return build_client(self.config)
+
+    def release(self, client: Client, *, broken: bool = False) -> None:
+        with self._cond:
+            if broken or self._closed:
+                self._size -= 1
+                self._bump(discards=1)
+                self._cond.notify()
+            else:
+                self._idle.append((client, time.monotonic()))
+                self._cond.notify()
+                return
+        client.disconnect()
+
+    @contextmanager
+    def connection(self) -> Iterator[Client]:
+        started = time.monotonic()
+        client = self.acquire()
+        waited = time.monotonic() - started
+        with self._cond:
+            self._bump(wait_seconds=waited)
+        client.connection_wait = waited
+        try:
+            yield client
+        except BROKEN_CONNECTION_ERRORS:
+            self.release(client, broken=True)
+            raise
+        except BaseException:
+            # The driver drops its socket on any failed query, so the client is still reusable.
+            self.release(client)
+            raise
+        else:
+            self.release(client)
+
+    def stats(self) -> PoolStats:
+        with self._cond:
+            idle = len(self._idle)
+            return replace(self._stats, idle=idle, in_use=self._size - idle)
+
+    def close(self) -> None:
+        with self._cond:
+            self._closed = True
+            idle = [client for client, _ in self._idle]
+            self._idle.clear()
+            self._size -= len(idle)
+            self._cond.notify_all()
+        for client in idle:
+            client.disconnect()
+
+
+_POOLS: dict[ClickHouseSettings, ClientPool] = {}
+_POOLS_LOCK = threading.Lock()
+
+
+def get_pool(config: Optional[AppConfig] = None) -> ClientPool:
+    cfg = config or load_config()
+    with _POOLS_LOCK:
+        pool = _POOLS.get(cfg.clickhouse)
+        if pool is None or pool._closed:
+            pool = ClientPool(cfg)
+            _POOLS[cfg.clickhouse] = pool
+        return pool
+
+
+_HTTP_CLIENTS: dict[ClickHouseSettings, Any] = {}
+
+
+def get_http_client(config: Optional[AppConfig] = None):
+    """Return the shared HTTP client for ``config``; it keeps its own keep-alive connection pool."""
+    cfg = config or load_config()
+    with _POOLS_LOCK:
+        client = _HTTP_CLIENTS.get(cfg.clickhouse)
+        if client is None:
+            client = build_http_client(cfg)
+            _HTTP_CLIENTS[cfg.clickhouse] = client
+        return client
+
+
+def pool_stats(config: Optional[AppConfig] = None) -> PoolStats:
+    return get_pool(config).stats()
+
+
+def close_pools() -> None:
+    with _POOLS_LOCK:
+        pools = list(_POOLS.values())
+        http_clients = list(_HTTP_CLIENTS.values())
+        _POOLS.clear()
+        _HTTP_CLIENTS.clear()
+    for pool in pools:
+        pool.close()
+    for client in http_clients:
+        client.close()
+
+
 @contextmanager
-def client_session(config: Optional[AppConfig] = None):
+def client_session(config: Optional[AppConfig] = None, *, pooled: bool = True):
+    if pooled:
+        with get_pool(config).connection() as client:
+            yield client
+        return
+
     client = build_client(config)
     try:
         yield client
@@ -34,3 +275,106 @@ def client_session(config: Optional[AppConfig] = None):
 def execute(query: str, params: Optional[dict[str, Any]] = None, *, config: Optional[AppConfig] = None) -> Iterable[Any]:
     with client_session(config) as client:
         return client.execute(query, params or {})
+
+
+def execute_iter(
+    query: str,
+    params: Optional[dict[str, Any]] = None,
+    *,
+    max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+    settings: Optional[dict[str, Any]] = None,
+    config: Optional[AppConfig] = None,
+) -> Iterator[tuple]:
+    """Stream result rows, holding at most one ``max_block_size`` block in memory.
+
+    The pooled client stays checked out until the iterator is exhausted or closed.
+    """
+    with client_session(config) as client:
+        rows = client.execute_iter(query, params or {}, settings={**(settings or {}), "max_block_size": max_block_size})
+        try:
+            yield from rows
+        except GeneratorExit:
+            # An abandoned stream leaves unread packets on the socket; dropping it makes the
+            # pooled client reconnect instead of reading another query's leftovers.
+            client.disconnect()
+            raise
+
+
+def iter_arrow_batches(
+    query: str,
+    params: Optional[dict[str, Any]] = None,
+    *,
+    max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+    settings: Optional[dict[str, Any]] = None,
+    config: Optional[AppConfig] = None,
+) -> Iterator[Any]:
+    """Stream the result as ``pyarrow.RecordBatch`` objects of up to ``max_block_size`` rows (HTTP port)."""
+    client = get_http_client(config)
+    with track_http(query, {**(settings or {}), "max_block_size": max_block_size}) as (record, settings):
+        stream = client.query_arrow_stream(query, parameters=params or {}, settings=settings)
+        with stream:
+            for batch in stream:
+                if record is not None:
+                    record.rows_received += batch.num_rows
+                    record.bytes_received += batch.nbytes
+                yield batch
+
+
+def _fetch(
+    query: str,
+    params: dict[str, Any],
+    result_format: str,
+    settings: dict[str, Any],
+    config: Optional[AppConfig],
+) -> Any:
+    if result_format == "arrow":
+        with track_http(query, settings) as (record, settings):
+            table = get_http_client(config).query_arrow(query, parameters=params, settings=settings)
+            if record is not None:
+                record.rows_received, record.bytes_received = table.num_rows, table.nbytes
+            return table
+
+    with client_session(config) as client:
+        if result_format == "rows":
+            return client.execute(query, params, settings=settings)
+        numpy_settings = {**settings, "use_numpy": True}
+        if result_format == "pandas":
+            return client.query_dataframe(query, params, settings=numpy_settings)
+        columns, types = client.execute(query, params, settings=numpy_settings, columnar=True, with_column_types=True)
+        return {name: column for (name, _), column in zip(types, columns)}
+
+
+def fetch(
+    query: str,
+    params: Optional[dict[str, Any]] = None,
+    *,
+    result_format: str = "rows",
+    settings: Optional[dict[str, Any]] = None,
+    cache_tables: Sequence[str] = (),
+    config: Optional[AppConfig] = None,
+) -> Any:
+    """Run ``query`` and return the full result in ``result_format``.
+
+    ``rows`` is a list of tuples. ``numpy`` is a dict of column name to NumPy
+    array and ``pandas`` a DataFrame, both decoded by the native client's NumPy
+    reader without building a tuple per row. ``arrow`` is a ``pyarrow.Table``
+    read over the HTTP port.
+
+    Naming the tables the query reads in ``cache_tables`` makes the result
+    eligible for the query cache once ``query_cache.enable_query_cache()`` has
+    been called.
+    """
+    if result_format not in RESULT_FORMATS:
+        raise ValueError(f"Unknown result format '{result_format}'. Expected one of {RESULT_FORMATS}.")
+    params = params or {}
+    settings = settings or {}
+    if not cache_tables:
+        return _fetch(query, params, result_format, settings, config)
+
+    cfg = config or load_config()
+    key = cache_key(query, params, result_format, sorted(settings.items()), server_identity(cfg))
+    return cached(
+        key,
+        scoped_tables(cache_tables, cfg),
+        lambda extra: _fetch(query, params, result_format, {**settings, **extra}, cfg),
+    )
@@ -26,6 +26,10 @@ class ClickHouseSettings:
     user: str
     password: str
     database: str
+    pool_size: int = 8
+    pool_idle_timeout: float = 300.0
+    pool_healthcheck_interval: float = 30.0
+    pool_acquire_timeout: float = 30.0
 
 
 @dataclass(frozen=True)
@@ -74,6 +78,10 @@ def load_config() -> AppConfig:
         user=_env("CLICKHOUSE_USER", "default"),
         password=_env("CLICKHOUSE_PASSWORD", ""),
         database=_env("CLICKHOUSE_DEFAULT_DATABASE", "default"),
+        pool_size=int(_env("CLICKHOUSE_POOL_SIZE", "8")),
+        pool_idle_timeout=float(_env("CLICKHOUSE_POOL_IDLE_TIMEOUT", "300")),
+        pool_healthcheck_interval=float(_env("CLICKHOUSE_POOL_HEALTHCHECK_INTERVAL", "30")),
+        pool_acquire_timeout=float(_env("CLICKHOUSE_POOL_ACQUIRE_TIMEOUT", "30")),
     )
 
     s3 = S3Settings(
@@ -1,29 +1,301 @@
 from __future__ import annotations
 
-from pathlib import Path
-from typing import Iterable, Optional
-import tempfile
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Iterable, Iterator, Optional, Sequence
 
-from .clickhouse import client_session
+import pandas as pd
+
+from .clickhouse import DEFAULT_MAX_BLOCK_SIZE, client_session, execute_iter, fetch
 from .config import AppConfig, load_config
-from .datasets import load_tabular_events
-from .s3_utils import ensure_bucket_exists, upload_file
+from .crud_tabular import TABULAR_TABLE
+from .datasets import DEFAULT_CHUNK_ROWS, iter_tabular_events, tabular_events_path
+from .instrumentation import instrumented
+from .s3_utils import (
+    COMPRESSION_SUFFIXES,
+    DEFAULT_PART_SIZE,
+    DEFAULT_UPLOAD_CONCURRENCY,
+    build_s3_client,
+    ensure_bucket_exists,
+    stream_upload,
+)
 
+S3_DATASET_PREFIX = "datasets/"
 S3_EVENTS_KEY = "datasets/tabular_events.csv"
+DEFAULT_ROW_GROUP_ROWS = 1_000_000
+DEFAULT_PARQUET_COMPRESSION = "zstd"
+
+S3_PARTITIONED_PREFIX = "datasets/events/"
+PARTITION_COLUMNS = ("event_date", "event_type")
+
+EVENTS_COLUMNS = (
+    ("event_id", "UInt32"),
+    ("event_time", "DateTime('UTC')"),
+    ("customer_id", "UInt32"),
+    ("event_type", "String"),
+    ("amount", "Decimal(10, 2)"),
+)
+
+
+def _columns_sql(exclude: Iterable[str] = ()) -> str:
+    skipped = set(exclude)
+    return ",\n".join(f"    {name} {ch_type}" for name, ch_type in EVENTS_COLUMNS if name not in skipped)
+
+
+@dataclass(frozen=True)
+class S3Format:
+    name: str
+    suffix: str
+    # Self-describing formats carry their schema, so mapped tables can let ClickHouse infer it.
+    self_describing: bool
+
+
+S3_FORMATS = {
+    "csv": S3Format("CSVWithNames", ".csv", self_describing=False),
+    "parquet": S3Format("Parquet", ".parquet", self_describing=True),
+    "native": S3Format("Native", ".native", self_describing=True),
+}
+
+
+def _resolve_format(file_format: str) -> S3Format:
+    try:
+        return S3_FORMATS[file_format]
+    except KeyError:
+        raise ValueError(f"Unknown S3 format '{file_format}'. Expected one of {sorted(S3_FORMATS)}.") from None
+
+
+def events_key(file_format: str = "csv", compression: Optional[str] = None) -> str:
+    fmt = _resolve_format(file_format)
+    return f"{S3_DATASET_PREFIX}tabular_events{fmt.suffix}" + COMPRESSION_SUFFIXES.get(compression, "")
+
+
+class _ChunkSink:
+    """Write-only file object that hands buffered bytes back to a generator."""
+
+    def __init__(self) -> None:
+        self.buffer = bytearray()
+        self.position = 0
+        self.closed = False
+
+    def write(self, data) -> int:
+        self.buffer.extend(data)
+        self.position += len(data)
+        return len(data)
 
+    def tell(self) -> int:
+        return self.position
 
-def stage_sample_dataset(*, config: Optional[AppConfig] = None) -> str:
+    def flush(self) -> None:
+        pass
+
+    def close(self) -> None:
+        self.closed = True
+
+    def drain(self) -> bytes:
+        data = bytes(self.buffer)
+        self.buffer.clear()
+        return data
+
+
+def _parquet_table(chunk: pd.DataFrame):
+    import pyarrow as pa
+
+    builders = {
+        "event_id": (pa.uint32(), lambda col: pa.array(col.to_numpy(dtype="uint32"))),
+        "event_time": (pa.timestamp("ms", tz="UTC"), lambda col: pa.array(col).cast(pa.timestamp("ms", tz="UTC"))),
+        "customer_id": (pa.uint32(), lambda col: pa.array(col.to_numpy(dtype="uint32"))),
+        "event_type": (pa.string(), lambda col: pa.array(col.astype(str))),
+        # Vectorized float -> decimal cast rounds to the declared scale without per-row Decimal objects.
+        "amount": (
+            pa.decimal128(10, 2),
+            lambda col: pa.array(col.to_numpy(dtype="float64")).cast(pa.decimal128(10, 2)),
+        ),
+    }
+    present = [name for name in builders if name in chunk.columns]
+    schema = pa.schema([pa.field(name, builders[name][0], nullable=False) for name in present])
+    return pa.Table.from_arrays([builders[name][1](chunk[name]) for name in present], schema=schema)
+
+
+def _iter_parquet_bytes(
+    chunks: Iterable[pd.DataFrame], *, row_group_rows: int, compression: str
+) -> Iterator[bytes]:
+    try:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet staging requires the 'pyarrow' package") from exc
+
+    sink = _ChunkSink()
+    writer = None
+    pending = []
+    pending_rows = 0
+
+    def flush(final: bool = False):
+        nonlocal writer, pending, pending_rows
+        table = pa.concat_tables(pending)
+        # Only whole row groups are written until the final flush; the remainder waits for more rows.
+        cut = table.num_rows if final else table.num_rows - table.num_rows % row_group_rows
+        if writer is None:
+            writer = pq.ParquetWriter(sink, table.schema, compression=compression)
+        writer.write_table(table.slice(0, cut), row_group_size=row_group_rows)
+        remainder = table.slice(cut)
+        pending, pending_rows = ([remainder], remainder.num_rows) if remainder.num_rows else ([], 0)
+
+    # Chunks are regrouped so row groups match row_group_rows regardless of the CSV chunk size.
+    for chunk in chunks:
+        table = _parquet_table(chunk)
+        pending.append(table)
+        pending_rows += table.num_rows
+        if pending_rows >= row_group_rows:
+            flush()
+            yield sink.drain()
+    if pending:
+        flush(final=True)
+    if writer is not None:
+        writer.close()
+        yield sink.drain()
+
+
+def _csv_bytes(chunk: pd.DataFrame, *, header: bool = True) -> bytes:
+    return chunk.to_csv(
+        index=False, header=header, date_format="%Y-%m-%dT%H:%M:%SZ", float_format="%.2f"
+    ).encode("utf-8")
+
+
+@instrumented
+def stage_sample_dataset(
+    *,
+    file_format: str = "csv",
+    compression: Optional[str] = None,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    parquet_compression: str = DEFAULT_PARQUET_COMPRESSION,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    chunks: Optional[Iterable[pd.DataFrame]] = None,
+    part_size: int = DEFAULT_PART_SIZE,
+    concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+    config: Optional[AppConfig] = None,
+) -> str:
     cfg = config or load_config()
     ensure_bucket_exists(config=cfg)
 
-    df = load_tabular_events(config=cfg)
-    with tempfile.NamedTemporaryFile("w", delete=False, suffix=".csv") as tmp:
-        temp_path = Path(tmp.name)
-        df.to_csv(temp_path, index=False)
+    source_path = tabular_events_path(config=cfg)
+    if file_format == "csv" and chunks is None and source_path.suffix == ".csv":
+        # The source CSV already matches the CSVWithNames layout, so it is streamed as-is.
+        source = source_path
+    elif file_format == "parquet":
+        # Parquet compresses per column chunk; an outer codec would only hide the footer.
+        compression = None
+        source = _iter_parquet_bytes(
+            chunks if chunks is not None else iter_tabular_events(chunk_rows=chunk_rows, config=cfg),
+            row_group_rows=row_group_rows,
+            compression=parquet_compression,
+        )
+    elif file_format == "csv":
+        chunks = chunks if chunks is not None else iter_tabular_events(chunk_rows=chunk_rows, config=cfg)
+        source = (_csv_bytes(chunk, header=index == 0) for index, chunk in enumerate(chunks))
+    else:
+        raise ValueError(
+            f"Client-side staging supports 'csv' and 'parquet'; use export_events_to_s3 for '{file_format}'."
+        )
 
-    upload_file(temp_path, S3_EVENTS_KEY, config=cfg)
-    temp_path.unlink(missing_ok=True)
-    return S3_EVENTS_KEY
+    key = events_key(file_format, compression)
+    stream_upload(
+        source,
+        key,
+        part_size=part_size,
+        concurrency=concurrency,
+        compression=compression,
+        config=cfg,
+    )
+    return key
+
+
+@instrumented
+def export_events_to_s3(
+    *,
+    file_format: str = "native",
+    source_table: str = TABULAR_TABLE,
+    row_group_rows: int = DEFAULT_ROW_GROUP_ROWS,
+    parquet_compression: str = DEFAULT_PARQUET_COMPRESSION,
+    config: Optional[AppConfig] = None,
+) -> str:
+    """Have ClickHouse write ``source_table`` to S3 in any supported format."""
+    cfg = config or load_config()
+    fmt = _resolve_format(file_format)
+    key = events_key(file_format)
+    url = _build_s3_url(key, cfg)
+
+    with client_session(cfg) as client:
+        client.execute(
+            f"""
+            INSERT INTO FUNCTION s3('{url}', '{cfg.s3.access_key}', '{cfg.s3.secret_key}', '{fmt.name}')
+            SELECT event_id, event_time, customer_id, event_type, amount FROM {source_table}
+            """,
+            settings={
+                "s3_truncate_on_insert": 1,
+                "output_format_parquet_row_group_size": row_group_rows,
+                "output_format_parquet_compression_method": parquet_compression,
+            },
+        )
+    return key
+
+
+def _partition_path(partition_by: Sequence[str], values: Sequence) -> str:
+    return "/".join(f"{name}={value}" for name, value in zip(partition_by, values))
+
+
+@instrumented
+def stage_partitioned_dataset(
+    *,
+    partition_by: Sequence[str] = ("event_date",),
+    file_format: str = "parquet",
+    parquet_compression: str = DEFAULT_PARQUET_COMPRESSION,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    chunks: Optional[Iterable[pd.DataFrame]] = None,
+    concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+    config: Optional[AppConfig] = None,
+) -> list[str]:
+    """Stage events under Hive-style ``key=value/`` prefixes so scans can skip whole objects.
+
+    Every input chunk writes one object per partition it touches. Partition
+    columns live only in the object path, where ClickHouse exposes them
+    through ``use_hive_partitioning``.
+    """
+    unknown = set(partition_by) - set(PARTITION_COLUMNS)
+    if unknown:
+        raise ValueError(f"Unsupported partition columns {sorted(unknown)}. Expected a subset of {PARTITION_COLUMNS}.")
+    if file_format not in {"csv", "parquet"}:
+        raise ValueError("Partitioned staging supports 'csv' and 'parquet'.")
+
+    cfg = config or load_config()
+    s3 = build_s3_client(cfg)
+    ensure_bucket_exists(s3, config=cfg)
+    fmt = _resolve_format(file_format)
+    source_chunks = chunks if chunks is not None else iter_tabular_events(chunk_rows=chunk_rows, config=cfg)
+
+    def encode(frame: pd.DataFrame) -> bytes:
+        if file_format == "csv":
+            return _csv_bytes(frame)
+        return b"".join(
+            _iter_parquet_bytes([frame], row_group_rows=max(len(frame), 1), compression=parquet_compression)
+        )
+
+    keys: list[str] = []
+    with ThreadPoolExecutor(max_workers=concurrency) as executor:
+        for chunk_index, chunk in enumerate(source_chunks):
+            chunk = chunk.assign(event_date=chunk["event_time"].dt.strftime("%Y-%m-%d"))
+            uploads = []
+            for values, group in chunk.groupby(list(partition_by), observed=True, sort=True):
+                values = values if isinstance(values, tuple) else (values,)
+                key = f"{S3_PARTITIONED_PREFIX}{_partition_path(partition_by, values)}/part-{chunk_index:05d}{fmt.suffix}"
+                body = encode(group.drop(columns=[*partition_by, "event_date"], errors="ignore"))
+                uploads.append(executor.submit(stream_upload, [body], key, client=s3, config=cfg))
+                keys.append(key)
+            # Waiting per chunk keeps at most one chunk's worth of encoded objects in memory.
+            for upload in uploads:
+                upload.result()
+    return keys
 
 
 def _build_s3_url(key: str, cfg: AppConfig) -> str:
@@ -31,27 +303,138 @@ def _build_s3_url(key: str, cfg: AppConfig) -> str:
     return f"{base}/{cfg.s3.bucket}/{key}"
 
 
-def query_s3_dataset(*, config: Optional[AppConfig] = None) -> Iterable[tuple]:
+def _format_for_key(key: str) -> S3Format:
+    stem = key
+    for suffix in COMPRESSION_SUFFIXES.values():
+        stem = stem.removesuffix(suffix)
+    for fmt in S3_FORMATS.values():
+        if stem.endswith(fmt.suffix):
+            return fmt
+    raise ValueError(f"Cannot infer S3 format from key '{key}'")
+
+
+def s3_table_function(key: str, *, file_format: Optional[str] = None, config: Optional[AppConfig] = None) -> str:
+    cfg = config or load_config()
+    fmt = _resolve_format(file_format) if file_format else _format_for_key(key)
+    return f"s3('{_build_s3_url(key, cfg)}', '{cfg.s3.access_key}', '{cfg.s3.secret_key}', '{fmt.name}')"
+
+
+def s3_dataset_query(
+    *,
+    key: str = S3_EVENTS_KEY,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    params: Optional[dict] = None,
+    limit: Optional[int] = None,
+    config: Optional[AppConfig] = None,
+) -> tuple[str, dict]:
+    """Build a scan of a staged object that reads only ``columns`` and rows matching ``where``.
+
+    ``where`` is a SQL predicate that may reference ``%(name)s`` placeholders
+    from ``params``. Parquet and Native objects only decode the selected
+    columns, and Parquet row groups whose statistics rule out ``where`` are skipped.
+    """
+    select = ", ".join(columns) if columns else "*"
+    query = f"SELECT {select} FROM {s3_table_function(key, config=config)}"
+    if where:
+        query += f" WHERE {where}"
+    query_params = dict(params or {})
+    if limit is not None:
+        query += " LIMIT %(limit)s"
+        query_params["limit"] = int(limit)
+    return query, query_params
+
+
+@instrumented
+def query_s3_dataset(
+    *,
+    key: str = S3_EVENTS_KEY,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    params: Optional[dict] = None,
+    limit: Optional[int] = None,
+    result_format: str = "rows",
+    config: Optional[AppConfig] = None,
+) -> Any:
     cfg = config or load_config()
-    url = _build_s3_url(S3_EVENTS_KEY, cfg)
+    query, query_params = s3_dataset_query(
+        key=key, columns=columns, where=where, params=params, limit=limit, config=cfg
+    )
+    return fetch(query, query_params, result_format=result_format, config=cfg)
 
+
+def iter_s3_dataset(
+    *,
+    key: str = S3_EVENTS_KEY,
+    columns: Optional[Sequence[str]] = None,
+    where: Optional[str] = None,
+    params: Optional[dict] = None,
+    max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+    config: Optional[AppConfig] = None,
+) -> Iterator[tuple]:
+    """Stream the rows of a staged object block by block instead of materializing the scan."""
+    cfg = config or load_config()
+    query, query_params = s3_dataset_query(key=key, columns=columns, where=where, params=params, config=cfg)
+    return execute_iter(query, query_params, max_block_size=max_block_size, config=cfg)
+
+
+def partitioned_events_query(
+    *,
+    start_date: date,
+    end_date: date,
+    event_types: Optional[Sequence[str]] = None,
+    select: str = "*",
+    file_format: str = "parquet",
+    config: Optional[AppConfig] = None,
+) -> tuple[str, dict]:
+    fmt = _resolve_format(file_format)
+    source = s3_table_function(f"{S3_PARTITIONED_PREFIX}**{fmt.suffix}", config=config)
+    # Predicates on Hive partition columns are evaluated per object path, so non-matching objects are never read.
+    conditions = ["toDate(event_date) BETWEEN %(start_date)s AND %(end_date)s"]
+    params: dict = {"start_date": start_date, "end_date": end_date}
+    if event_types:
+        conditions.append("event_type IN %(event_types)s")
+        params["event_types"] = tuple(event_types)
+    query = f"SELECT {select} FROM {source} WHERE {' AND '.join(conditions)} SETTINGS use_hive_partitioning = 1"
+    return query, params
+
+
+@instrumented
+def query_partitioned_events(
+    *,
+    start_date: date,
+    end_date: date,
+    event_types: Optional[Sequence[str]] = None,
+    file_format: str = "parquet",
+    config: Optional[AppConfig] = None,
+) -> Iterable[tuple]:
+    cfg = config or load_config()
+    query, params = partitioned_events_query(
+        start_date=start_date, end_date=end_date, event_types=event_types, file_format=file_format, config=cfg
+    )
     with client_session(cfg) as client:
-        return client.execute(
-            f"SELECT * FROM s3('{url}', '{cfg.s3.access_key}', '{cfg.s3.secret_key}', 'CSVWithNames')"
-        )
+        return client.execute(query, params)
 
 
-def create_s3_mapped_table(*, table_name: str = "s3_events", config: Optional[AppConfig] = None) -> None:
+@instrumented
+def create_s3_mapped_table(
+    *,
+    table_name: str = "s3_events",
+    file_format: str = "csv",
+    partition_by: Sequence[str] = (),
+    config: Optional[AppConfig] = None,
+) -> None:
     cfg = config or load_config()
-    url = _build_s3_url("datasets/events_*.csv", cfg)
+    fmt = _resolve_format(file_format)
+    if partition_by:
+        # Partition columns are exposed as virtual columns when queried with use_hive_partitioning = 1.
+        url = _build_s3_url(f"{S3_PARTITIONED_PREFIX}**{fmt.suffix}", cfg)
+    else:
+        url = _build_s3_url(f"{S3_DATASET_PREFIX}*events*{fmt.suffix}*", cfg)
+    columns = "" if fmt.self_describing else f"(\n{_columns_sql(exclude=partition_by)}\n)"
     ddl = f"""
-    CREATE TABLE IF NOT EXISTS {table_name} (
-        event_id UInt32,
-        event_time DateTime('UTC'),
-        customer_id UInt32,
-        event_type String,
-        amount Decimal(10, 2)
-    ) ENGINE = S3('{url}', '{cfg.s3.access_key}', '{cfg.s3.secret_key}', 'CSVWithNames')
+    CREATE TABLE IF NOT EXISTS {table_name} {columns}
+    ENGINE = S3('{url}', '{cfg.s3.access_key}', '{cfg.s3.secret_key}', '{fmt.name}')
     """
 
     with client_session(cfg) as client:
@@ -1,61 +1,293 @@
 from __future__ import annotations
 
-from typing import Iterable, Optional
+import hashlib
+from datetime import datetime
+from typing import Any, Iterator, Optional, Tuple
 
+import numpy as np
 import pandas as pd
 
-from .clickhouse import client_session
+from .clickhouse import DEFAULT_MAX_BLOCK_SIZE, client_session, execute_iter, fetch
 from .config import AppConfig, load_config
-from .datasets import load_tabular_events
+from .datasets import DEFAULT_CHUNK_ROWS, iter_tabular_events
+from .instrumentation import instrumented
+from .query_cache import invalidate
 
 TABULAR_TABLE = "events"
+WATERMARK_TABLE = "load_watermarks"
+DEFAULT_LOAD_SOURCE = "sample"
 
-CREATE_TABLE_SQL = f"""
-CREATE TABLE IF NOT EXISTS {TABULAR_TABLE} (
-    event_id UInt32,
+
+def _create_table_sql(table: str) -> str:
+    # Monthly partitions mean a load of new events only ever writes parts for the months it
+    # touches. The deduplication window lets retried inserts with the same token be dropped.
+    return f"""
+    CREATE TABLE IF NOT EXISTS {table} (
+        event_id UInt32,
+        event_time DateTime('UTC'),
+        customer_id UInt32,
+        event_type LowCardinality(String),
+        amount Decimal(10, 2)
+    ) ENGINE = MergeTree
+    PARTITION BY toYYYYMM(event_time)
+    ORDER BY (event_time, event_id)
+    SETTINGS non_replicated_deduplication_window = 1000
+    """
+
+
+CREATE_TABLE_SQL = _create_table_sql(TABULAR_TABLE)
+
+CREATE_WATERMARK_TABLE_SQL = f"""
+CREATE TABLE IF NOT EXISTS {WATERMARK_TABLE} (
+    table_name LowCardinality(String),
+    source String,
     event_time DateTime('UTC'),
-    customer_id UInt32,
-    event_type LowCardinality(String),
-    amount Decimal(10, 2)
-) ENGINE = MergeTree
-ORDER BY (event_time, event_id)
+    event_id UInt32,
+    updated_at DateTime64(3, 'UTC') DEFAULT now64(3)
+) ENGINE = ReplacingMergeTree(updated_at)
+ORDER BY (table_name, source)
 """
 
+Watermark = Tuple[pd.Timestamp, int]
 
+DEFAULT_INSERT_BLOCK_SIZE = 100_000
+INSERT_MODES = ("columnar", "rows")
+
+# Decimal(10, 2) has no NumPy column type in clickhouse-driver, so amounts travel
+# as exact Int64 cents and are rescaled server-side through input().
+COLUMNAR_INSERT_SQL = f"""
+INSERT INTO {TABULAR_TABLE} (event_id, event_time, customer_id, event_type, amount)
+SELECT event_id, event_time, customer_id, event_type, toDecimal64(amount_cents, 2) / 100
+FROM input('event_id UInt32, event_time DateTime(\\'UTC\\'), customer_id UInt32, event_type String, amount_cents Int64')
+"""
+
+
+@instrumented
 def ensure_table(*, config: Optional[AppConfig] = None) -> None:
     cfg = config or load_config()
     with client_session(cfg) as client:
+        rows = client.execute(
+            "SELECT partition_key FROM system.tables WHERE database = currentDatabase() AND name = %(table)s",
+            {"table": TABULAR_TABLE},
+        )
+        if rows and not rows[0][0]:
+            # Tables created before monthly partitioning are copied into the new layout and swapped in.
+            staging = f"{TABULAR_TABLE}_partitioned"
+            client.execute(f"DROP TABLE IF EXISTS {staging}")
+            client.execute(_create_table_sql(staging))
+            client.execute(f"INSERT INTO {staging} SELECT * FROM {TABULAR_TABLE}")
+            client.execute(f"EXCHANGE TABLES {staging} AND {TABULAR_TABLE}")
+            client.execute(f"DROP TABLE {staging}")
         client.execute(CREATE_TABLE_SQL)
+        client.execute(CREATE_WATERMARK_TABLE_SQL)
 
 
-def load_sample_data(*, config: Optional[AppConfig] = None) -> int:
-    cfg = config or load_config()
-    df = load_tabular_events(config=cfg)
-    df["event_time"] = pd.to_datetime(df["event_time"], utc=True)
-    rows = [
+def _columnar_frame(df: pd.DataFrame) -> pd.DataFrame:
+    amounts = df["amount"].to_numpy(dtype=np.float64)
+    event_times = pd.to_datetime(df["event_time"], utc=True).dt.tz_localize(None)
+    return pd.DataFrame(
+        {
+            "event_id": df["event_id"].to_numpy(dtype=np.uint32),
+            # Integer epoch seconds are written to DateTime columns without any per-row conversion.
+            "event_time": event_times.to_numpy(dtype="datetime64[s]").astype(np.uint32),
+            "customer_id": df["customer_id"].to_numpy(dtype=np.uint32),
+            "event_type": df["event_type"].to_numpy(dtype=object),
+            # Source amounts carry two decimals; rounding the scaled value is exact within Decimal(10, 2).
+            "amount_cents": np.rint(amounts * 100).astype(np.int64),
+        }
+    )
+
+
+def _row_payload(df: pd.DataFrame) -> list[tuple]:
+    event_times = pd.to_datetime(df["event_time"], utc=True)
+    return [
         (
             int(row.event_id),
-            row.event_time.to_pydatetime(),
+            event_time.to_pydatetime(),
             int(row.customer_id),
             str(row.event_type),
             float(row.amount),
         )
-        for row in df.itertuples(index=False)
+        for row, event_time in zip(df.itertuples(index=False), event_times)
     ]
 
+
+def deduplication_token(df: pd.DataFrame) -> str:
+    """Derive an insert deduplication token from the content of ``df``.
+
+    Re-sending the same rows yields the same token, so ClickHouse drops a
+    retried batch instead of inserting it twice.
+    """
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(pd.util.hash_pandas_object(df, index=False).to_numpy().tobytes())
+    return digest.hexdigest()
+
+
+@instrumented
+def insert_events(
+    df: pd.DataFrame,
+    *,
+    mode: str = "columnar",
+    block_size: int = DEFAULT_INSERT_BLOCK_SIZE,
+    dedup_token: Optional[str] = None,
+    config: Optional[AppConfig] = None,
+) -> int:
+    if mode not in INSERT_MODES:
+        raise ValueError(f"Unknown insert mode '{mode}'. Expected one of {INSERT_MODES}.")
+    if df.empty:
+        return 0
+
+    cfg = config or load_config()
+    settings: dict = {"insert_block_size": block_size}
+    if dedup_token is not None:
+        settings["insert_deduplication_token"] = dedup_token
     with client_session(cfg) as client:
-        client.execute(f"TRUNCATE TABLE IF EXISTS {TABULAR_TABLE}")
-        client.execute(
-            f"INSERT INTO {TABULAR_TABLE} (event_id, event_time, customer_id, event_type, amount) VALUES",
-            rows,
+        if mode == "columnar":
+            inserted = client.insert_dataframe(
+                COLUMNAR_INSERT_SQL,
+                _columnar_frame(df),
+                settings={"use_numpy": True, **settings},
+            )
+        else:
+            inserted = client.execute(
+                f"INSERT INTO {TABULAR_TABLE} (event_id, event_time, customer_id, event_type, amount) VALUES",
+                _row_payload(df),
+                settings=settings,
+            )
+    invalidate(TABULAR_TABLE, config=cfg)
+    return inserted
+
+
+@instrumented
+def read_watermark(
+    *, source: str = DEFAULT_LOAD_SOURCE, config: Optional[AppConfig] = None
+) -> Optional[Watermark]:
+    """Return the ``(event_time, event_id)`` of the newest event loaded from ``source``."""
+    cfg = config or load_config()
+    with client_session(cfg) as client:
+        rows = client.execute(
+            f"SELECT event_time, event_id FROM {WATERMARK_TABLE} FINAL "
+            "WHERE table_name = %(table)s AND source = %(source)s",
+            {"table": TABULAR_TABLE, "source": source},
         )
-    return len(rows)
+    if not rows:
+        return None
+    event_time, event_id = rows[0]
+    timestamp = pd.Timestamp(event_time)
+    return (timestamp.tz_localize("UTC") if timestamp.tzinfo is None else timestamp, int(event_id))
 
 
-def fetch_events(*, limit: int = 20, config: Optional[AppConfig] = None) -> Iterable[tuple]:
+@instrumented
+def write_watermark(
+    watermark: Watermark, *, source: str = DEFAULT_LOAD_SOURCE, config: Optional[AppConfig] = None
+) -> None:
     cfg = config or load_config()
+    event_time, event_id = watermark
     with client_session(cfg) as client:
-        return client.execute(
-            f"SELECT event_id, event_time, customer_id, event_type, amount FROM {TABULAR_TABLE} ORDER BY event_time DESC LIMIT %(limit)s",
-            {"limit": limit},
+        client.execute(
+            f"INSERT INTO {WATERMARK_TABLE} (table_name, source, event_time, event_id) VALUES",
+            [(TABULAR_TABLE, source, event_time.to_pydatetime(), int(event_id))],
         )
+
+
+def _after_watermark(df: pd.DataFrame, watermark: Optional[Watermark]) -> pd.DataFrame:
+    if watermark is None:
+        return df
+    event_time, event_id = watermark
+    times = pd.to_datetime(df["event_time"], utc=True)
+    newer = (times > event_time) | ((times == event_time) & (df["event_id"] > event_id))
+    return df[newer.to_numpy()]
+
+
+def _chunk_watermark(df: pd.DataFrame) -> Watermark:
+    times = pd.to_datetime(df["event_time"], utc=True)
+    last = np.lexsort((df["event_id"].to_numpy(), times.to_numpy()))[-1]
+    return times.iloc[last], int(df["event_id"].iloc[last])
+
+
+@instrumented
+def load_sample_data(
+    *,
+    config: Optional[AppConfig] = None,
+    mode: str = "columnar",
+    block_size: int = DEFAULT_INSERT_BLOCK_SIZE,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    incremental: bool = False,
+    source: str = DEFAULT_LOAD_SOURCE,
+) -> int:
+    """Load the events CSV and return the number of rows inserted.
+
+    By default the table is truncated and reloaded. With ``incremental=True``
+    only rows newer than the stored ``(event_time, event_id)`` watermark for
+    ``source`` are inserted, each chunk under a content-derived deduplication
+    token. The watermark only moves once every chunk has been written, so a
+    failed load can simply be re-run: chunks that already landed are dropped
+    by the server as duplicates.
+    """
+    cfg = config or load_config()
+
+    watermark = read_watermark(source=source, config=cfg) if incremental else None
+    if not incremental:
+        from .rollups import truncate_rollups
+
+        with client_session(cfg) as client:
+            client.execute(f"TRUNCATE TABLE IF EXISTS {TABULAR_TABLE}")
+        # Truncating the source does not reach materialized-view targets; the reload refills them.
+        truncate_rollups(config=cfg)
+        invalidate(TABULAR_TABLE, config=cfg)
+
+    # Only one CSV chunk is resident at a time, so memory stays flat regardless of file size.
+    inserted = 0
+    newest = watermark
+    for chunk in iter_tabular_events(chunk_rows=chunk_rows, config=cfg):
+        chunk = _after_watermark(chunk, watermark)
+        if chunk.empty:
+            continue
+        token = deduplication_token(chunk) if incremental else None
+        inserted += insert_events(chunk, mode=mode, block_size=block_size, dedup_token=token, config=cfg)
+        newest = max(newest, _chunk_watermark(chunk)) if newest is not None else _chunk_watermark(chunk)
+
+    if newest is not None and newest != watermark:
+        write_watermark(newest, source=source, config=cfg)
+    return inserted
+
+
+EVENTS_SELECT_SQL = f"SELECT event_id, event_time, customer_id, event_type, amount FROM {TABULAR_TABLE}"
+
+
+@instrumented
+def fetch_events(
+    *, limit: int = 20, result_format: str = "rows", config: Optional[AppConfig] = None
+) -> Any:
+    """Return the newest events as tuples, or columnar via ``result_format`` (see ``clickhouse.fetch``)."""
+    return fetch(
+        f"{EVENTS_SELECT_SQL} ORDER BY event_time DESC LIMIT %(limit)s",
+        {"limit": limit},
+        result_format=result_format,
+        cache_tables=(TABULAR_TABLE,),
+        config=config,
+    )
+
+
+def iter_events(
+    *,
+    start: Optional[datetime] = None,
+    end: Optional[datetime] = None,
+    max_block_size: int = DEFAULT_MAX_BLOCK_SIZE,
+    config: Optional[AppConfig] = None,
+) -> Iterator[tuple]:
+    """Stream events in primary-key order, optionally bounded to ``[start, end)``."""
+    conditions, params = [], {}
+    if start is not None:
+        conditions.append("event_time >= %(start)s")
+        params["start"] = start
+    if end is not None:
+        conditions.append("event_time < %(end)s")
+        params["end"] = end
+    where = f" WHERE {' AND '.join(conditions)}" if conditions else ""
+    return execute_iter(
+        f"{EVENTS_SELECT_SQL}{where} ORDER BY event_time, event_id",
+        params,
+        max_block_size=max_block_size,
+        config=config,
+    )
@@ -1,77 +1,1322 @@
 from __future__ import annotations
 
-from typing import Iterable, List, Optional, Sequence, Tuple
+import hashlib
+import re
+import time
+import warnings
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from contextvars import copy_context
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
 
-from .clickhouse import client_session
+import numpy as np
+
+from .clickhouse import client_session, fetch, get_http_client
 from .config import AppConfig, load_config
-from .datasets import VectorRecord, load_vector_items
+from .datasets import VectorDataset, VectorRecord, load_vector_items
+from .instrumentation import instrumented, track_http
+from .query_cache import invalidate, server_identity
 
 VECTOR_TABLE = "item_vectors"
+VECTOR_INDEX_NAME = "idx_embedding_hnsw"
+TEXT_INDEX_NAME = "idx_text_tokens"
+SEARCH_MODES = ("ann", "exact")
+FILTER_STRATEGIES = ("auto", "prefilter", "ann")
+DEFAULT_BRUTE_FORCE_ROWS = 50_000
+DEFAULT_MAX_OVERSAMPLE = 64
+HNSW_DEFAULT_CANDIDATES = 256
+RERANK_MODES = (None, "local", "server")
+FUSION_MODES = ("rrf", "weighted")
+DEFAULT_RRF_K = 60
+DEFAULT_HYBRID_DEPTH = 50
+# Searches over-fetch this many candidates per requested row so superseded versions can be dropped.
+STALE_OVERSAMPLE = 2
+MAX_STALE_OVERSAMPLE = 32
+# ClickHouse's default max_limit_for_vector_search_queries: an ANN query with a larger LIMIT
+# silently skips the vector index and scans the whole table.
+MAX_ANN_LIMIT = 1000
+# ClickHouse's default max_query_size; batched searches raise it to fit their vector literals.
+DEFAULT_MAX_QUERY_SIZE = 262144
+MAX_QUERY_TOKENS = 16
+INSERT_MODES = ("columnar", "rows")
+DEFAULT_VECTOR_BLOCK_ROWS = 50_000
+DISTANCE_FUNCTIONS = {"cosine": "cosineDistance", "l2": "L2Distance"}
+QUANTIZATIONS = ("f64", "f32", "f16", "bf16", "i8", "b1")
+# hasToken splits on ASCII characters other than letters and digits; non-ASCII characters stay inside tokens.
+_TOKEN_PATTERN = re.compile(r"[0-9a-z\u0080-\U0010ffff]+")
+_HASH_PRIME = np.uint64(0x100000001B3)
+# Current columns and the value used when migrating a table that predates them.
+_MIGRATED_COLUMNS = {
+    "item_id": "item_id",
+    "category": "''",
+    "embedding": "embedding",
+    "text": "''",
+    "content_hash": "0",
+    "version": "0",
+    "is_deleted": "0",
+}
+_HASH_BLOCK_ROWS = 65_536
+_INDEX_NOT_USED = f"{VECTOR_INDEX_NAME} is not used by this query; it would run as a brute-force scan"
+# Whether the ANN query shape uses the index, per server, database, user, table and rerank mode.
+_INDEX_CHECKS: Dict[tuple, bool] = {}
+
+
+@dataclass(frozen=True)
+class VectorIndexProfile:
+    """Storage and HNSW build parameters for one vector table.
+
+    ``None`` for ``quantization``, ``m`` and ``ef_construction`` keeps the
+    server defaults (bf16, 32, 128). Non-default profiles get their own table so
+    several can be compared side by side.
+    """
+
+    name: str = "default"
+    distance: str = "cosine"
+    quantization: Optional[str] = None
+    m: Optional[int] = None
+    ef_construction: Optional[int] = None
+    codec: str = "NONE"
+
+    def __post_init__(self) -> None:
+        if self.distance not in DISTANCE_FUNCTIONS:
+            raise ValueError(f"Unknown distance '{self.distance}'. Expected one of {sorted(DISTANCE_FUNCTIONS)}.")
+        if self.quantization is not None and self.quantization not in QUANTIZATIONS:
+            raise ValueError(f"Unknown quantization '{self.quantization}'. Expected one of {QUANTIZATIONS}.")
+
+    @property
+    def table(self) -> str:
+        return VECTOR_TABLE if self.name == "default" else f"{VECTOR_TABLE}_{self.name}"
+
+    @property
+    def distance_function(self) -> str:
+        return DISTANCE_FUNCTIONS[self.distance]
+
+    def index_type_sql(self, dimension: int) -> str:
+        args = f"'hnsw', '{self.distance_function}', {dimension}"
+        if (self.quantization, self.m, self.ef_construction) != (None, None, None):
+            # The build parameters are positional, so all three are spelled out once any is set.
+            args += f", '{self.quantization or 'bf16'}', {self.m or 32}, {self.ef_construction or 128}"
+        return f"vector_similarity({args})"
+
+
+DEFAULT_INDEX_PROFILE = VectorIndexProfile()
+
+INDEX_PROFILES = {
+    profile.name: profile
+    for profile in (
+        DEFAULT_INDEX_PROFILE,
+        VectorIndexProfile(name="f32", quantization="f32"),
+        VectorIndexProfile(name="f16", quantization="f16"),
+        VectorIndexProfile(name="i8", quantization="i8"),
+        VectorIndexProfile(name="b1", quantization="b1"),
+        VectorIndexProfile(name="bf16_m16", quantization="bf16", m=16, ef_construction=64),
+        VectorIndexProfile(name="bf16_m64", quantization="bf16", m=64, ef_construction=256),
+        VectorIndexProfile(name="l2", distance="l2"),
+        VectorIndexProfile(name="f32_zstd", quantization="f32", codec="ZSTD(1)"),
+    )
+}
+
+
+class IndexNotUsedError(RuntimeError):
+    """Raised when an ANN search would silently fall back to a full scan."""
+
+
+@dataclass(frozen=True)
+class IndexUsage:
+    used: bool
+    granules_selected: Optional[int]
+    granules_total: Optional[int]
+    plan: str
+
+    @property
+    def granules_skipped(self) -> Optional[int]:
+        if self.granules_total is None or self.granules_selected is None:
+            return None
+        return self.granules_total - self.granules_selected
+
+
+@dataclass(frozen=True)
+class BatchSearchResult:
+    """Top-k matches per query; row ``i`` holds the results for query ``i``.
+
+    Queries with fewer than ``k`` matches are padded with ``-1`` ids, empty
+    categories, and ``nan`` distances.
+    """
+
+    item_ids: np.ndarray
+    categories: np.ndarray
+    distances: np.ndarray
+
+
+@dataclass(frozen=True)
+class FilteredSearchResult:
+    """Rows of a filtered search and how they were found.
+
+    ``strategy`` is ``"prefilter"`` (exact scan of the matching rows) or
+    ``"ann"`` (index candidates filtered afterwards); ``oversample`` is the
+    final ANN candidate multiple and ``rounds`` the number of queries it took.
+    The row counts are ``None`` when a forced prefilter skipped the estimate.
+    """
+
+    rows: List[tuple]
+    strategy: str
+    matching_rows: Optional[int]
+    total_rows: Optional[int]
+    oversample: int
+    rounds: int
+
+    @property
+    def selectivity(self) -> Optional[float]:
+        if self.matching_rows is None or self.total_rows is None:
+            return None
+        return self.matching_rows / self.total_rows if self.total_rows else 0.0
+
+
+@dataclass(frozen=True)
+class HybridSearchResult:
+    """Fused ranking of a hybrid search together with each stage's own rows.
+
+    ``rows`` are ``(item_id, category, score)`` with the highest fused score
+    first. ``lexical`` rows score the number of query terms matched and
+    ``vector`` rows carry the index distance. ``timings`` holds seconds per
+    stage (``embed``, ``lexical``, ``vector``, ``fusion``, ``total``); the
+    lexical and vector stages run concurrently, so they overlap.
+    """
+
+    rows: List[tuple]
+    lexical: List[tuple]
+    vector: List[tuple]
+    timings: Dict[str, float]
+
+
+@dataclass(frozen=True)
+class VectorDiff:
+    """Item ids that differ between a source dataset and the live rows of a vector table."""
+
+    added: np.ndarray
+    changed: np.ndarray
+    removed: np.ndarray
+
+    @property
+    def upserts(self) -> np.ndarray:
+        return np.sort(np.concatenate([self.added, self.changed]))
+
+    @property
+    def is_empty(self) -> bool:
+        return not (self.added.size or self.changed.size or self.removed.size)
 
 
 def _ensure_records(records: Sequence[VectorRecord]) -> Sequence[VectorRecord]:
     if not records:
         raise ValueError(
-            "Vector dataset is empty. Run python/scripts/generate_vector_dataset.py to populate assets/data/vector_items.jsonl."
+            "Vector dataset is empty. Run python/scripts/generate_vector_dataset.py to populate assets/data/vector_items.npy."
         )
     return records
 
 
-def _create_table_sql(dimension: int) -> str:
+def _create_table_sql(
+    dimension: int, profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE, table: Optional[str] = None
+) -> str:
+    # Each write is a new version of its item_id; background merges keep the highest
+    # version and drop items whose latest version is a tombstone (is_deleted = 1).
+    # Sorting by category first lets a category filter read only that category's granules.
     return f"""
-    CREATE TABLE IF NOT EXISTS {VECTOR_TABLE} (
+    CREATE TABLE IF NOT EXISTS {table or profile.table} (
         item_id UInt32,
         category LowCardinality(String),
-        embedding Array(Float32) CODEC(NONE),
+        embedding Array(Float32) CODEC({profile.codec}),
+        text String DEFAULT '' CODEC(ZSTD(1)),
+        content_hash UInt64,
+        version UInt64,
+        is_deleted UInt8 DEFAULT 0,
         CONSTRAINT embedding_length CHECK length(embedding) = {dimension},
-        INDEX idx_embedding_hnsw embedding TYPE vector_similarity('hnsw', 'cosineDistance', {dimension}) GRANULARITY 1
-    ) ENGINE = MergeTree
-    ORDER BY item_id
+        INDEX {VECTOR_INDEX_NAME} embedding TYPE {profile.index_type_sql(dimension)} GRANULARITY 1,
+        INDEX {TEXT_INDEX_NAME} lowerUTF8(text) TYPE tokenbf_v1(262144, 3, 0) GRANULARITY 1
+    ) ENGINE = ReplacingMergeTree(version, is_deleted)
+    ORDER BY (category, item_id)
     """
 
 
-def ensure_table(*, config: Optional[AppConfig] = None, records: Optional[Sequence[VectorRecord]] = None) -> None:
+def _live_rows_filter(profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE, scope: Optional[str] = None) -> str:
+    # Superseded versions and tombstones stay readable until a merge collapses them.
+    # Only item_id and version are scanned here, and ``scope`` limits the version lookup to the
+    # rows it can affect instead of grouping the whole table.
+    where = f" WHERE {scope}" if scope else ""
+    return (
+        f"is_deleted = 0 AND (item_id, version) IN "
+        f"(SELECT item_id, max(version) FROM {profile.table}{where} GROUP BY item_id)"
+    )
+
+
+def _latest_candidates_sql(
+    candidate_sql: str, columns: str, order_by: str, limit: int, profile: VectorIndexProfile
+) -> str:
+    # The candidates must select item_id, version and is_deleted. ClickHouse inlines the CTE, so
+    # the candidate query runs twice, but the version lookup only reads the candidates' item_ids.
+    return f"""
+    WITH candidates AS ({candidate_sql})
+    SELECT {columns}
+    FROM candidates
+    WHERE {_live_rows_filter(profile, "item_id IN (SELECT item_id FROM candidates)")}
+    ORDER BY {order_by}
+    LIMIT {int(limit)}
+    """
+
+
+def _stored_dimension(client, create_query: str, profile: VectorIndexProfile) -> Optional[int]:
+    match = re.search(r"length\(embedding\) = (\d+)", create_query)
+    if match:
+        return int(match.group(1))
+    rows = client.execute(f"SELECT length(embedding) FROM {profile.table} LIMIT 1")
+    return int(rows[0][0]) if rows else None
+
+
+def _table_status(client, dimension: int, profile: VectorIndexProfile) -> str:
+    """Classify the existing table as ``missing``, ``current``, ``outdated`` or ``incompatible``."""
+    rows = client.execute(
+        "SELECT engine, sorting_key, create_table_query FROM system.tables "
+        "WHERE database = currentDatabase() AND name = %(table)s",
+        {"table": profile.table},
+    )
+    if not rows:
+        return "missing"
+    engine, sorting_key, create_query = rows[0]
+    stored = _stored_dimension(client, create_query, profile)
+    if stored is not None and stored != dimension:
+        return "incompatible"
+    if (
+        engine == "ReplacingMergeTree"
+        and sorting_key == "category, item_id"
+        and f"INDEX {TEXT_INDEX_NAME}" in create_query
+    ):
+        return "current"
+    return "outdated"
+
+
+def _migrate_table(client, dimension: int, profile: VectorIndexProfile) -> None:
+    # Tables from an older layout are copied into the current one and swapped in, so rows that
+    # only exist in ClickHouse (e.g. from ingest_texts) survive. Columns the old table lacks get
+    # their defaults; a zero content_hash makes the next sync rewrite those items.
+    existing = {
+        name
+        for (name,) in client.execute(
+            "SELECT name FROM system.columns WHERE database = currentDatabase() AND table = %(table)s",
+            {"table": profile.table},
+        )
+    }
+    columns = ", ".join(_MIGRATED_COLUMNS)
+    select = ", ".join(
+        name if name in existing else f"{default} AS {name}" for name, default in _MIGRATED_COLUMNS.items()
+    )
+    staging = f"{profile.table}_migrating"
+    client.execute(f"DROP TABLE IF EXISTS {staging}")
+    client.execute(_create_table_sql(dimension, profile, table=staging))
+    client.execute(f"INSERT INTO {staging} ({columns}) SELECT {select} FROM {profile.table}")
+    client.execute(f"EXCHANGE TABLES {staging} AND {profile.table}")
+    client.execute(f"DROP TABLE {staging}")
+
+
+@instrumented
+def ensure_table(
+    *,
+    config: Optional[AppConfig] = None,
+    records: Optional[Sequence[VectorRecord]] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    recreate: bool = False,
+) -> None:
+    """Create the profile's vector table, keeping an existing one whose schema still fits.
+
+    A table from an older layout (before versioning, the category sort key or
+    the text column) is migrated in place: its rows are copied into the current
+    schema and the tables are swapped. The table is only dropped when
+    ``recreate`` is set or when its embedding dimension differs from the
+    dataset's, since vectors from another model cannot be searched; the latter
+    warns. Pass ``recreate=True`` after changing a profile's index parameters.
+    """
     cfg = config or load_config()
-    loaded_records = _ensure_records(records or list(load_vector_items(config=cfg)))
+    loaded_records = _ensure_records(records if records is not None else load_vector_items(config=cfg))
     dimension = len(loaded_records[0].vector)
 
     with client_session(cfg) as client:
-        # Recreate the table to guarantee the schema matches the current embedding dimension.
-        client.execute(f"DROP TABLE IF EXISTS {VECTOR_TABLE}")
-        client.execute(_create_table_sql(dimension))
+        status = "missing" if recreate else _table_status(client, dimension, profile)
+        if recreate or status == "incompatible":
+            if status == "incompatible":
+                warnings.warn(
+                    f"Dropping {profile.table}: its embeddings do not have dimension {dimension}",
+                    RuntimeWarning,
+                    stacklevel=2,
+                )
+            client.execute(f"DROP TABLE IF EXISTS {profile.table}")
+        elif status == "outdated":
+            _migrate_table(client, dimension, profile)
+        client.execute(_create_table_sql(dimension, profile))
+    invalidate(profile.table, config=cfg)
+    # A recreated or migrated table has a new index, so the next search checks its plan again.
+    for key in [key for key in _INDEX_CHECKS if key[:-1] == (*server_identity(cfg), profile.table)]:
+        _INDEX_CHECKS.pop(key, None)
 
 
-def load_sample_vectors(*, config: Optional[AppConfig] = None, records: Optional[Sequence[VectorRecord]] = None) -> int:
+def _label_hashes(values: np.ndarray) -> np.ndarray:
+    # Hashing each distinct value once keeps repeated labels (and empty texts) cheap.
+    labels, inverse = np.unique(np.asarray(values, dtype=str), return_inverse=True)
+    seeds = np.array(
+        [int.from_bytes(hashlib.blake2b(label.encode("utf-8"), digest_size=8).digest(), "little") for label in labels],
+        dtype=np.uint64,
+    )
+    return seeds[inverse.reshape(-1)]
+
+
+def content_hashes(categories: np.ndarray, vectors: np.ndarray, texts: Optional[np.ndarray] = None) -> np.ndarray:
+    """Return a uint64 content hash per row of ``(categories, vectors, texts)``.
+
+    Each category and text seeds an FNV-style hash that is folded over the raw
+    float32 bits of its vector, so any changed value, category or text changes
+    the hash. Missing ``texts`` hash like empty strings.
+    """
+    words = np.ascontiguousarray(vectors, dtype=np.float32).view(np.uint32)
+    hashes = _label_hashes(categories)
+    hashes ^= _label_hashes(np.array([""]) if texts is None else texts) * _HASH_PRIME
+    # Row blocks keep the column-wise folding inside cache-sized slices of a memory-mapped matrix.
+    for start in range(0, words.shape[0], _HASH_BLOCK_ROWS):
+        block = hashes[start : start + _HASH_BLOCK_ROWS]
+        for column in words[start : start + _HASH_BLOCK_ROWS].T:
+            block ^= column
+            block *= _HASH_PRIME
+    return hashes
+
+
+@instrumented
+def diff_vectors(
+    dataset: VectorDataset,
+    *,
+    hashes: Optional[np.ndarray] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> VectorDiff:
+    """Compare ``dataset`` with the live rows of the profile's table by content hash."""
     cfg = config or load_config()
-    loaded_records = list(records or load_vector_items(config=cfg))
-    _ensure_records(loaded_records)
-    payload: List[Tuple[int, str, List[float]]] = [
-        (rec.item_id, rec.category, rec.vector) for rec in loaded_records
-    ]
+    if hashes is None:
+        hashes = content_hashes(dataset.categories, dataset.vectors, dataset.texts)
+    with client_session(cfg) as client:
+        rows = client.execute(
+            f"SELECT item_id, content_hash FROM {profile.table} WHERE {_live_rows_filter(profile)}",
+            columnar=True,
+        )
+
+    ids = np.asarray(dataset.item_ids, dtype=np.uint32)
+    current_ids = np.asarray(rows[0] if rows else [], dtype=np.uint32)
+    current_hashes = np.asarray(rows[1] if rows else [], dtype=np.uint64)
+    order = np.argsort(current_ids, kind="stable")
+    current_ids, current_hashes = current_ids[order], current_hashes[order]
+
+    position = np.minimum(np.searchsorted(current_ids, ids), max(len(current_ids) - 1, 0))
+    present = current_ids[position] == ids if len(current_ids) else np.zeros(len(ids), dtype=bool)
+    changed = present & (current_hashes[position] != hashes) if len(current_ids) else present
+    return VectorDiff(
+        added=ids[~present],
+        changed=ids[changed],
+        removed=np.setdiff1d(current_ids, ids),
+    )
+
+
+def _arrow_block(
+    item_ids: np.ndarray, categories: np.ndarray, vectors: np.ndarray, texts: Optional[np.ndarray], version: int
+):
+    import pyarrow as pa
+
+    rows, dimension = vectors.shape
+    flat = np.ascontiguousarray(vectors, dtype=np.float32).reshape(-1)
+    # pa.array wraps the float32 buffer without copying; offsets describe the fixed row stride.
+    offsets = pa.array(np.arange(0, rows * dimension + 1, dimension, dtype=np.int32))
+    embeddings = pa.ListArray.from_arrays(offsets, pa.array(flat))
+    categories = np.asarray(categories, dtype=str)
+    texts = np.asarray(texts, dtype=str) if texts is not None else np.full(rows, "", dtype=str)
+    return pa.Table.from_arrays(
+        [
+            pa.array(np.asarray(item_ids, dtype=np.uint32)),
+            pa.array(categories),
+            embeddings,
+            pa.array(texts),
+            pa.array(content_hashes(categories, vectors, texts)),
+            pa.array(np.full(rows, version, dtype=np.uint64)),
+        ],
+        names=["item_id", "category", "embedding", "text", "content_hash", "version"],
+    )
 
+
+@instrumented
+def insert_vectors(
+    item_ids: np.ndarray,
+    categories: np.ndarray,
+    vectors: np.ndarray,
+    *,
+    texts: Optional[np.ndarray] = None,
+    block_rows: int = DEFAULT_VECTOR_BLOCK_ROWS,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> int:
+    """Insert an ``(n, dim)`` float32 matrix as Arrow blocks over HTTP.
+
+    Each block is a view into ``vectors`` (which may be a memory map), so no
+    per-element Python objects are created and at most one block is encoded at
+    a time. Rows are written as a new version, so an existing ``item_id`` is
+    replaced rather than duplicated; a row it left under another category gets
+    a tombstone. ``texts`` fills the lexically indexed
+    ``text`` column; it is left empty when omitted.
+    """
+    cfg = config or load_config()
+    if vectors.ndim != 2:
+        raise ValueError("vectors must be a 2-D (n, dimension) matrix")
+
+    client = get_http_client(cfg)
+    version = time.time_ns()
+    for start in range(0, vectors.shape[0], block_rows):
+        stop = start + block_rows
+        block_texts = None if texts is None else texts[start:stop]
+        block = _arrow_block(item_ids[start:stop], categories[start:stop], vectors[start:stop], block_texts, version)
+        with track_http(f"INSERT INTO {profile.table} FORMAT Arrow") as (record, settings):
+            client.insert_arrow(profile.table, block, settings=settings)
+            if record is not None:
+                record.rows_sent, record.bytes_sent = block.num_rows, block.nbytes
+    with client_session(cfg) as session:
+        _retire_moved_rows(session, version, profile)
+    invalidate(profile.table, config=cfg)
+    return int(vectors.shape[0])
+
+
+@instrumented
+def delete_vectors(
+    item_ids: Sequence[int],
+    *,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> int:
+    """Soft-delete ``item_ids`` by writing a tombstone version of each live row.
+
+    Tombstones copy the last embedding so the new part's HNSW index stays well
+    formed; they are filtered from searches and dropped by background merges.
+    Returns the number of tombstones written.
+    """
+    ids = [int(item_id) for item_id in item_ids]
+    if not ids:
+        return 0
+    cfg = config or load_config()
     with client_session(cfg) as client:
-        client.execute(f"TRUNCATE TABLE IF EXISTS {VECTOR_TABLE}")
         client.execute(
-            f"INSERT INTO {VECTOR_TABLE} (item_id, category, embedding) VALUES",
-            payload,
+            f"""
+            INSERT INTO {profile.table} (item_id, category, embedding, text, content_hash, version, is_deleted)
+            SELECT item_id, category, embedding, text, content_hash, %(version)s, 1
+            FROM {profile.table} FINAL
+            WHERE is_deleted = 0 AND item_id IN %(ids)s
+            """,
+            {"version": time.time_ns(), "ids": tuple(ids)},
         )
+        written = int(client.last_query.progress.written_rows)
+    invalidate(profile.table, config=cfg)
+    return written
+
 
+def _retire_moved_rows(client, version: int, profile: VectorIndexProfile) -> None:
+    # Rows are replaced per (category, item_id), so an item written under a new category leaves its
+    # old row under a different key. Every row of one write shares ``version``, which finds the
+    # written items without sending their ids back. A tombstone one version above each older row
+    # that survives under another key lets merges drop it while staying below the new row's version.
+    client.execute(
+        f"""
+        INSERT INTO {profile.table} (item_id, category, embedding, text, content_hash, version, is_deleted)
+        SELECT item_id, category, embedding, text, content_hash, version + 1, 1
+        FROM {profile.table} FINAL
+        WHERE is_deleted = 0 AND version < %(version)s
+          AND item_id IN (SELECT item_id FROM {profile.table} WHERE version = %(version)s)
+        """,
+        {"version": version},
+    )
+
+
+def _insert_rows(client, dataset: VectorDataset, profile: VectorIndexProfile, config: AppConfig) -> int:
+    texts = dataset.texts if dataset.texts is not None else np.full(len(dataset), "", dtype=str)
+    hashes = content_hashes(dataset.categories, dataset.vectors, texts)
+    version = time.time_ns()
+    payload: List[Tuple[int, str, List[float], str, int, int]] = [
+        (int(item_id), str(category), np.asarray(vector, dtype=np.float32).tolist(), str(text), int(digest), version)
+        for item_id, category, vector, text, digest in zip(
+            dataset.item_ids, dataset.categories, dataset.vectors, texts, hashes
+        )
+    ]
+    client.execute(
+        f"INSERT INTO {profile.table} (item_id, category, embedding, text, content_hash, version) VALUES",
+        payload,
+    )
+    _retire_moved_rows(client, version, profile)
+    invalidate(profile.table, config=config)
     return len(payload)
 
 
-def similarity_search(query_vector: List[float], *, limit: int = 3, config: Optional[AppConfig] = None) -> Iterable[tuple]:
+@instrumented
+def sync_vectors(
+    dataset: VectorDataset,
+    *,
+    mode: str = "columnar",
+    block_rows: int = DEFAULT_VECTOR_BLOCK_ROWS,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> VectorDiff:
+    """Bring the profile's table in line with ``dataset``, writing only what changed.
+
+    New and changed items are upserted, items missing from ``dataset`` are
+    soft-deleted, and unchanged rows are not touched, so the HNSW work done by
+    the insert is proportional to the size of the change.
+    """
+    if mode not in INSERT_MODES:
+        raise ValueError(f"Unknown insert mode '{mode}'. Expected one of {INSERT_MODES}.")
+    cfg = config or load_config()
+    hashes = content_hashes(dataset.categories, dataset.vectors, dataset.texts)
+    diff = diff_vectors(dataset, hashes=hashes, profile=profile, config=cfg)
+
+    upserts = diff.upserts
+    if upserts.size:
+        rows = np.flatnonzero(np.isin(dataset.item_ids, upserts))
+        # Fancy indexing copies just the selected rows out of a memory-mapped matrix.
+        changed = dataset[rows] if rows.size < len(dataset) else dataset
+        if mode == "rows":
+            with client_session(cfg) as client:
+                _insert_rows(client, changed, profile, cfg)
+        else:
+            insert_vectors(
+                changed.item_ids,
+                changed.categories,
+                changed.vectors,
+                texts=changed.texts,
+                block_rows=block_rows,
+                profile=profile,
+                config=cfg,
+            )
+    delete_vectors(diff.removed, profile=profile, config=cfg)
+    return diff
+
+
+@instrumented
+def ingest_texts(
+    item_ids: np.ndarray,
+    categories: np.ndarray,
+    texts: Iterable[str],
+    *,
+    batch_size: Optional[int] = None,
+    window: Optional[int] = None,
+    processes: int = 1,
+    cache=None,
+    model_name: Optional[str] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> int:
+    """Embed ``texts`` block by block and insert each block as soon as it is encoded.
+
+    The texts are stored alongside their embeddings for lexical search.
+    ``cache`` is an optional :class:`~warehouse.embedding_cache.EmbeddingCache`.
+    """
+    from .embeddings import DEFAULT_EMBED_BATCH_SIZE, DEFAULT_EMBED_WINDOW, iter_embeddings
+
     cfg = config or load_config()
-    if not query_vector:
+    # Texts are buffered as the encoder pulls them, so at most one window is held until its block is inserted.
+    pending: deque = deque()
+
+    def buffered() -> Iterable[str]:
+        for text in texts:
+            pending.append(text)
+            yield text
+
+    inserted = 0
+    for block in iter_embeddings(
+        buffered(),
+        batch_size=batch_size or DEFAULT_EMBED_BATCH_SIZE,
+        window=window or DEFAULT_EMBED_WINDOW,
+        distance=profile.distance,
+        processes=processes,
+        cache=cache,
+        model_name=model_name,
+        config=cfg,
+    ):
+        stop = inserted + len(block)
+        block_texts = np.asarray([pending.popleft() for _ in range(len(block))], dtype=str)
+        insert_vectors(
+            item_ids[inserted:stop], categories[inserted:stop], block, texts=block_texts, profile=profile, config=cfg
+        )
+        inserted = stop
+    return inserted
+
+
+@instrumented
+def load_sample_vectors(
+    *,
+    config: Optional[AppConfig] = None,
+    records: Optional[Sequence[VectorRecord]] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    mode: str = "columnar",
+    block_rows: int = DEFAULT_VECTOR_BLOCK_ROWS,
+    incremental: bool = True,
+) -> int:
+    """Sync the sample dataset into the profile's table and return the number of rows written.
+
+    With ``incremental=False`` the table is truncated first and every row is
+    rewritten.
+    """
+    if mode not in INSERT_MODES:
+        raise ValueError(f"Unknown insert mode '{mode}'. Expected one of {INSERT_MODES}.")
+    cfg = config or load_config()
+    loaded = records if records is not None else load_vector_items(config=cfg)
+    _ensure_records(loaded)
+    dataset = loaded if isinstance(loaded, VectorDataset) else VectorDataset.from_records(loaded)
+
+    if not incremental:
+        with client_session(cfg) as client:
+            client.execute(f"TRUNCATE TABLE IF EXISTS {profile.table}")
+        invalidate(profile.table, config=cfg)
+    diff = sync_vectors(dataset, mode=mode, block_rows=block_rows, profile=profile, config=cfg)
+    return int(diff.upserts.size)
+
+
+def _vector_literal(vector) -> str:
+    values = np.asarray(vector, dtype=np.float32)
+    # float32 round-trips exactly through 9 significant digits; the cast keeps the constant Array(Float32).
+    body = ",".join(np.format_float_positional(value, precision=9, unique=True, trim="-") for value in values)
+    return f"[{body}]::Array(Float32)"
+
+
+def _search_sql(
+    vector_literal: str,
+    limit: int,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    *,
+    with_embedding: bool = False,
+    exact: bool = False,
+    stale_oversample: int = STALE_OVERSAMPLE,
+) -> str:
+    embedding = ", embedding" if with_embedding else ""
+    distance = f"{profile.distance_function}(embedding, {vector_literal}) AS score{embedding}"
+    if exact:
+        # A brute-force scan reads every row anyway, so the version lookup can cover the whole table.
+        return f"""
+        SELECT item_id, category, {distance}
+        FROM {profile.table}
+        WHERE {_live_rows_filter(profile)}
+        ORDER BY score ASC
+        LIMIT {int(limit)}
+        """
+    # The ANN index is only eligible for a bare ORDER BY <distance>(column, constant) LIMIT n, using
+    # the same distance function the index was built with; a WHERE clause would be applied after the
+    # index picked its candidates. Stale versions are dropped from the over-fetched candidates instead.
+    candidates = f"""
+    SELECT item_id, category, version, is_deleted, {distance}
+    FROM {profile.table}
+    ORDER BY score ASC
+    LIMIT {_candidate_limit(limit, stale_oversample)}
+    """
+    return _latest_candidates_sql(candidates, f"item_id, category, score{embedding}", "score ASC", limit, profile)
+
+
+def _candidate_limit(limit: int, stale_oversample: int) -> int:
+    """The LIMIT of the ANN candidate query: the stale-version margin never pushes it past the index limit."""
+    return max(int(limit), min(int(limit) * stale_oversample, MAX_ANN_LIMIT))
+
+
+def _similarity_sql(
+    vector_literal: str,
+    limit: int,
+    fetch_limit: int,
+    *,
+    mode: str,
+    rerank: Optional[str],
+    stale_oversample: int,
+    profile: VectorIndexProfile,
+) -> str:
+    query = _search_sql(
+        vector_literal,
+        fetch_limit,
+        profile,
+        with_embedding=rerank is not None,
+        exact=mode == "exact",
+        stale_oversample=stale_oversample,
+    )
+    if rerank == "server":
+        query = _server_rerank_sql(query, vector_literal, limit, profile)
+    return query
+
+
+def _needs_wider_search(
+    rows: Sequence[tuple], mode: str, limit: int, fetch_limit: int, rerank: Optional[str], stale_oversample: int
+) -> bool:
+    # Superseded versions and tombstones (which copy the last embedding) can crowd live rows
+    # out of the over-fetched candidates; a short result is retried with a wider candidate set
+    # while widening can still raise the candidate LIMIT without passing MAX_ANN_LIMIT.
+    expected = limit if rerank == "server" else fetch_limit
+    return (
+        mode == "ann"
+        and len(rows) < expected
+        and stale_oversample < MAX_STALE_OVERSAMPLE
+        and _candidate_limit(fetch_limit, stale_oversample) < MAX_ANN_LIMIT
+    )
+
+
+def _row_count_sql(profile: VectorIndexProfile) -> str:
+    # Answered from part metadata; superseded versions and tombstones are counted too.
+    return f"SELECT count() FROM {profile.table}"
+
+
+def _candidates_exhausted(fetch_limit: int, stale_oversample: int, table_rows: int) -> bool:
+    # The candidate query is an unfiltered ORDER BY ... LIMIT, so it returns min(table rows, LIMIT)
+    # rows. Once its LIMIT covers every stored row, a short result is already the complete answer.
+    return _candidate_limit(fetch_limit, stale_oversample) >= table_rows
+
+
+def _server_rerank_sql(candidate_sql: str, vector_literal: str, limit: int, profile: VectorIndexProfile) -> str:
+    # The outer distance is computed on the stored Float32 column, not the quantized index.
+    return f"""
+    SELECT item_id, category, {profile.distance_function}(embedding, {vector_literal}) AS score
+    FROM ({candidate_sql})
+    ORDER BY score ASC
+    LIMIT {int(limit)}
+    """
+
+
+def exact_distances(embeddings: np.ndarray, query_vector: np.ndarray, distance: str = "cosine") -> np.ndarray:
+    embeddings = np.asarray(embeddings, dtype=np.float32)
+    query = np.asarray(query_vector, dtype=np.float32)
+    if distance == "l2":
+        return np.linalg.norm(embeddings - query, axis=1)
+    norms = np.linalg.norm(embeddings, axis=1) * np.linalg.norm(query)
+    return 1.0 - (embeddings @ query) / np.where(norms == 0, 1.0, norms)
+
+
+def _local_rerank(rows: Sequence[tuple], query_vector, limit: int, profile: VectorIndexProfile) -> list[tuple]:
+    if not rows:
+        return []
+    embeddings = np.asarray([row[3] for row in rows], dtype=np.float32)
+    scores = exact_distances(embeddings, query_vector, profile.distance)
+    order = np.argsort(scores, kind="stable")[:limit]
+    return [(rows[i][0], rows[i][1], float(scores[i])) for i in order]
+
+
+def _search_settings(mode: str, candidates: Optional[int]) -> dict:
+    if mode not in SEARCH_MODES:
+        raise ValueError(f"Unknown search mode '{mode}'. Expected one of {SEARCH_MODES}.")
+    if mode == "exact":
+        return {"use_skip_indexes": 0}
+    settings: dict = {}
+    if candidates:
+        settings["hnsw_candidate_list_size_for_search"] = int(candidates)
+    return settings
+
+
+def _parse_index_usage(plan_lines: Sequence[str]) -> IndexUsage:
+    plan = "\n".join(plan_lines)
+    in_index = False
+    for line in plan_lines:
+        # Newer servers draw the plan as a tree, prefixing nested steps with "│".
+        text = line.strip(" │")
+        if text.startswith("Name:"):
+            in_index = text.split(":", 1)[1].strip() == VECTOR_INDEX_NAME
+        elif in_index and text.startswith("Granules:"):
+            selected, total = (int(part) for part in text.split(":", 1)[1].strip().split("/"))
+            return IndexUsage(used=True, granules_selected=selected, granules_total=total, plan=plan)
+    return IndexUsage(used=False, granules_selected=None, granules_total=None, plan=plan)
+
+
+def _explain_index_usage(client, query: str, settings: dict) -> IndexUsage:
+    plan = client.execute(f"EXPLAIN indexes = 1 {query}", settings=settings)
+    return _parse_index_usage([row[0] for row in plan])
+
+
+def _index_check_key(rerank: Optional[str], profile: VectorIndexProfile, config: AppConfig) -> tuple:
+    return (*server_identity(config), profile.table, rerank)
+
+
+def _check_index_once(
+    query: str, settings: dict, rerank: Optional[str], profile: VectorIndexProfile, config: AppConfig
+) -> None:
+    # Every ANN query for a table and rerank mode has the same shape, so the plan is checked on the
+    # first search only and a bypassed index is reported once instead of on every call.
+    key = _index_check_key(rerank, profile, config)
+    if key in _INDEX_CHECKS:
+        return
+    with client_session(config) as client:
+        used = _explain_index_usage(client, query, settings).used
+    _INDEX_CHECKS[key] = used
+    if not used:
+        warnings.warn(_INDEX_NOT_USED, RuntimeWarning, stacklevel=3)
+
+
+@instrumented
+def similarity_search(
+    query_vector: List[float],
+    *,
+    limit: int = 3,
+    mode: str = "ann",
+    candidates: Optional[int] = None,
+    explain: bool = False,
+    strict: bool = False,
+    oversample: int = 1,
+    rerank: Optional[str] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+):
+    """Rank the profile's vector table by its index distance to ``query_vector``.
+
+    ``mode="ann"`` builds the query so the HNSW index is eligible and tunes its
+    candidate list with ``candidates``; ``mode="exact"`` disables skip indexes
+    for a brute-force scan. With ``explain=True`` the rows are returned together
+    with an ``IndexUsage`` report, mirroring ``with_column_types``. In ANN mode a
+    plan that bypasses the index raises ``IndexNotUsedError`` when ``strict`` is
+    set and warns otherwise. Without either flag the plan is checked on the
+    first ANN search per table and rerank mode, and a bypassed index warns once.
+
+    ``rerank`` adds an exact second stage: ``limit * oversample`` candidates are
+    fetched through the index and re-ordered by full-precision distance, either
+    in ClickHouse (``"server"``) or with NumPy on the fetched embeddings
+    (``"local"``).
+    """
+    cfg = config or load_config()
+    if len(query_vector) == 0:
         raise ValueError("Query vector is empty")
+    if rerank not in RERANK_MODES:
+        raise ValueError(f"Unknown rerank mode '{rerank}'. Expected one of {RERANK_MODES}.")
+    if oversample < 1:
+        raise ValueError("oversample must be at least 1")
+
+    settings = _search_settings(mode, candidates)
+    literal = _vector_literal(query_vector)
+    fetch_limit = limit * oversample if rerank else limit
+    stale_oversample = STALE_OVERSAMPLE
+    query = _similarity_sql(
+        literal, limit, fetch_limit, mode=mode, rerank=rerank, stale_oversample=stale_oversample, profile=profile
+    )
+
+    usage = None
+    if explain or strict:
+        with client_session(cfg) as client:
+            usage = _explain_index_usage(client, query, settings)
+            _INDEX_CHECKS[_index_check_key(rerank, profile, cfg)] = usage.used
+            if mode == "ann" and not usage.used:
+                if strict:
+                    raise IndexNotUsedError(_INDEX_NOT_USED)
+                warnings.warn(_INDEX_NOT_USED, RuntimeWarning, stacklevel=2)
+            rows = client.execute(query, settings=settings)
+    else:
+        if mode == "ann":
+            _check_index_once(query, settings, rerank, profile, cfg)
+        rows = fetch(query, settings=settings, cache_tables=(profile.table,), config=cfg)
+    table_rows: Optional[int] = None
+    while _needs_wider_search(rows, mode, limit, fetch_limit, rerank, stale_oversample):
+        if table_rows is None:
+            table_rows = int(fetch(_row_count_sql(profile), cache_tables=(profile.table,), config=cfg)[0][0])
+        if _candidates_exhausted(fetch_limit, stale_oversample, table_rows):
+            break
+        stale_oversample *= 4
+        query = _similarity_sql(
+            literal, limit, fetch_limit, mode=mode, rerank=rerank, stale_oversample=stale_oversample, profile=profile
+        )
+        rows = fetch(query, settings=settings, cache_tables=(profile.table,), config=cfg)
+
+    if rerank == "local":
+        rows = _local_rerank(rows, query_vector, limit, profile)
+    return (rows, usage) if explain else rows
+
+
+def _filter_predicate(
+    categories: Optional[Sequence[str]],
+    item_ids: Optional[Sequence[int]],
+    where: Optional[str],
+    params: Optional[dict],
+) -> Tuple[str, dict]:
+    clauses = []
+    bound = dict(params or {})
+    if categories is not None:
+        clauses.append("category IN %(filter_categories)s")
+        bound["filter_categories"] = tuple(str(category) for category in categories)
+    if item_ids is not None:
+        clauses.append("item_id IN %(filter_item_ids)s")
+        bound["filter_item_ids"] = tuple(int(item_id) for item_id in item_ids)
+    if where:
+        clauses.append(f"({where})")
+    if not clauses:
+        raise ValueError("A filtered search needs at least one of categories, item_ids or where")
+    return " AND ".join(clauses), bound
+
+
+def filter_selectivity(
+    predicate: str,
+    params: Optional[dict] = None,
+    *,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> Tuple[int, int]:
+    """Return ``(matching_rows, total_rows)`` for ``predicate`` over the profile's table.
+
+    Superseded versions are counted too, so this is an estimate. Both counts
+    come back in one round trip: the total is read from part metadata and a
+    category filter only reads the primary-key ranges of its categories. The
+    result is cached with the table's other reads when the query cache is on.
+    """
+    rows = fetch(
+        f"SELECT (SELECT count() FROM {profile.table} WHERE {predicate}), (SELECT count() FROM {profile.table})",
+        params or {},
+        cache_tables=(profile.table,),
+        config=config or load_config(),
+    )
+    matching, total = rows[0]
+    return int(matching), int(total)
+
+
+def _prefilter_sql(vector_literal: str, predicate: str, limit: int, profile: VectorIndexProfile) -> str:
+    # The version lookup covers every row of the matching item_ids, not just the rows matching the
+    # predicate, so a row superseded under another category is never mistaken for the live one.
+    # The predicate itself still prunes by primary key when picking those item_ids.
+    scope = f"item_id IN (SELECT item_id FROM {profile.table} WHERE {predicate})"
+    return f"""
+    SELECT item_id, category, {profile.distance_function}(embedding, {vector_literal}) AS score
+    FROM {profile.table}
+    WHERE {predicate} AND {_live_rows_filter(profile, scope)}
+    ORDER BY score ASC
+    LIMIT {int(limit)}
+    """
+
+
+def _postfilter_sql(candidate_sql: str, predicate: str, limit: int) -> str:
+    # The predicate is applied to the index's candidates, so it may only reference item_id and category.
+    return f"""
+    SELECT item_id, category, score
+    FROM ({candidate_sql})
+    WHERE {predicate}
+    ORDER BY score ASC
+    LIMIT {int(limit)}
+    """
+
+
+@instrumented
+def filtered_search(
+    query_vector: List[float],
+    *,
+    categories: Optional[Sequence[str]] = None,
+    item_ids: Optional[Sequence[int]] = None,
+    where: Optional[str] = None,
+    params: Optional[dict] = None,
+    limit: int = 3,
+    strategy: str = "auto",
+    brute_force_rows: int = DEFAULT_BRUTE_FORCE_ROWS,
+    max_oversample: int = DEFAULT_MAX_OVERSAMPLE,
+    candidates: Optional[int] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> FilteredSearchResult:
+    """Nearest neighbours of ``query_vector`` among the rows matching an attribute filter.
 
+    The filter is the conjunction of ``categories``, ``item_ids`` and a raw
+    ``where`` predicate (bound with ``params``) over ``item_id`` and
+    ``category``. With ``strategy="auto"`` its selectivity picks the plan: a
+    filter matching at most ``brute_force_rows`` rows, or so few that the index
+    would need more than ``max_oversample`` times ``limit`` candidates, is
+    answered exactly by scanning only the matching rows. Broader filters take
+    candidates from the HNSW index and filter them, doubling the oversample
+    until ``limit`` rows survive; if that exceeds ``max_oversample`` the search
+    falls back to the exact scan. The oversample is also capped so no candidate
+    query exceeds ``MAX_ANN_LIMIT``, the largest LIMIT the index serves; when
+    even ``limit`` exceeds it, every strategy runs the exact scan. A forced
+    ``strategy="prefilter"`` skips the selectivity estimate.
+    """
+    cfg = config or load_config()
+    if len(query_vector) == 0:
+        raise ValueError("Query vector is empty")
+    if strategy not in FILTER_STRATEGIES:
+        raise ValueError(f"Unknown filter strategy '{strategy}'. Expected one of {FILTER_STRATEGIES}.")
+    if max_oversample < 1:
+        raise ValueError("max_oversample must be at least 1")
+
+    predicate, bound = _filter_predicate(categories, item_ids, where, params)
+    literal = _vector_literal(query_vector)
+    matching: Optional[int] = None
+    total: Optional[int] = None
+
+    def exact(rounds: int) -> FilteredSearchResult:
+        rows = fetch(
+            _prefilter_sql(literal, predicate, limit, profile),
+            bound,
+            settings=_search_settings("exact", None),
+            cache_tables=(profile.table,),
+            config=cfg,
+        )
+        return FilteredSearchResult(rows, "prefilter", matching, total, 1, rounds + 1)
+
+    # Past MAX_ANN_LIMIT the index is skipped, so a larger oversample could only run as a full scan.
+    max_oversample = min(max_oversample, MAX_ANN_LIMIT // max(limit, 1))
+    if strategy == "prefilter" or max_oversample < 1:
+        return exact(0)
+    matching, total = filter_selectivity(predicate, bound, profile=profile, config=cfg)
+    if matching == 0:
+        return FilteredSearchResult([], "prefilter", matching, total, 1, 0)
+    # Roughly 1 / selectivity index candidates are needed per surviving row.
+    needed = -(-total // matching)
+    if strategy == "auto" and (matching <= brute_force_rows or needed > max_oversample):
+        return exact(0)
+
+    oversample = min(needed, max_oversample)
+    rounds = 0
+    while True:
+        fetch_limit = limit * oversample
+        query = _postfilter_sql(_search_sql(literal, fetch_limit, profile), predicate, limit)
+        # The candidate list must cover every row the index is asked to return.
+        candidate_list = max(candidates or HNSW_DEFAULT_CANDIDATES, _candidate_limit(fetch_limit, STALE_OVERSAMPLE))
+        rows = fetch(
+            query,
+            bound,
+            settings=_search_settings("ann", candidate_list),
+            cache_tables=(profile.table,),
+            config=cfg,
+        )
+        rounds += 1
+        if len(rows) >= limit or fetch_limit >= total:
+            return FilteredSearchResult(rows, "ann", matching, total, oversample, rounds)
+        if oversample >= max_oversample:
+            if strategy == "ann":
+                return FilteredSearchResult(rows, "ann", matching, total, oversample, rounds)
+            return exact(rounds)
+        oversample = min(oversample * 2, max_oversample)
+
+
+def _as_query_matrix(query_vectors) -> np.ndarray:
+    matrix = np.asarray(query_vectors, dtype=np.float32)
+    if matrix.ndim == 1:
+        matrix = matrix[np.newaxis, :]
+    if matrix.ndim != 2 or matrix.shape[0] == 0 or matrix.shape[1] == 0:
+        raise ValueError("Query vectors must be a non-empty (n_queries, dimension) matrix")
+    return matrix
+
+
+def _batch_sql(
+    literals: Dict[int, str],
+    queries: Sequence[int],
+    k: int,
+    *,
+    mode: str,
+    stale_oversample: int,
+    profile: VectorIndexProfile,
+) -> str:
+    # One standalone search per query, so each branch keeps the ORDER BY distance LIMIT shape the
+    # ANN index needs; a join against a table of query vectors would force an exact N x M scan.
+    branches = []
+    for idx in queries:
+        search = _similarity_sql(
+            literals[idx], k, k, mode=mode, rerank=None, stale_oversample=stale_oversample, profile=profile
+        )
+        branches.append(f"SELECT {int(idx)} AS query_idx, item_id, category, score FROM ({search})")
+    return "\nUNION ALL\n".join(branches)
+
+
+@instrumented
+def similarity_search_batch(
+    query_vectors: np.ndarray,
+    *,
+    k: int = 3,
+    mode: str = "ann",
+    candidates: Optional[int] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> BatchSearchResult:
+    """Answer many similarity queries in one round trip.
+
+    The queries are sent as one ``UNION ALL`` of per-query searches, so in
+    ``ann`` mode every query is served by the HNSW index exactly as
+    :func:`similarity_search` would serve it; ``exact`` mode brute-forces each
+    query instead. Only queries whose candidates were crowded out by stale
+    versions are sent again.
+    """
+    cfg = config or load_config()
+    matrix = _as_query_matrix(query_vectors)
+    settings = _search_settings(mode, candidates)
+    literals = {idx: _vector_literal(vector) for idx, vector in enumerate(matrix)}
+
+    results: Dict[int, List[tuple]] = {}
+    pending = list(literals)
+    stale_oversample = STALE_OVERSAMPLE
+    table_rows: Optional[int] = None
     with client_session(cfg) as client:
-        return client.execute(
-            f"""
-            SELECT item_id, category,
-                   cosineDistance(embedding, %(query_vector)s) AS score
-            FROM {VECTOR_TABLE}
-            ORDER BY score ASC
-            LIMIT %(limit)s
-            """,
-            {"query_vector": query_vector, "limit": limit},
+        while pending:
+            query = _batch_sql(
+                literals, pending, k, mode=mode, stale_oversample=stale_oversample, profile=profile
+            )
+            # The vector literals are part of the SQL text, which the parser caps at max_query_size.
+            rows = client.execute(
+                query, settings={**settings, "max_query_size": max(len(query) + 1, DEFAULT_MAX_QUERY_SIZE)}
+            )
+            for idx in pending:
+                results[idx] = []
+            for query_idx, item_id, category, score in rows:
+                results[query_idx].append((item_id, category, score))
+            pending = [
+                idx for idx in pending if _needs_wider_search(results[idx], mode, k, k, None, stale_oversample)
+            ]
+            if not pending:
+                break
+            if table_rows is None:
+                table_rows = int(client.execute(_row_count_sql(profile))[0][0])
+            if _candidates_exhausted(k, stale_oversample, table_rows):
+                break
+            stale_oversample *= 4
+
+    n_queries = matrix.shape[0]
+    item_ids = np.full((n_queries, k), -1, dtype=np.int64)
+    categories = np.full((n_queries, k), "", dtype=object)
+    distances = np.full((n_queries, k), np.nan, dtype=np.float32)
+    for query_idx, found in results.items():
+        # UNION ALL branches may interleave, so each query's rows are put back in distance order.
+        for rank, (item_id, category, score) in enumerate(sorted(found, key=lambda row: row[2])):
+            item_ids[query_idx, rank] = item_id
+            categories[query_idx, rank] = category
+            distances[query_idx, rank] = score
+
+    return BatchSearchResult(item_ids=item_ids, categories=categories, distances=distances)
+
+
+def query_tokens(text: str) -> List[str]:
+    """Lower-case ``text`` and split it into the distinct tokens ``hasToken`` would match."""
+    return list(dict.fromkeys(_TOKEN_PATTERN.findall(text.lower())))[:MAX_QUERY_TOKENS]
+
+
+def _lexical_sql(tokens: Sequence[str], limit: int, profile: VectorIndexProfile) -> Tuple[str, dict]:
+    # hasToken on the indexed lowerUTF8(text) expression lets the token bloom filter skip granules.
+    matches = [f"hasToken(lowerUTF8(text), %(token_{i})s)" for i in range(len(tokens))]
+    candidates = f"""
+    SELECT item_id, category, version, is_deleted, {" + ".join(matches)} AS score
+    FROM {profile.table}
+    WHERE {" OR ".join(matches)}
+    ORDER BY score DESC, item_id ASC
+    LIMIT {int(limit) * STALE_OVERSAMPLE}
+    """
+    query = _latest_candidates_sql(candidates, "item_id, category, score", "score DESC, item_id ASC", limit, profile)
+    return query, {f"token_{i}": token for i, token in enumerate(tokens)}
+
+
+@instrumented
+def lexical_search(
+    query_text: str,
+    *,
+    limit: int = 3,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> List[tuple]:
+    """Rank live rows by how many distinct tokens of ``query_text`` their text contains.
+
+    Matching is case-insensitive and on whole tokens, so SKUs and brand names
+    match exactly. Returns ``(item_id, category, matched_terms)`` rows.
+    """
+    tokens = query_tokens(query_text)
+    if not tokens:
+        return []
+    query, params = _lexical_sql(tokens, limit, profile)
+    return fetch(query, params, cache_tables=(profile.table,), config=config or load_config())
+
+
+def _ranked(scores: Dict[int, float], categories: Dict[int, str]) -> List[tuple]:
+    ordered = sorted(scores.items(), key=lambda item: (-item[1], item[0]))
+    return [(item_id, categories[item_id], score) for item_id, score in ordered]
+
+
+def reciprocal_rank_fusion(rankings: Sequence[Sequence[tuple]], *, k: int = DEFAULT_RRF_K) -> List[tuple]:
+    """Fuse ranked ``(item_id, category, ...)`` rows by summing ``1 / (k + rank)`` per item."""
+    scores: Dict[int, float] = {}
+    categories: Dict[int, str] = {}
+    for ranking in rankings:
+        for rank, row in enumerate(ranking, start=1):
+            scores[row[0]] = scores.get(row[0], 0.0) + 1.0 / (k + rank)
+            categories.setdefault(row[0], row[1])
+    return _ranked(scores, categories)
+
+
+def _min_max(scores: np.ndarray) -> np.ndarray:
+    span = scores.max() - scores.min() if scores.size else 0.0
+    return np.ones_like(scores) if span == 0 else (scores - scores.min()) / span
+
+
+def weighted_fusion(lexical: Sequence[tuple], vector: Sequence[tuple], *, vector_weight: float = 0.5) -> List[tuple]:
+    """Fuse lexical and vector rows by a weighted sum of their min-max normalized scores.
+
+    Vector distances are negated first so that higher is better in both lists;
+    an item missing from one list contributes nothing from it.
+    """
+    if not 0.0 <= vector_weight <= 1.0:
+        raise ValueError("vector_weight must be between 0 and 1")
+    scores: Dict[int, float] = {}
+    categories: Dict[int, str] = {}
+    for rows, weight, sign in ((lexical, 1.0 - vector_weight, 1.0), (vector, vector_weight, -1.0)):
+        normalized = _min_max(np.asarray([sign * row[2] for row in rows], dtype=np.float64))
+        for row, value in zip(rows, normalized):
+            scores[row[0]] = scores.get(row[0], 0.0) + weight * float(value)
+            categories.setdefault(row[0], row[1])
+    return _ranked(scores, categories)
+
+
+@instrumented
+def hybrid_search(
+    query_text: str,
+    query_vector: Optional[Sequence[float]] = None,
+    *,
+    limit: int = 3,
+    depth: int = DEFAULT_HYBRID_DEPTH,
+    fusion: str = "rrf",
+    vector_weight: float = 0.5,
+    rrf_k: int = DEFAULT_RRF_K,
+    candidates: Optional[int] = None,
+    profile: VectorIndexProfile = DEFAULT_INDEX_PROFILE,
+    config: Optional[AppConfig] = None,
+) -> HybridSearchResult:
+    """Combine lexical and vector retrieval for ``query_text`` in one call.
+
+    The top ``depth`` rows of :func:`lexical_search` and of the HNSW
+    :func:`similarity_search` are fetched concurrently and fused with
+    reciprocal rank fusion (``fusion="rrf"``) or a ``vector_weight``-weighted
+    sum of normalized scores (``fusion="weighted"``). ``query_text`` is
+    embedded with the active model unless ``query_vector`` is given.
+    """
+    if fusion not in FUSION_MODES:
+        raise ValueError(f"Unknown fusion mode '{fusion}'. Expected one of {FUSION_MODES}.")
+    cfg = config or load_config()
+    started = time.perf_counter()
+    timings: Dict[str, float] = {"embed": 0.0}
+    if query_vector is None:
+        from .embeddings import embed_texts
+
+        query_vector = embed_texts([query_text], config=cfg)[0]
+        timings["embed"] = time.perf_counter() - started
+
+    def timed(stage: str, search, *args, **kwargs):
+        stage_started = time.perf_counter()
+        try:
+            return search(*args, **kwargs)
+        finally:
+            timings[stage] = time.perf_counter() - stage_started
+
+    with ThreadPoolExecutor(max_workers=2) as executor:
+        # Each stage runs in a copy of this context so its queries stay attributed to hybrid_search.
+        lexical_future = executor.submit(
+            copy_context().run, timed, "lexical", lexical_search, query_text, limit=depth, profile=profile, config=cfg
+        )
+        vector_future = executor.submit(
+            copy_context().run,
+            timed,
+            "vector",
+            similarity_search,
+            query_vector,
+            limit=depth,
+            candidates=candidates,
+            profile=profile,
+            config=cfg,
         )
+        lexical, vector = lexical_future.result(), vector_future.result()
+
+    fusion_started = time.perf_counter()
+    if fusion == "rrf":
+        fused = reciprocal_rank_fusion([lexical, vector], k=rrf_k)
+    else:
+        fused = weighted_fusion(lexical, vector, vector_weight=vector_weight)
+    timings["fusion"] = time.perf_counter() - fusion_started
+    timings["total"] = time.perf_counter() - started
+    return HybridSearchResult(rows=fused[:limit], lexical=list(lexical), vector=list(vector), timings=timings)
@@ -3,55 +3,263 @@ from __future__ import annotations
 import json
 from dataclasses import dataclass
 from pathlib import Path
-from typing import Iterable, List
+from typing import Iterator, List, Optional, Sequence, Union, overload
 
+import numpy as np
 import pandas as pd
 
 from .config import AppConfig, load_config
 
 VECTOR_DATASET_FILENAME = "vector_items.jsonl"
+VECTOR_EMBEDDINGS_FILENAME = "vector_items.npy"
+VECTOR_METADATA_FILENAME = "vector_items.meta.npz"
+TABULAR_DATASET_FILENAME = "tabular_events.csv"
+TABULAR_PARQUET_FILENAME = "tabular_events.parquet"
+DEFAULT_CHUNK_ROWS = 250_000
+
+# Declared up front so pandas never has to infer (and upcast) types chunk by chunk.
+TABULAR_DTYPES = {
+    "event_id": "UInt32",
+    "customer_id": "UInt32",
+    "event_type": "category",
+    "amount": "float64",
+}
 
 
 @dataclass(frozen=True)
 class VectorRecord:
     item_id: int
     category: str
-    vector: List[float]
+    vector: Union[List[float], np.ndarray]
     text: str | None = None
 
 
+class VectorDataset(Sequence[VectorRecord]):
+    """Array-backed vector dataset: a float32 ``(n, dim)`` matrix plus id/category/text columns.
+
+    ``vectors`` is typically a read-only memory map, so nothing is parsed or
+    copied until rows are accessed; ``VectorRecord`` objects are built lazily
+    for callers that iterate.
+    """
+
+    def __init__(
+        self,
+        item_ids: np.ndarray,
+        categories: np.ndarray,
+        vectors: np.ndarray,
+        texts: Optional[np.ndarray] = None,
+        *,
+        model: Optional[str] = None,
+    ) -> None:
+        if vectors.ndim != 2 or not (len(item_ids) == len(categories) == vectors.shape[0]):
+            raise ValueError("Vector dataset columns must have matching lengths and a 2-D vector matrix")
+        self.item_ids = item_ids
+        self.categories = categories
+        self.vectors = vectors
+        self.texts = texts
+        self.model = model
+
+    @property
+    def dimension(self) -> int:
+        return int(self.vectors.shape[1])
+
+    def __len__(self) -> int:
+        return int(self.vectors.shape[0])
+
+    @overload
+    def __getitem__(self, index: int) -> VectorRecord: ...
+
+    @overload
+    def __getitem__(self, index: Union[slice, np.ndarray]) -> "VectorDataset": ...
+
+    def __getitem__(self, index):
+        # Slices and index arrays return a sub-dataset; an index array copies only the selected rows.
+        if isinstance(index, (slice, np.ndarray)):
+            return VectorDataset(
+                self.item_ids[index],
+                self.categories[index],
+                self.vectors[index],
+                None if self.texts is None else self.texts[index],
+                model=self.model,
+            )
+        text = None if self.texts is None else str(self.texts[index]) or None
+        return VectorRecord(
+            item_id=int(self.item_ids[index]),
+            category=str(self.categories[index]),
+            vector=self.vectors[index],
+            text=text,
+        )
+
+    def __iter__(self) -> Iterator[VectorRecord]:
+        for index in range(len(self)):
+            yield self[index]
+
+    @classmethod
+    def from_records(cls, records: Sequence[VectorRecord], *, model: Optional[str] = None) -> "VectorDataset":
+        return cls(
+            np.asarray([rec.item_id for rec in records], dtype=np.uint32),
+            np.asarray([rec.category for rec in records], dtype=str),
+            np.asarray([rec.vector for rec in records], dtype=np.float32).reshape(len(records), -1),
+            np.asarray([rec.text or "" for rec in records], dtype=str),
+            model=model,
+        )
+
+
 def _data_path(filename: str, config: AppConfig) -> Path:
     return config.paths.data_dir / filename
 
 
-def load_tabular_events(*, config: AppConfig | None = None) -> pd.DataFrame:
+def tabular_events_path(*, config: AppConfig | None = None) -> Path:
+    """Return the events file the loaders read: a generated Parquet file if present, else the CSV."""
     cfg = config or load_config()
-    path = _data_path("tabular_events.csv", cfg)
+    parquet_path = _data_path(TABULAR_PARQUET_FILENAME, cfg)
+    return parquet_path if parquet_path.exists() else _data_path(TABULAR_DATASET_FILENAME, cfg)
+
+
+def load_tabular_events(*, config: AppConfig | None = None) -> pd.DataFrame:
+    path = tabular_events_path(config=config)
+    if path.suffix == ".parquet":
+        return pd.concat(_iter_parquet_events(path, DEFAULT_CHUNK_ROWS), ignore_index=True)
     return pd.read_csv(path)
 
 
-def load_vector_items(*, config: AppConfig | None = None) -> Iterable[VectorRecord]:
-    cfg = config or load_config()
-    path = _data_path(VECTOR_DATASET_FILENAME, cfg)
+def _iter_parquet_events(path: Path, chunk_rows: int) -> Iterator[pd.DataFrame]:
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Reading Parquet events requires the 'pyarrow' package") from exc
 
-    if not path.exists():
-        raise FileNotFoundError(
-            f"Vector dataset not found at {path}. Run python/scripts/generate_vector_dataset.py first."
+    for batch in pq.ParquetFile(path).iter_batches(batch_size=chunk_rows):
+        chunk = batch.to_pandas()
+        chunk["event_time"] = pd.to_datetime(chunk["event_time"], utc=True)
+        chunk["event_type"] = chunk["event_type"].astype("category")
+        chunk["amount"] = chunk["amount"].astype("float64")
+        yield chunk
+
+
+def iter_tabular_events(
+    *, chunk_rows: int = DEFAULT_CHUNK_ROWS, config: AppConfig | None = None
+) -> Iterator[pd.DataFrame]:
+    path = tabular_events_path(config=config)
+    if path.suffix == ".parquet":
+        yield from _iter_parquet_events(path, chunk_rows)
+        return
+
+    with pd.read_csv(path, dtype=TABULAR_DTYPES, chunksize=chunk_rows) as reader:
+        for chunk in reader:
+            chunk["event_time"] = pd.to_datetime(chunk["event_time"], utc=True, format="ISO8601")
+            yield chunk
+
+
+def vector_dataset_path(path: Path) -> Path:
+    """Return ``path`` with the ``.npy`` suffix ``np.save`` would give it."""
+    path = Path(path)
+    return path if path.suffix == ".npy" else path.with_name(path.name + ".npy")
+
+
+def _metadata_path(embeddings_path: Path) -> Path:
+    return vector_dataset_path(embeddings_path).with_suffix(".meta.npz")
+
+
+def save_vector_dataset(dataset: VectorDataset, path: Path, *, overwrite: bool = False) -> Path:
+    """Write ``dataset`` as ``<name>.npy`` (float32 matrix) plus ``<name>.meta.npz`` (columns).
+
+    ``.npy`` is appended to ``path`` when missing; the path written is returned.
+    """
+    path = vector_dataset_path(path)
+    meta_path = _metadata_path(path)
+    if not overwrite and (path.exists() or meta_path.exists()):
+        raise FileExistsError(f"Target file {path} already exists. Use --overwrite to regenerate.")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    np.save(path, np.ascontiguousarray(dataset.vectors, dtype=np.float32))
+    write_vector_metadata(path, dataset.item_ids, dataset.categories, dataset.texts, model=dataset.model)
+    return path
+
+
+def write_vector_metadata(
+    path: Path,
+    item_ids: np.ndarray,
+    categories: np.ndarray,
+    texts: Optional[np.ndarray] = None,
+    *,
+    model: Optional[str] = None,
+) -> None:
+    """Write the ``.meta.npz`` sidecar for the embeddings matrix at ``path``."""
+    np.savez(
+        _metadata_path(path),
+        item_ids=np.asarray(item_ids, dtype=np.uint32),
+        categories=np.asarray(categories, dtype=str),
+        texts=np.asarray(texts if texts is not None else np.zeros(len(item_ids), dtype="U1"), dtype=str),
+        model=np.asarray(model or ""),
+    )
+
+
+def read_vector_dataset(path: Path, *, mmap: bool = True) -> VectorDataset:
+    path = vector_dataset_path(path)
+    vectors = np.load(path, mmap_mode="r" if mmap else None)
+    with np.load(_metadata_path(path)) as meta:
+        return VectorDataset(
+            meta["item_ids"],
+            meta["categories"],
+            vectors,
+            meta["texts"],
+            model=str(meta["model"]) or None,
         )
 
-    records: list[VectorRecord] = []
+
+def read_vector_jsonl(path: Path) -> VectorDataset:
+    item_ids: list[int] = []
+    categories: list[str] = []
+    texts: list[str] = []
+    vectors: list[np.ndarray] = []
+    model = None
     with path.open("r", encoding="utf-8") as fh:
         for line in fh:
             line = line.strip()
             if not line:
                 continue
             payload = json.loads(line)
-            records.append(
-                VectorRecord(
-                    item_id=int(payload["item_id"]),
-                    category=str(payload["category"]),
-                    vector=[float(x) for x in payload["vector"]],
-                    text=payload.get("text"),
-                )
-            )
-    return records
+            item_ids.append(int(payload["item_id"]))
+            categories.append(str(payload["category"]))
+            texts.append(payload.get("text") or "")
+            vectors.append(np.asarray(payload["vector"], dtype=np.float32))
+            model = model or payload.get("model")
+
+    matrix = np.vstack(vectors) if vectors else np.empty((0, 0), dtype=np.float32)
+    return VectorDataset(
+        np.asarray(item_ids, dtype=np.uint32),
+        np.asarray(categories, dtype=str),
+        matrix,
+        np.asarray(texts, dtype=str),
+        model=model,
+    )
+
+
+def write_vector_jsonl(dataset: VectorDataset, path: Path, *, overwrite: bool = False) -> None:
+    if path.exists() and not overwrite:
+        raise FileExistsError(f"Target file {path} already exists. Use --overwrite to regenerate.")
+
+    path.parent.mkdir(parents=True, exist_ok=True)
+    with path.open("w", encoding="utf-8") as fh:
+        for record in dataset:
+            payload = {"item_id": record.item_id, "category": record.category, "text": record.text}
+            if dataset.model:
+                payload["model"] = dataset.model
+            payload["vector"] = np.asarray(record.vector, dtype=np.float32).tolist()
+            fh.write(json.dumps(payload, ensure_ascii=False) + "\n")
+
+
+def load_vector_items(*, config: AppConfig | None = None, mmap: bool = True) -> VectorDataset:
+    """Load the vector dataset, preferring the memory-mapped binary format over JSONL."""
+    cfg = config or load_config()
+    binary_path = _data_path(VECTOR_EMBEDDINGS_FILENAME, cfg)
+    if binary_path.exists():
+        return read_vector_dataset(binary_path, mmap=mmap)
+
+    path = _data_path(VECTOR_DATASET_FILENAME, cfg)
+    if not path.exists():
+        raise FileNotFoundError(
+            f"Vector dataset not found at {binary_path}. Run python/scripts/generate_vector_dataset.py first."
+        )
+    return read_vector_jsonl(path)
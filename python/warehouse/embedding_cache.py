@@ -0,0 +1,150 @@
+from __future__ import annotations
+
+import hashlib
+import sqlite3
+import threading
+import time
+from dataclasses import dataclass, replace
+from pathlib import Path
+from typing import Iterable, Optional, Sequence
+
+import numpy as np
+
+from .config import AppConfig, load_config
+
+EMBEDDING_CACHE_FILENAME = "embeddings.sqlite"
+DEFAULT_MAX_ENTRIES = 2_000_000
+# SQLite caps bound parameters per statement; lookups are issued in slices of this size.
+_LOOKUP_BATCH = 500
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS embeddings (
+    model_key TEXT NOT NULL,
+    text_hash BLOB NOT NULL,
+    vector BLOB NOT NULL,
+    last_used INTEGER NOT NULL,
+    PRIMARY KEY (model_key, text_hash)
+) WITHOUT ROWID;
+CREATE INDEX IF NOT EXISTS idx_embeddings_last_used ON embeddings (last_used);
+"""
+
+
+@dataclass(frozen=True)
+class CacheStats:
+    hits: int = 0
+    misses: int = 0
+    writes: int = 0
+    evictions: int = 0
+    entries: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def text_hash(text: str) -> bytes:
+    return hashlib.blake2b(text.encode("utf-8"), digest_size=16).digest()
+
+
+def model_revision(model_path: Path) -> str:
+    """Fingerprint a local model checkout from file names, sizes, and modification times.
+
+    Re-downloading or swapping weights changes the fingerprint, which retires
+    every cached vector produced by the previous files.
+    """
+    digest = hashlib.blake2b(digest_size=8)
+    for path in sorted(model_path.rglob("*")):
+        if path.is_file() and ".cache" not in path.parts:
+            stat = path.stat()
+            digest.update(f"{path.relative_to(model_path)}:{stat.st_size}:{stat.st_mtime_ns}".encode())
+    return digest.hexdigest()
+
+
+def model_cache_key(model_name: str, revision: str, normalize: bool) -> str:
+    return f"{model_name}@{revision}:{'norm' if normalize else 'raw'}"
+
+
+class EmbeddingCache:
+    """Content-addressed embedding store in a local SQLite file.
+
+    Vectors are keyed by ``(model key, text hash)`` and evicted least recently
+    used first once the cache holds more than ``max_entries`` vectors.
+    """
+
+    def __init__(self, path: Path, *, max_entries: int = DEFAULT_MAX_ENTRIES) -> None:
+        path.parent.mkdir(parents=True, exist_ok=True)
+        self.path = path
+        self.max_entries = max_entries
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(str(path), check_same_thread=False)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.executescript(_SCHEMA)
+        (count,) = self._conn.execute("SELECT count() FROM embeddings").fetchone()
+        self._stats = CacheStats(entries=count)
+
+    def _bump(self, **deltas: int) -> None:
+        self._stats = replace(
+            self._stats, **{name: getattr(self._stats, name) + delta for name, delta in deltas.items()}
+        )
+
+    def get_many(self, model_key: str, hashes: Sequence[bytes]) -> dict[bytes, np.ndarray]:
+        found: dict[bytes, np.ndarray] = {}
+        unique = list(dict.fromkeys(hashes))
+        with self._lock:
+            for start in range(0, len(unique), _LOOKUP_BATCH):
+                batch = unique[start : start + _LOOKUP_BATCH]
+                placeholders = ",".join("?" * len(batch))
+                rows = self._conn.execute(
+                    f"SELECT text_hash, vector FROM embeddings WHERE model_key = ? AND text_hash IN ({placeholders})",
+                    (model_key, *batch),
+                ).fetchall()
+                for digest, blob in rows:
+                    found[digest] = np.frombuffer(blob, dtype=np.float32)
+            if found:
+                now = time.time_ns()
+                self._conn.executemany(
+                    "UPDATE embeddings SET last_used = ? WHERE model_key = ? AND text_hash = ?",
+                    [(now, model_key, digest) for digest in found],
+                )
+                self._conn.commit()
+            self._bump(hits=len(found), misses=len(unique) - len(found))
+        return found
+
+    def put_many(self, model_key: str, items: Iterable[tuple[bytes, np.ndarray]]) -> None:
+        now = time.time_ns()
+        rows = [(model_key, digest, np.asarray(vector, dtype=np.float32).tobytes(), now) for digest, vector in items]
+        if not rows:
+            return
+        with self._lock:
+            before = self._conn.total_changes
+            self._conn.executemany(
+                "INSERT OR IGNORE INTO embeddings (model_key, text_hash, vector, last_used) VALUES (?, ?, ?, ?)",
+                rows,
+            )
+            written = self._conn.total_changes - before
+            self._bump(writes=written, entries=written)
+            overflow = self._stats.entries - self.max_entries
+            if overflow > 0:
+                self._conn.execute(
+                    "DELETE FROM embeddings WHERE (model_key, text_hash) IN "
+                    "(SELECT model_key, text_hash FROM embeddings ORDER BY last_used ASC LIMIT ?)",
+                    (overflow,),
+                )
+                self._bump(evictions=overflow, entries=-overflow)
+            self._conn.commit()
+
+    def stats(self) -> CacheStats:
+        with self._lock:
+            return self._stats
+
+    def close(self) -> None:
+        with self._lock:
+            self._conn.close()
+
+
+def open_embedding_cache(
+    *, config: Optional[AppConfig] = None, max_entries: int = DEFAULT_MAX_ENTRIES
+) -> EmbeddingCache:
+    cfg = config or load_config()
+    return EmbeddingCache(cfg.paths.assets_dir / "cache" / EMBEDDING_CACHE_FILENAME, max_entries=max_entries)
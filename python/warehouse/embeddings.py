@@ -1,12 +1,18 @@
 from __future__ import annotations
 
 from functools import lru_cache
+from itertools import islice
 from pathlib import Path
-from typing import Iterable, List, Optional
+from typing import Iterable, Iterator, List, Optional
 
+import numpy as np
 from sentence_transformers import SentenceTransformer
 
 from .config import AppConfig, load_config
+from .embedding_cache import EmbeddingCache, model_cache_key, model_revision, text_hash
+
+DEFAULT_EMBED_BATCH_SIZE = 64
+DEFAULT_EMBED_WINDOW = 4096
 
 
 def model_directory(model_name: str, paths_root: Path) -> Path:
@@ -29,12 +35,120 @@ def load_embedding_model(*, model_name: Optional[str] = None, config: Optional[A
     return SentenceTransformer(str(model_path))
 
 
-def embed_texts(texts: Iterable[str], *, model_name: Optional[str] = None, config: Optional[AppConfig] = None) -> List[List[float]]:
-    model = load_embedding_model(model_name=model_name, config=config)
-    embeddings = model.encode(
-        list(texts), convert_to_numpy=True, convert_to_tensor=False, normalize_embeddings=False
+def normalize_rows(matrix: np.ndarray) -> np.ndarray:
+    norms = np.linalg.norm(matrix, axis=1, keepdims=True)
+    return matrix / np.where(norms == 0, 1.0, norms)
+
+
+def _encode_window(model: SentenceTransformer, window: List[str], batch_size: int, pool) -> np.ndarray:
+    # Sorting by length puts similarly sized texts in the same batch, so little of each batch is padding.
+    order = np.argsort([-len(text) for text in window], kind="stable")
+    ordered = [window[i] for i in order]
+    if pool is not None:
+        encoded = model.encode_multi_process(ordered, pool, batch_size=batch_size)
+    else:
+        encoded = model.encode(
+            ordered,
+            batch_size=batch_size,
+            convert_to_numpy=True,
+            convert_to_tensor=False,
+            normalize_embeddings=False,
+            show_progress_bar=False,
+        )
+    block = np.empty_like(encoded, dtype=np.float32)
+    block[order] = encoded
+    return block
+
+
+def iter_embeddings(
+    texts: Iterable[str],
+    *,
+    batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+    window: int = DEFAULT_EMBED_WINDOW,
+    normalize: Optional[bool] = None,
+    distance: str = "cosine",
+    processes: int = 1,
+    cache: Optional[EmbeddingCache] = None,
+    model_name: Optional[str] = None,
+    config: Optional[AppConfig] = None,
+) -> Iterator[np.ndarray]:
+    """Embed a stream of texts, yielding one float32 ``(n, dim)`` block per ``window`` texts.
+
+    Blocks preserve input order. ``normalize`` defaults to the index distance:
+    cosine indexes get unit-length vectors, L2 indexes keep raw magnitudes.
+    ``processes > 1`` spreads encoding over that many CPU worker processes.
+    With a ``cache``, only texts it has not seen for this model revision and
+    normalization are encoded; the model is not loaded at all on a full hit.
+    """
+    cfg = config or load_config()
+    target = model_name or cfg.models.active
+    if normalize is None:
+        normalize = distance == "cosine"
+    cache_key = None
+    if cache is not None:
+        revision = model_revision(model_directory(target, cfg.paths.model_cache_dir))
+        cache_key = model_cache_key(target, revision, normalize)
+
+    model: Optional[SentenceTransformer] = None
+    pool = None
+    try:
+        iterator = iter(texts)
+        while True:
+            chunk = list(islice(iterator, window))
+            if not chunk:
+                break
+            hashes: List[bytes] = []
+            cached: dict[bytes, np.ndarray] = {}
+            if cache_key is not None:
+                hashes = [text_hash(text) for text in chunk]
+                cached = cache.get_many(cache_key, hashes)
+            missing = [i for i in range(len(chunk)) if not cached or hashes[i] not in cached]
+
+            encoded = None
+            if missing:
+                if model is None:
+                    model = load_embedding_model(model_name=model_name, config=config)
+                    if processes > 1:
+                        pool = model.start_multi_process_pool(target_devices=["cpu"] * processes)
+                encoded = _encode_window(model, [chunk[i] for i in missing], batch_size, pool)
+                if normalize:
+                    encoded = normalize_rows(encoded).astype(np.float32, copy=False)
+                if cache_key is not None:
+                    cache.put_many(cache_key, zip((hashes[i] for i in missing), encoded))
+
+            if not cached:
+                yield encoded
+                continue
+            dim = next(iter(cached.values())).shape[0]
+            block = np.empty((len(chunk), dim), dtype=np.float32)
+            for i, digest in enumerate(hashes):
+                if digest in cached:
+                    block[i] = cached[digest]
+            if encoded is not None:
+                block[missing] = encoded
+            yield block
+    finally:
+        if pool is not None:
+            model.stop_multi_process_pool(pool)
+
+
+def embed_texts(
+    texts: Iterable[str],
+    *,
+    model_name: Optional[str] = None,
+    config: Optional[AppConfig] = None,
+    batch_size: int = DEFAULT_EMBED_BATCH_SIZE,
+    cache: Optional[EmbeddingCache] = None,
+) -> List[List[float]]:
+    blocks = list(
+        iter_embeddings(
+            texts, batch_size=batch_size, normalize=False, cache=cache, model_name=model_name, config=config
+        )
     )
-    return [[float(value) for value in vector] for vector in embeddings.tolist()]
+    if not blocks:
+        return []
+    # A single tolist() on the stacked matrix converts in C instead of calling float() per value.
+    return np.vstack(blocks).tolist()
 
 
 def embedding_dimension(*, model_name: Optional[str] = None, config: Optional[AppConfig] = None) -> int:
@@ -0,0 +1,505 @@
+from __future__ import annotations
+
+import functools
+import threading
+import time
+import uuid
+import warnings
+from collections import Counter, deque
+from contextlib import contextmanager
+from contextvars import ContextVar
+from dataclasses import dataclass, field
+from datetime import datetime, timedelta, timezone
+from typing import Any, Callable, Deque, Dict, Iterable, Iterator, List, Optional, Sequence, Tuple, TypeVar
+
+import numpy as np
+from clickhouse_driver import Client
+
+from .config import AppConfig
+
+F = TypeVar("F", bound=Callable[..., Any])
+
+DEFAULT_MAX_RECORDS = 10_000
+UNNAMED_OPERATION = "unnamed"
+_QUERY_PREVIEW_CHARS = 500
+# query_id lists are sent inline, so they are chunked to stay under max_query_size.
+_PROFILE_BATCH = 1_000
+
+_OPERATIONS: ContextVar[Tuple[str, ...]] = ContextVar("warehouse_operations", default=())
+# Set while the instrumentation reads the server logs, so its own lookups stay out of the records.
+_SUSPENDED: ContextVar[bool] = ContextVar("warehouse_recording_suspended", default=False)
+
+
+@dataclass
+class QueryRecord:
+    """Client-side measurements for one query, filled in as the query runs."""
+
+    query_id: str
+    operation: str
+    query: str
+    started_at: float
+    latency: float = 0.0
+    connection_wait: float = 0.0
+    rows_received: int = 0
+    bytes_received: int = 0
+    rows_sent: int = 0
+    bytes_sent: int = 0
+    error: Optional[str] = None
+
+
+@dataclass(frozen=True)
+class QueryProfile:
+    """Server-side counters for one query from ``system.query_log`` (and ``query_thread_log``)."""
+
+    query_id: str
+    duration_ms: int
+    read_rows: int
+    read_bytes: int
+    written_rows: int
+    written_bytes: int
+    result_rows: int
+    result_bytes: int
+    memory_usage: int
+    profile_events: Dict[str, int]
+    threads: Optional[int] = None
+    peak_thread_memory: Optional[int] = None
+
+
+@dataclass(frozen=True)
+class OperationProfile:
+    """Client and server totals for every query issued under one operation name."""
+
+    operation: str
+    queries: int
+    errors: int
+    latency_p50_ms: float
+    latency_p95_ms: float
+    latency_total_ms: float
+    connection_wait_ms: float
+    rows_received: int
+    bytes_received: int
+    rows_sent: int
+    bytes_sent: int
+    server_read_rows: int = 0
+    server_read_bytes: int = 0
+    server_written_rows: int = 0
+    peak_memory_usage: int = 0
+    profile_events: Dict[str, int] = field(default_factory=dict)
+
+
+Exporter = Callable[[QueryRecord], None]
+
+
+def current_operation() -> str:
+    return "/".join(_OPERATIONS.get()) or UNNAMED_OPERATION
+
+
+@contextmanager
+def operation(name: str) -> Iterator[None]:
+    """Attribute every query issued inside the block to ``name``.
+
+    Operations nest: a query run by ``insert_events`` inside
+    ``load_sample_data`` is recorded as ``crud_tabular.load_sample_data/crud_tabular.insert_events``.
+    """
+    token = _OPERATIONS.set(_OPERATIONS.get() + (name,))
+    try:
+        yield
+    finally:
+        _OPERATIONS.reset(token)
+
+
+def instrumented(func: F) -> F:
+    """Run ``func`` as an operation named ``<module>.<function>``.
+
+    Streaming helpers that return a generator are not decorated: their queries
+    run when iteration starts and are attributed to the operation active then.
+    """
+    name = f"{func.__module__.rsplit('.', 1)[-1]}.{func.__qualname__}"
+
+    @functools.wraps(func)
+    def wrapper(*args, **kwargs):
+        with operation(name):
+            return func(*args, **kwargs)
+
+    return wrapper  # type: ignore[return-value]
+
+
+class QueryRecorder:
+    """Keeps the most recent ``max_records`` query records and passes each one to the exporters."""
+
+    def __init__(
+        self,
+        *,
+        max_records: int = DEFAULT_MAX_RECORDS,
+        exporters: Sequence[Exporter] = (),
+        thread_log: bool = False,
+    ) -> None:
+        self.exporters = list(exporters)
+        self.thread_log = thread_log
+        self._records: Deque[QueryRecord] = deque(maxlen=max_records)
+        self._lock = threading.Lock()
+
+    def settings(self, record: QueryRecord, settings: Optional[dict[str, Any]] = None) -> dict[str, Any]:
+        """Query settings that tag the server-side log entries with the operation name."""
+        tagged = {**(settings or {}), "log_comment": record.operation}
+        if self.thread_log:
+            tagged["log_query_threads"] = 1
+        return tagged
+
+    @contextmanager
+    def track(
+        self, query: str, *, query_id: Optional[str] = None, connection_wait: float = 0.0
+    ) -> Iterator[QueryRecord]:
+        record = QueryRecord(
+            query_id=query_id or str(uuid.uuid4()),
+            operation=current_operation(),
+            query=" ".join(query.split())[:_QUERY_PREVIEW_CHARS],
+            started_at=time.time(),
+            connection_wait=connection_wait,
+        )
+        started = time.perf_counter()
+        try:
+            yield record
+        except BaseException as exc:
+            record.error = type(exc).__name__
+            raise
+        finally:
+            record.latency = time.perf_counter() - started
+            self.add(record)
+
+    def add(self, record: QueryRecord) -> None:
+        with self._lock:
+            self._records.append(record)
+        for exporter in self.exporters:
+            try:
+                exporter(record)
+            except Exception as exc:  # an exporter failure must never fail the query itself
+                warnings.warn(f"Query exporter {exporter!r} failed: {exc}", RuntimeWarning, stacklevel=2)
+
+    def records(self, operation_prefix: Optional[str] = None) -> List[QueryRecord]:
+        with self._lock:
+            records = list(self._records)
+        if operation_prefix is None:
+            return records
+        return [record for record in records if record.operation.startswith(operation_prefix)]
+
+    def clear(self) -> None:
+        with self._lock:
+            self._records.clear()
+
+
+_RECORDER: Optional[QueryRecorder] = None
+
+
+def enable_instrumentation(
+    *,
+    max_records: int = DEFAULT_MAX_RECORDS,
+    exporters: Sequence[Exporter] = (),
+    thread_log: bool = False,
+) -> QueryRecorder:
+    """Start recording every query sent through ``warehouse.clickhouse`` and return the recorder.
+
+    With ``thread_log`` queries also set ``log_query_threads`` so
+    :func:`profile_queries` can report per-thread counters.
+    """
+    global _RECORDER
+    _RECORDER = QueryRecorder(max_records=max_records, exporters=exporters, thread_log=thread_log)
+    return _RECORDER
+
+
+def disable_instrumentation() -> None:
+    global _RECORDER
+    _RECORDER = None
+
+
+def get_recorder() -> Optional[QueryRecorder]:
+    return _RECORDER
+
+
+def _active_recorder() -> Optional[QueryRecorder]:
+    return None if _SUSPENDED.get() else _RECORDER
+
+
+@contextmanager
+def _recording_suspended() -> Iterator[None]:
+    token = _SUSPENDED.set(True)
+    try:
+        yield
+    finally:
+        _SUSPENDED.reset(token)
+
+
+def _store_native_progress(record: QueryRecord, client: Client) -> None:
+    last_query = getattr(client, "last_query", None)
+    if last_query is None:
+        return
+    record.rows_received = int(last_query.profile_info.rows or 0)
+    record.bytes_received = int(last_query.profile_info.bytes or 0)
+    record.rows_sent = int(last_query.progress.written_rows or 0)
+    record.bytes_sent = int(last_query.progress.written_bytes or 0)
+
+
+class InstrumentedClient(Client):
+    """Native client that records every query while instrumentation is enabled.
+
+    The pool sets ``connection_wait`` on checkout; it is charged to the first
+    query run on that checkout. ``query_dataframe`` goes through ``execute``
+    and is recorded once.
+    """
+
+    connection_wait = 0.0
+
+    def _take_wait(self) -> float:
+        wait, self.connection_wait = self.connection_wait, 0.0
+        return wait
+
+    def execute(self, query, params=None, **kwargs):
+        recorder = _active_recorder()
+        if recorder is None:
+            return super().execute(query, params, **kwargs)
+        with recorder.track(query, query_id=kwargs.get("query_id"), connection_wait=self._take_wait()) as record:
+            kwargs.update(query_id=record.query_id, settings=recorder.settings(record, kwargs.get("settings")))
+            try:
+                return super().execute(query, params, **kwargs)
+            finally:
+                _store_native_progress(record, self)
+
+    def insert_dataframe(self, query, dataframe, **kwargs):
+        recorder = _active_recorder()
+        if recorder is None:
+            return super().insert_dataframe(query, dataframe, **kwargs)
+        with recorder.track(query, query_id=kwargs.get("query_id"), connection_wait=self._take_wait()) as record:
+            kwargs.update(query_id=record.query_id, settings=recorder.settings(record, kwargs.get("settings")))
+            try:
+                return super().insert_dataframe(query, dataframe, **kwargs)
+            finally:
+                _store_native_progress(record, self)
+
+    def execute_iter(self, query, params=None, **kwargs):
+        recorder = _active_recorder()
+        if recorder is None:
+            return super().execute_iter(query, params, **kwargs)
+        return self._tracked_iter(recorder, query, params, kwargs)
+
+    def _tracked_iter(self, recorder: QueryRecorder, query, params, kwargs) -> Iterator[Any]:
+        # Latency covers the whole stream, up to exhaustion or the consumer closing it.
+        with recorder.track(query, query_id=kwargs.get("query_id"), connection_wait=self._take_wait()) as record:
+            kwargs.update(query_id=record.query_id, settings=recorder.settings(record, kwargs.get("settings")))
+            try:
+                yield from super().execute_iter(query, params, **kwargs)
+            finally:
+                _store_native_progress(record, self)
+
+
+@contextmanager
+def track_http(query: str, settings: Optional[dict[str, Any]] = None) -> Iterator[Tuple[Optional[QueryRecord], dict]]:
+    """Track a clickhouse-connect call; yields the record (``None`` when disabled) and the settings to send.
+
+    The HTTP client reports no progress, so callers fill in the row and byte
+    counts of what they sent or received.
+    """
+    recorder = _active_recorder()
+    if recorder is None:
+        yield None, dict(settings or {})
+        return
+    with recorder.track(query) as record:
+        yield record, {**recorder.settings(record, settings), "query_id": record.query_id}
+
+
+def profile_queries(
+    records: Optional[Iterable[QueryRecord]] = None,
+    *,
+    flush: bool = True,
+    config: Optional[AppConfig] = None,
+) -> Dict[str, QueryProfile]:
+    """Look up the server's view of ``records`` (default: everything recorded) by ``query_id``.
+
+    ``flush`` runs ``SYSTEM FLUSH LOGS`` first so queries from the last few
+    seconds are visible. Thread counters are included when
+    ``system.query_thread_log`` exists and the queries ran with ``thread_log``
+    enabled. The lookups themselves are not recorded.
+    """
+    from .clickhouse import client_session
+
+    if records is None:
+        records = _RECORDER.records() if _RECORDER is not None else []
+    records = list(records)
+    if not records:
+        return {}
+    # event_date is in the server's time zone, so the UTC date of the first query may be a day late.
+    started = datetime.fromtimestamp(min(record.started_at for record in records), tz=timezone.utc)
+    since = (started - timedelta(days=1)).date()
+    query_ids = [record.query_id for record in records]
+
+    profiles: Dict[str, QueryProfile] = {}
+    with _recording_suspended(), client_session(config) as client:
+        if flush:
+            client.execute("SYSTEM FLUSH LOGS")
+        has_thread_log = bool(
+            client.execute("SELECT 1 FROM system.tables WHERE database = 'system' AND name = 'query_thread_log'")
+        )
+        for offset in range(0, len(query_ids), _PROFILE_BATCH):
+            params: Dict[str, Any] = {"ids": tuple(query_ids[offset : offset + _PROFILE_BATCH]), "since": since}
+            threads: Dict[str, Tuple[int, int]] = {}
+            if has_thread_log:
+                threads = {
+                    query_id: (int(count), int(peak))
+                    for query_id, count, peak in client.execute(
+                        "SELECT query_id, count(), max(peak_memory_usage) FROM system.query_thread_log "
+                        "WHERE event_date >= %(since)s AND query_id IN %(ids)s GROUP BY query_id",
+                        params,
+                    )
+                }
+            rows = client.execute(
+                """
+                SELECT query_id, query_duration_ms, read_rows, read_bytes, written_rows, written_bytes,
+                       result_rows, result_bytes, memory_usage, ProfileEvents
+                FROM system.query_log
+                WHERE event_date >= %(since)s AND query_id IN %(ids)s AND type != 'QueryStart'
+                """,
+                params,
+            )
+            for query_id, duration, read_rows, read_bytes, written_rows, written_bytes, *rest in rows:
+                result_rows, result_bytes, memory_usage, events = rest
+                thread_count, peak = threads.get(query_id, (None, None))
+                profiles[query_id] = QueryProfile(
+                    query_id=query_id,
+                    duration_ms=int(duration),
+                    read_rows=int(read_rows),
+                    read_bytes=int(read_bytes),
+                    written_rows=int(written_rows),
+                    written_bytes=int(written_bytes),
+                    result_rows=int(result_rows),
+                    result_bytes=int(result_bytes),
+                    memory_usage=int(memory_usage),
+                    profile_events={name: int(value) for name, value in dict(events).items()},
+                    threads=thread_count,
+                    peak_thread_memory=peak,
+                )
+    return profiles
+
+
+def operation_report(
+    records: Optional[Iterable[QueryRecord]] = None,
+    *,
+    server: bool = True,
+    config: Optional[AppConfig] = None,
+) -> List[OperationProfile]:
+    """Aggregate ``records`` per operation, slowest total latency first.
+
+    With ``server`` the totals include read rows/bytes, peak memory, and summed
+    ProfileEvents from :func:`profile_queries`.
+    """
+    if records is None:
+        records = _RECORDER.records() if _RECORDER is not None else []
+    records = list(records)
+    profiles = profile_queries(records, config=config) if server and records else {}
+
+    grouped: Dict[str, List[QueryRecord]] = {}
+    for record in records:
+        grouped.setdefault(record.operation, []).append(record)
+
+    report = []
+    for name, group in grouped.items():
+        latency_ms = np.asarray([record.latency for record in group]) * 1000
+        server_side = [profiles[record.query_id] for record in group if record.query_id in profiles]
+        events: Counter = Counter()
+        for profile in server_side:
+            events.update(profile.profile_events)
+        report.append(
+            OperationProfile(
+                operation=name,
+                queries=len(group),
+                errors=sum(record.error is not None for record in group),
+                latency_p50_ms=float(np.percentile(latency_ms, 50)),
+                latency_p95_ms=float(np.percentile(latency_ms, 95)),
+                latency_total_ms=float(latency_ms.sum()),
+                connection_wait_ms=sum(record.connection_wait for record in group) * 1000,
+                rows_received=sum(record.rows_received for record in group),
+                bytes_received=sum(record.bytes_received for record in group),
+                rows_sent=sum(record.rows_sent for record in group),
+                bytes_sent=sum(record.bytes_sent for record in group),
+                server_read_rows=sum(profile.read_rows for profile in server_side),
+                server_read_bytes=sum(profile.read_bytes for profile in server_side),
+                server_written_rows=sum(profile.written_rows for profile in server_side),
+                peak_memory_usage=max((profile.memory_usage for profile in server_side), default=0),
+                profile_events=dict(events),
+            )
+        )
+    return sorted(report, key=lambda profile: profile.latency_total_ms, reverse=True)
+
+
+def opentelemetry_exporter(tracer: Any = None) -> Exporter:
+    """Emit one span per query, back-dated to the query's start, through OpenTelemetry."""
+    try:
+        from opentelemetry import trace
+        from opentelemetry.trace import Status, StatusCode
+    except ImportError as exc:
+        raise RuntimeError("The OpenTelemetry exporter requires the 'opentelemetry-api' package") from exc
+
+    tracer = tracer or trace.get_tracer("warehouse")
+
+    def export(record: QueryRecord) -> None:
+        start_ns = int(record.started_at * 1e9)
+        span = tracer.start_span(
+            record.operation,
+            kind=trace.SpanKind.CLIENT,
+            start_time=start_ns,
+            attributes={
+                "db.system": "clickhouse",
+                "db.statement": record.query,
+                "db.clickhouse.query_id": record.query_id,
+                "db.clickhouse.connection_wait_ms": record.connection_wait * 1000,
+                "db.clickhouse.rows_received": record.rows_received,
+                "db.clickhouse.bytes_received": record.bytes_received,
+                "db.clickhouse.rows_sent": record.rows_sent,
+                "db.clickhouse.bytes_sent": record.bytes_sent,
+            },
+        )
+        if record.error:
+            span.set_status(Status(StatusCode.ERROR, record.error))
+        span.end(end_time=start_ns + int(record.latency * 1e9))
+
+    return export
+
+
+def prometheus_exporter(registry: Any = None, *, namespace: str = "warehouse") -> Exporter:
+    """Update Prometheus histograms and counters labelled by operation for every query."""
+    try:
+        from prometheus_client import REGISTRY, Counter as PromCounter, Histogram
+    except ImportError as exc:
+        raise RuntimeError("The Prometheus exporter requires the 'prometheus-client' package") from exc
+
+    registry = registry or REGISTRY
+    latency = Histogram(
+        "clickhouse_query_seconds", "Client-side query latency", ["operation"], namespace=namespace, registry=registry
+    )
+    wait = Histogram(
+        "clickhouse_connection_wait_seconds",
+        "Time spent waiting for a pooled connection",
+        ["operation"],
+        namespace=namespace,
+        registry=registry,
+    )
+    errors = PromCounter(
+        "clickhouse_query_errors", "Queries that raised", ["operation"], namespace=namespace, registry=registry
+    )
+    transferred = {
+        name: PromCounter(f"clickhouse_{name}", help_text, ["operation"], namespace=namespace, registry=registry)
+        for name, help_text in (
+            ("rows_received", "Result rows received"),
+            ("bytes_received", "Result bytes received"),
+            ("rows_sent", "Rows inserted"),
+            ("bytes_sent", "Bytes inserted"),
+        )
+    }
+
+    def export(record: QueryRecord) -> None:
+        latency.labels(record.operation).observe(record.latency)
+        wait.labels(record.operation).observe(record.connection_wait)
+        if record.error:
+            errors.labels(record.operation).inc()
+        for name, counter in transferred.items():
+            counter.labels(record.operation).inc(getattr(record, name))
+
+    return export
@@ -0,0 +1,204 @@
+from __future__ import annotations
+
+import hashlib
+import re
+import threading
+import time
+from collections import OrderedDict
+from dataclasses import dataclass, replace
+from typing import Any, Callable, Dict, Iterable, Optional, Sequence, Tuple, TypeVar
+
+from .config import AppConfig, load_config
+
+T = TypeVar("T")
+
+DEFAULT_MAX_ENTRIES = 1024
+DEFAULT_TTL = 60.0
+
+# Whitespace outside string literals carries no meaning, so it is collapsed before hashing.
+_SQL_TOKENS = re.compile(r"'(?:[^'\\]|\\.)*'|\s+")
+
+
+@dataclass(frozen=True)
+class QueryCacheStats:
+    hits: int = 0
+    misses: int = 0
+    evictions: int = 0
+    expirations: int = 0
+    invalidations: int = 0
+    entries: int = 0
+
+    @property
+    def hit_ratio(self) -> float:
+        lookups = self.hits + self.misses
+        return self.hits / lookups if lookups else 0.0
+
+
+def normalize_sql(query: str) -> str:
+    return _SQL_TOKENS.sub(lambda match: match.group(0) if match.group(0).startswith("'") else " ", query).strip()
+
+
+def cache_key(query: str, params: Optional[dict[str, Any]] = None, *extra: Any) -> str:
+    digest = hashlib.blake2b(digest_size=16)
+    digest.update(normalize_sql(query).encode("utf-8"))
+    digest.update(repr(sorted((params or {}).items())).encode("utf-8"))
+    digest.update(repr(extra).encode("utf-8"))
+    return digest.hexdigest()
+
+
+def server_identity(config: AppConfig) -> Tuple[str, int, str, str]:
+    """The server, database and user a query runs as; part of every cache key."""
+    settings = config.clickhouse
+    return settings.host, settings.native_port, settings.database, settings.user
+
+
+def scoped_tables(tables: Iterable[str], config: AppConfig) -> Tuple[str, ...]:
+    """Qualify bare table names with the configured database, so invalidations stay within it."""
+    database = config.clickhouse.database
+    return tuple(table if "." in table else f"{database}.{table}" for table in tables)
+
+
+class QueryCache:
+    """In-process LRU cache of query results with a per-entry TTL.
+
+    Entries remember the (database-qualified) tables they read. :meth:`invalidate` drops every
+    entry for a table and bumps its generation, so a result computed while a
+    write was in flight is never stored. Cached results are shared between
+    callers and must be treated as read-only.
+    """
+
+    def __init__(
+        self, *, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL, server_side: bool = False
+    ) -> None:
+        self.max_entries = max_entries
+        self.ttl = ttl
+        self.server_side = server_side
+        self._entries: "OrderedDict[str, Tuple[float, Tuple[str, ...], Any]]" = OrderedDict()
+        self._generations: Dict[str, int] = {}
+        self._lock = threading.Lock()
+        self._stats = QueryCacheStats()
+
+    def _bump(self, **deltas: int) -> None:
+        self._stats = replace(
+            self._stats, **{name: getattr(self._stats, name) + delta for name, delta in deltas.items()}
+        )
+
+    def server_settings(self) -> dict[str, Any]:
+        """Settings that let ClickHouse's own query cache serve the same query for other processes."""
+        if not self.server_side:
+            return {}
+        return {"use_query_cache": 1, "query_cache_ttl": max(int(self.ttl), 1)}
+
+    def generation(self, tables: Iterable[str]) -> Tuple[int, ...]:
+        with self._lock:
+            return tuple(self._generations.get(table, 0) for table in tables)
+
+    def lookup(self, key: str) -> Tuple[bool, Any]:
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                self._bump(misses=1)
+                return False, None
+            expires, _, value = entry
+            if expires < time.monotonic():
+                del self._entries[key]
+                self._bump(misses=1, expirations=1)
+                return False, None
+            self._entries.move_to_end(key)
+            self._bump(hits=1)
+            return True, value
+
+    def store(self, key: str, value: Any, tables: Sequence[str], generation: Tuple[int, ...]) -> None:
+        with self._lock:
+            if tuple(self._generations.get(table, 0) for table in tables) != generation:
+                return
+            self._entries[key] = (time.monotonic() + self.ttl, tuple(tables), value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_entries:
+                self._entries.popitem(last=False)
+                self._bump(evictions=1)
+
+    def invalidate(self, *tables: str) -> int:
+        with self._lock:
+            for table in tables:
+                self._generations[table] = self._generations.get(table, 0) + 1
+            stale = [key for key, (_, read, _) in self._entries.items() if set(read) & set(tables)]
+            for key in stale:
+                del self._entries[key]
+            self._bump(invalidations=len(stale))
+            return len(stale)
+
+    def clear(self) -> None:
+        with self._lock:
+            self._entries.clear()
+
+    def stats(self) -> QueryCacheStats:
+        with self._lock:
+            return replace(self._stats, entries=len(self._entries))
+
+
+_CACHE: Optional[QueryCache] = None
+
+
+def enable_query_cache(
+    *, max_entries: int = DEFAULT_MAX_ENTRIES, ttl: float = DEFAULT_TTL, server_side: bool = False
+) -> QueryCache:
+    """Turn on result caching for the cached read helpers and return the cache.
+
+    With ``server_side`` the queries also set ``use_query_cache`` with
+    ``query_cache_ttl`` equal to ``ttl``. ClickHouse does not invalidate its
+    own cache on inserts, and :func:`invalidate` leaves it alone (dropping it
+    is server-wide and needs the ``SYSTEM DROP QUERY CACHE`` privilege), so
+    server-cached results may lag a write by up to ``ttl`` seconds.
+    """
+    global _CACHE
+    _CACHE = QueryCache(max_entries=max_entries, ttl=ttl, server_side=server_side)
+    return _CACHE
+
+
+def disable_query_cache() -> None:
+    global _CACHE
+    _CACHE = None
+
+
+def get_query_cache() -> Optional[QueryCache]:
+    return _CACHE
+
+
+def query_cache_stats() -> QueryCacheStats:
+    return _CACHE.stats() if _CACHE is not None else QueryCacheStats()
+
+
+def cached(
+    key: str,
+    tables: Sequence[str],
+    compute: Callable[[dict[str, Any]], T],
+) -> T:
+    """Return the cached result for ``key`` or store ``compute(extra_settings)``.
+
+    ``compute`` receives the extra query settings to apply (the server-side
+    cache settings, or an empty dict). Without an enabled cache this is a
+    plain call.
+    """
+    cache = _CACHE
+    if cache is None:
+        return compute({})
+    found, value = cache.lookup(key)
+    if found:
+        return value
+    generation = cache.generation(tables)
+    value = compute(cache.server_settings())
+    cache.store(key, value, tables, generation)
+    return value
+
+
+def invalidate(*tables: str, config: Optional[AppConfig] = None) -> None:
+    """Drop cached results that read any of ``tables`` in ``config``'s database.
+
+    Called by the loaders after they write. Only the in-process cache is
+    touched; ClickHouse's own query cache entries expire with their TTL.
+    """
+    cache = _CACHE
+    if cache is None:
+        return
+    cache.invalidate(*scoped_tables(tables, config or load_config()))
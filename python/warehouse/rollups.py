@@ -0,0 +1,278 @@
+from __future__ import annotations
+
+from dataclasses import dataclass
+from datetime import date
+from typing import Any, Dict, Iterable, List, Optional, Sequence, Tuple
+
+from .clickhouse import client_session, fetch
+from .config import AppConfig, load_config
+from .crud_tabular import TABULAR_TABLE
+from .instrumentation import instrumented
+from .query_cache import invalidate
+
+CUSTOMER_PROJECTION = "events_by_customer"
+
+# name -> (expression over the raw events table, column type in a rollup)
+DIMENSIONS: Dict[str, Tuple[str, str]] = {
+    "event_date": ("toDate(event_time)", "Date"),
+    "event_type": ("event_type", "LowCardinality(String)"),
+    "customer_id": ("customer_id", "UInt32"),
+}
+
+# name -> (raw aggregate, state aggregate, state column type, merge aggregate)
+MEASURES: Dict[str, Tuple[str, str, str, str]] = {
+    "events": ("count()", "countState()", "AggregateFunction(count)", "countMerge({name})"),
+    "revenue": ("sum(amount)", "sumState(amount)", "AggregateFunction(sum, Decimal(10, 2))", "sumMerge({name})"),
+    "customers": (
+        "uniq(customer_id)",
+        "uniqState(customer_id)",
+        "AggregateFunction(uniq, UInt32)",
+        "uniqMerge({name})",
+    ),
+}
+
+
+@dataclass(frozen=True)
+class Rollup:
+    """An AggregatingMergeTree table fed from ``events`` by a materialized view."""
+
+    name: str
+    dimensions: Tuple[str, ...]
+    measures: Tuple[str, ...]
+    partition_by: Optional[str] = None
+
+    @property
+    def view(self) -> str:
+        return f"{self.name}_mv"
+
+    def covers(self, dimensions: Iterable[str], measures: Iterable[str]) -> bool:
+        return set(dimensions) <= set(self.dimensions) and set(measures) <= set(self.measures)
+
+
+ROLLUPS = {
+    rollup.name: rollup
+    for rollup in (
+        Rollup(
+            "events_daily_revenue",
+            ("event_date",),
+            ("events", "revenue", "customers"),
+            partition_by="toYYYYMM(event_date)",
+        ),
+        Rollup(
+            "events_daily_type_counts",
+            ("event_date", "event_type"),
+            ("events", "revenue"),
+            partition_by="toYYYYMM(event_date)",
+        ),
+        Rollup("events_customer_totals", ("customer_id",), ("events", "revenue")),
+    )
+}
+
+
+def _dimension_column(name: str) -> str:
+    expression = DIMENSIONS[name][0]
+    return name if expression == name else f"{expression} AS {name}"
+
+
+def _state_select_sql(rollup: Rollup) -> str:
+    columns = [_dimension_column(name) for name in rollup.dimensions]
+    columns += [f"{MEASURES[name][1]} AS {name}" for name in rollup.measures]
+    return f"""
+    SELECT {", ".join(columns)}
+    FROM {TABULAR_TABLE}
+    {{where}}
+    GROUP BY {", ".join(rollup.dimensions)}
+    """
+
+
+def _create_rollup_sql(rollup: Rollup) -> str:
+    columns = [f"{name} {DIMENSIONS[name][1]}" for name in rollup.dimensions]
+    columns += [f"{name} {MEASURES[name][2]}" for name in rollup.measures]
+    partition = f"PARTITION BY {rollup.partition_by}" if rollup.partition_by else ""
+    return f"""
+    CREATE TABLE IF NOT EXISTS {rollup.name} (
+        {", ".join(columns)}
+    ) ENGINE = AggregatingMergeTree
+    {partition}
+    ORDER BY ({", ".join(rollup.dimensions)})
+    """
+
+
+def _create_view_sql(rollup: Rollup) -> str:
+    return f"CREATE MATERIALIZED VIEW IF NOT EXISTS {rollup.view} TO {rollup.name} AS " + _state_select_sql(
+        rollup
+    ).format(where="")
+
+
+@instrumented
+def ensure_rollups(*, config: Optional[AppConfig] = None) -> None:
+    """Create the rollup tables, their materialized views, and the customer projection.
+
+    Views only see rows inserted after they exist; run :func:`backfill_rollups`
+    to cover data that was already in ``events``.
+    """
+    cfg = config or load_config()
+    with client_session(cfg) as client:
+        for rollup in ROLLUPS.values():
+            client.execute(_create_rollup_sql(rollup))
+            client.execute(_create_view_sql(rollup))
+        # A second copy of the rows sorted by customer_id serves customer lookups
+        # without scanning the (event_time, event_id) primary order.
+        client.execute(
+            f"ALTER TABLE {TABULAR_TABLE} ADD PROJECTION IF NOT EXISTS {CUSTOMER_PROJECTION} "
+            "(SELECT * ORDER BY customer_id)"
+        )
+
+
+@instrumented
+def truncate_rollups(*, config: Optional[AppConfig] = None) -> None:
+    cfg = config or load_config()
+    with client_session(cfg) as client:
+        for rollup in ROLLUPS.values():
+            client.execute(f"TRUNCATE TABLE IF EXISTS {rollup.name}")
+    invalidate(*ROLLUPS, config=cfg)
+
+
+@instrumented
+def backfill_rollups(
+    names: Optional[Sequence[str]] = None,
+    *,
+    projections: bool = True,
+    config: Optional[AppConfig] = None,
+) -> Dict[str, int]:
+    """Rebuild rollups from the rows already in ``events``, one monthly partition at a time.
+
+    Each selected rollup is truncated and refilled, so the command can be
+    re-run; loads running at the same time may be counted twice. With
+    ``projections`` the customer projection is materialized for existing parts.
+    Returns the number of rollup rows written per rollup.
+    """
+    cfg = config or load_config()
+    selected = [ROLLUPS[name] for name in names] if names else list(ROLLUPS.values())
+    written: Dict[str, int] = {}
+    with client_session(cfg) as client:
+        partitions = [
+            row[0]
+            for row in client.execute(
+                "SELECT DISTINCT partition_id FROM system.parts "
+                "WHERE active AND database = currentDatabase() AND table = %(table)s ORDER BY partition_id",
+                {"table": TABULAR_TABLE},
+            )
+        ]
+        for rollup in selected:
+            client.execute(f"TRUNCATE TABLE IF EXISTS {rollup.name}")
+            insert_sql = f"INSERT INTO {rollup.name} " + _state_select_sql(rollup).format(
+                where="WHERE _partition_id = %(partition)s"
+            )
+            written[rollup.name] = 0
+            for partition in partitions:
+                client.execute(insert_sql, {"partition": partition})
+                written[rollup.name] += client.last_query.progress.written_rows
+        if projections:
+            client.execute(
+                f"ALTER TABLE {TABULAR_TABLE} MATERIALIZE PROJECTION {CUSTOMER_PROJECTION}",
+                settings={"mutations_sync": 1},
+            )
+    invalidate(*(rollup.name for rollup in selected), config=cfg)
+    return written
+
+
+def _rollup_sizes(client, rollups: Sequence[Rollup]) -> Dict[str, int]:
+    rows = client.execute(
+        "SELECT table, sum(rows) FROM system.parts "
+        "WHERE active AND database = currentDatabase() AND table IN %(tables)s GROUP BY table",
+        {"tables": tuple(rollup.name for rollup in rollups)},
+    )
+    return {table: int(count) for table, count in rows}
+
+
+@instrumented
+def choose_rollup(
+    measures: Sequence[str], dimensions: Sequence[str], *, config: Optional[AppConfig] = None
+) -> Optional[Rollup]:
+    """Return the smallest rollup that has ``measures`` at the grain of ``dimensions``.
+
+    ``None`` means no rollup covers the request and the raw table must be used.
+    """
+    unknown = (set(measures) - MEASURES.keys()) | (set(dimensions) - DIMENSIONS.keys())
+    if unknown:
+        raise ValueError(f"Unknown measures or dimensions: {sorted(unknown)}")
+    candidates = [rollup for rollup in ROLLUPS.values() if rollup.covers(dimensions, measures)]
+    if len(candidates) <= 1:
+        return candidates[0] if candidates else None
+
+    cfg = config or load_config()
+    with client_session(cfg) as client:
+        sizes = _rollup_sizes(client, candidates)
+    return min(candidates, key=lambda rollup: sizes.get(rollup.name, 0))
+
+
+@instrumented
+def aggregate_events(
+    measures: Sequence[str] = ("events", "revenue"),
+    *,
+    group_by: Sequence[str] = (),
+    start_date: Optional[date] = None,
+    end_date: Optional[date] = None,
+    event_types: Optional[Sequence[str]] = None,
+    customer_ids: Optional[Sequence[int]] = None,
+    config: Optional[AppConfig] = None,
+) -> List[tuple]:
+    """Aggregate ``events`` through the cheapest rollup that can answer the request.
+
+    Rows hold the ``group_by`` columns followed by ``measures``. Date bounds are
+    inclusive. Filters count as dimensions when choosing a rollup, and requests
+    no rollup covers fall back to aggregating the raw table.
+    """
+    cfg = config or load_config()
+    filters: List[Tuple[str, str]] = []
+    params: Dict[str, Any] = {}
+    if start_date is not None:
+        filters.append(("event_date", "{column} >= %(start_date)s"))
+        params["start_date"] = start_date
+    if end_date is not None:
+        filters.append(("event_date", "{column} <= %(end_date)s"))
+        params["end_date"] = end_date
+    if event_types:
+        filters.append(("event_type", "{column} IN %(event_types)s"))
+        params["event_types"] = tuple(event_types)
+    if customer_ids:
+        filters.append(("customer_id", "{column} IN %(customer_ids)s"))
+        params["customer_ids"] = tuple(int(customer_id) for customer_id in customer_ids)
+
+    needed = list(dict.fromkeys([*group_by, *(dimension for dimension, _ in filters)]))
+    rollup = choose_rollup(measures, needed, config=cfg)
+
+    if rollup is None:
+        source = TABULAR_TABLE
+        dims = {name: DIMENSIONS[name][0] for name in needed}
+        aggregates = [f"{MEASURES[name][0]} AS {name}" for name in measures]
+    else:
+        source = rollup.name
+        dims = {name: name for name in needed}
+        aggregates = [f"{MEASURES[name][3].format(name=name)} AS {name}" for name in measures]
+
+    select = [name if dims[name] == name else f"{dims[name]} AS {name}" for name in group_by] + aggregates
+    where = " AND ".join(template.format(column=dims[dimension]) for dimension, template in filters)
+    query = f"SELECT {', '.join(select)} FROM {source}"
+    if where:
+        query += f" WHERE {where}"
+    if group_by:
+        query += f" GROUP BY {', '.join(group_by)} ORDER BY {', '.join(group_by)}"
+
+    # Rollups are written through materialized views on events, so both invalidate the result.
+    return fetch(query, params, cache_tables=(TABULAR_TABLE, *ROLLUPS), config=cfg)
+
+
+@instrumented
+def fetch_customer_events(
+    customer_id: int, *, limit: int = 100, config: Optional[AppConfig] = None
+) -> List[tuple]:
+    """Return a customer's most recent events; the read is served by the customer projection."""
+    return fetch(
+        f"SELECT event_id, event_time, customer_id, event_type, amount FROM {TABULAR_TABLE} "
+        "WHERE customer_id = %(customer_id)s ORDER BY event_time DESC LIMIT %(limit)s",
+        {"customer_id": int(customer_id), "limit": limit},
+        cache_tables=(TABULAR_TABLE,),
+        config=config,
+    )
@@ -1,7 +1,12 @@
 from __future__ import annotations
 
+import base64
+import hashlib
+import zlib
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from dataclasses import dataclass
 from pathlib import Path
-from typing import Optional
+from typing import BinaryIO, Iterable, Iterator, Optional, Union
 
 import boto3
 from botocore.client import BaseClient
@@ -9,6 +14,24 @@ from botocore.exceptions import ClientError
 
 from .config import AppConfig, load_config
 
+# S3 rejects non-final multipart parts smaller than 5 MiB.
+MIN_PART_SIZE = 5 * 1024 * 1024
+DEFAULT_PART_SIZE = 16 * 1024 * 1024
+DEFAULT_UPLOAD_CONCURRENCY = 4
+READ_SIZE = 1024 * 1024
+COMPRESSION_SUFFIXES = {"gzip": ".gz", "zstd": ".zst"}
+
+UploadSource = Union[Path, BinaryIO, Iterable[bytes]]
+
+
+@dataclass(frozen=True)
+class UploadResult:
+    key: str
+    etag: str
+    parts: int
+    bytes_read: int
+    bytes_uploaded: int
+
 
 def build_s3_client(config: Optional[AppConfig] = None) -> BaseClient:
     cfg = config or load_config()
@@ -60,3 +83,167 @@ def list_objects(prefix: str = "", *, client: Optional[BaseClient] = None, confi
                 items.append(key)
 
     return items
+
+
+def _iter_source(source: UploadSource) -> Iterator[bytes]:
+    if isinstance(source, Path):
+        if not source.exists():
+            raise FileNotFoundError(f"Local file not found: {source}")
+        with source.open("rb") as fh:
+            yield from iter(lambda: fh.read(READ_SIZE), b"")
+    elif hasattr(source, "read"):
+        yield from iter(lambda: source.read(READ_SIZE), b"")
+    else:
+        for chunk in source:
+            if chunk:
+                yield bytes(chunk)
+
+
+def _compress(chunks: Iterable[bytes], compression: Optional[str]) -> Iterator[bytes]:
+    if compression is None:
+        yield from chunks
+        return
+
+    if compression == "gzip":
+        # wbits=31 writes a gzip container rather than a raw zlib stream.
+        compressor = zlib.compressobj(6, zlib.DEFLATED, 31)
+        finish = compressor.flush
+    elif compression == "zstd":
+        try:
+            import zstandard
+        except ImportError as exc:
+            raise RuntimeError("zstd compression requires the 'zstandard' package") from exc
+        compressor = zstandard.ZstdCompressor().compressobj()
+        finish = compressor.flush
+    else:
+        raise ValueError(f"Unsupported compression '{compression}'. Expected one of {sorted(COMPRESSION_SUFFIXES)}.")
+
+    for chunk in chunks:
+        out = compressor.compress(chunk)
+        if out:
+            yield out
+    tail = finish()
+    if tail:
+        yield tail
+
+
+def _iter_parts(chunks: Iterable[bytes], part_size: int) -> Iterator[bytes]:
+    buffer = bytearray()
+    for chunk in chunks:
+        buffer.extend(chunk)
+        while len(buffer) >= part_size:
+            yield bytes(buffer[:part_size])
+            del buffer[:part_size]
+    if buffer:
+        yield bytes(buffer)
+
+
+def _strip_etag(etag: str) -> str:
+    return etag.strip('"')
+
+
+def _upload_part(s3: BaseClient, bucket: str, key: str, upload_id: str, number: int, data: bytes) -> tuple[int, bytes, str]:
+    digest = hashlib.md5(data).digest()
+    response = s3.upload_part(
+        Bucket=bucket,
+        Key=key,
+        UploadId=upload_id,
+        PartNumber=number,
+        Body=data,
+        ContentMD5=base64.b64encode(digest).decode("ascii"),
+    )
+    etag = _strip_etag(response["ETag"])
+    if etag != digest.hex():
+        raise IOError(f"ETag mismatch for part {number} of s3://{bucket}/{key}: expected {digest.hex()}, got {etag}")
+    return number, digest, etag
+
+
+def _chain_parts(first: bytes, second: bytes, rest: Iterator[bytes]) -> Iterator[bytes]:
+    yield first
+    yield second
+    yield from rest
+
+
+def stream_upload(
+    source: UploadSource,
+    key: str,
+    *,
+    part_size: int = DEFAULT_PART_SIZE,
+    concurrency: int = DEFAULT_UPLOAD_CONCURRENCY,
+    compression: Optional[str] = None,
+    client: Optional[BaseClient] = None,
+    config: Optional[AppConfig] = None,
+) -> UploadResult:
+    """Stream a file, file object, or iterator of bytes to S3 without staging it on disk.
+
+    Parts are uploaded concurrently with at most ``concurrency`` parts in memory,
+    and every part's MD5 is checked against the returned ETag; the final
+    multipart ETag is verified as well.
+    """
+    if part_size < MIN_PART_SIZE:
+        raise ValueError(f"part_size must be at least {MIN_PART_SIZE} bytes")
+
+    cfg = config or load_config()
+    s3 = client or build_s3_client(cfg)
+    bucket = cfg.s3.bucket
+
+    bytes_read = 0
+
+    def counted(chunks: Iterable[bytes]) -> Iterator[bytes]:
+        nonlocal bytes_read
+        for chunk in chunks:
+            bytes_read += len(chunk)
+            yield chunk
+
+    parts = _iter_parts(_compress(counted(_iter_source(source)), compression), part_size)
+    first = next(parts, b"")
+    second = next(parts, None)
+
+    if second is None:
+        # Small payloads skip the multipart protocol entirely.
+        digest = hashlib.md5(first).digest()
+        response = s3.put_object(
+            Bucket=bucket, Key=key, Body=first, ContentMD5=base64.b64encode(digest).decode("ascii")
+        )
+        etag = _strip_etag(response["ETag"])
+        if etag != digest.hex():
+            raise IOError(f"ETag mismatch for s3://{bucket}/{key}: expected {digest.hex()}, got {etag}")
+        return UploadResult(key=key, etag=etag, parts=1, bytes_read=bytes_read, bytes_uploaded=len(first))
+
+    upload_id = s3.create_multipart_upload(Bucket=bucket, Key=key)["UploadId"]
+    completed: dict[int, tuple[bytes, str]] = {}
+    bytes_uploaded = 0
+
+    def collect(done: Iterable[Future]) -> None:
+        for future in done:
+            number, digest, etag = future.result()
+            completed[number] = (digest, etag)
+
+    try:
+        with ThreadPoolExecutor(max_workers=concurrency) as executor:
+            pending: set[Future] = set()
+            for number, data in enumerate(_chain_parts(first, second, parts), start=1):
+                if len(pending) >= concurrency:
+                    done, pending = wait(pending, return_when=FIRST_COMPLETED)
+                    collect(done)
+                bytes_uploaded += len(data)
+                pending.add(executor.submit(_upload_part, s3, bucket, key, upload_id, number, data))
+            collect(wait(pending).done)
+
+        ordered = sorted(completed.items())
+        response = s3.complete_multipart_upload(
+            Bucket=bucket,
+            Key=key,
+            UploadId=upload_id,
+            MultipartUpload={"Parts": [{"PartNumber": number, "ETag": f'"{etag}"'} for number, (_, etag) in ordered]},
+        )
+    except BaseException:
+        s3.abort_multipart_upload(Bucket=bucket, Key=key, UploadId=upload_id)
+        raise
+
+    expected = hashlib.md5(b"".join(digest for _, (digest, _) in ordered)).hexdigest() + f"-{len(ordered)}"
+    etag = _strip_etag(response["ETag"])
+    if etag != expected:
+        raise IOError(f"Multipart ETag mismatch for s3://{bucket}/{key}: expected {expected}, got {etag}")
+
+    return UploadResult(key=key, etag=etag, parts=len(ordered), bytes_read=bytes_read, bytes_uploaded=bytes_uploaded)
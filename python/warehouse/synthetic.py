@@ -0,0 +1,285 @@
+from __future__ import annotations
+
+from datetime import datetime, timezone
+from pathlib import Path
+from typing import Iterator, Optional, Sequence
+
+import numpy as np
+import pandas as pd
+
+from .datasets import DEFAULT_CHUNK_ROWS, VectorDataset, _metadata_path, vector_dataset_path, write_vector_metadata
+
+DEFAULT_SEED = 7
+DEFAULT_START = datetime(2025, 1, 1, tzinfo=timezone.utc)
+DEFAULT_DAYS = 365
+DEFAULT_CUSTOMERS = 1_000_000
+DEFAULT_CUSTOMER_SKEW = 1.1
+DEFAULT_CLUSTERS = 64
+DEFAULT_CLUSTER_SPREAD = 0.35
+# Decimal(10, 2) tops out just below 10^8.
+_MAX_AMOUNT = 99_999_999.99
+
+# Browsing dominates; purchases are a minority and refunds rarer still.
+EVENT_TYPES = ("view", "add_to_cart", "purchase", "refund")
+EVENT_TYPE_WEIGHTS = (0.62, 0.2, 0.15, 0.03)
+VECTOR_CATEGORIES = ("electronics", "apparel", "home", "books", "beauty", "sports", "toys", "grocery")
+
+
+def _chunk_rng(seed: int, chunk_index: int) -> np.random.Generator:
+    # Seeding per chunk keeps the output independent of how many chunks were consumed before.
+    return np.random.default_rng(np.random.SeedSequence([seed, chunk_index]))
+
+
+def _zipf_cdf(count: int, exponent: float) -> np.ndarray:
+    weights = 1.0 / np.arange(1, count + 1, dtype=np.float64) ** exponent
+    cdf = np.cumsum(weights)
+    return cdf / cdf[-1]
+
+
+def _sample(cdf: np.ndarray, rng: np.random.Generator, size: int) -> np.ndarray:
+    # Inverse-CDF sampling over a precomputed table is one searchsorted call per chunk.
+    return np.minimum(np.searchsorted(cdf, rng.random(size), side="right"), len(cdf) - 1)
+
+
+def iter_synthetic_events(
+    rows: int,
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    seed: int = DEFAULT_SEED,
+    start: datetime = DEFAULT_START,
+    days: int = DEFAULT_DAYS,
+    customers: int = DEFAULT_CUSTOMERS,
+    customer_skew: float = DEFAULT_CUSTOMER_SKEW,
+) -> Iterator[pd.DataFrame]:
+    """Yield ``rows`` synthetic events in chunks shaped like ``iter_tabular_events`` output.
+
+    ``customer_id`` follows a Zipf distribution with exponent ``customer_skew``
+    over ``customers`` ids, so a few customers account for most events. Event
+    types follow ``EVENT_TYPE_WEIGHTS`` and amounts depend on the type. Events
+    are spread over ``days`` from ``start`` in ``(event_time, event_id)`` order,
+    so every chunk is newer than the last and incremental loads see a growing
+    stream. The output is a pure function of the arguments.
+    """
+    if rows < 0 or chunk_rows < 1:
+        raise ValueError("rows must be non-negative and chunk_rows positive")
+
+    setup = np.random.default_rng(np.random.SeedSequence([seed]))
+    customer_cdf = _zipf_cdf(customers, customer_skew)
+    # Popularity rank -> id is shuffled so the busiest customers are not simply the lowest ids.
+    customer_ids = (100 + setup.permutation(customers)).astype(np.uint32)
+    type_cdf = np.cumsum(EVENT_TYPE_WEIGHTS) / sum(EVENT_TYPE_WEIGHTS)
+    event_types = pd.Categorical.from_codes(np.arange(len(EVENT_TYPES)), categories=EVENT_TYPES)
+
+    start_s = np.datetime64(pd.Timestamp(start).tz_convert("UTC").tz_localize(None), "s")
+    seconds_per_row = days * 86_400 / max(rows, 1)
+
+    for chunk_index, offset in enumerate(range(0, rows, chunk_rows)):
+        size = min(chunk_rows, rows - offset)
+        rng = _chunk_rng(seed, chunk_index)
+
+        positions = offset + np.sort(rng.random(size)) * size
+        event_time = start_s + (positions * seconds_per_row).astype("timedelta64[s]")
+        types = _sample(type_cdf, rng, size)
+
+        # Purchases are log-normal around ~$55; refunds return a smaller share; views and carts carry no money.
+        amount = np.zeros(size, dtype=np.float64)
+        purchases = types == EVENT_TYPES.index("purchase")
+        refunds = types == EVENT_TYPES.index("refund")
+        amount[purchases] = rng.lognormal(4.0, 1.0, int(purchases.sum()))
+        amount[refunds] = -rng.lognormal(3.5, 1.0, int(refunds.sum()))
+        amount = np.round(np.clip(amount, -_MAX_AMOUNT, _MAX_AMOUNT), 2)
+
+        yield pd.DataFrame(
+            {
+                "event_id": np.arange(offset + 1, offset + size + 1, dtype=np.uint32),
+                "event_time": pd.to_datetime(event_time, utc=True),
+                "customer_id": customer_ids[_sample(customer_cdf, rng, size)],
+                "event_type": event_types.take(types),
+                "amount": amount,
+            }
+        )
+
+
+def synthetic_events(rows: int, **kwargs) -> pd.DataFrame:
+    return pd.concat(iter_synthetic_events(rows, **kwargs), ignore_index=True)
+
+
+def _events_parquet_table(chunk: pd.DataFrame):
+    import pyarrow as pa
+
+    return pa.Table.from_arrays(
+        [
+            pa.array(chunk["event_id"].to_numpy(dtype=np.uint32)),
+            pa.array(chunk["event_time"]).cast(pa.timestamp("s", tz="UTC")),
+            pa.array(chunk["customer_id"].to_numpy(dtype=np.uint32)),
+            pa.DictionaryArray.from_arrays(
+                pa.array(chunk["event_type"].cat.codes.to_numpy(dtype=np.int8)),
+                pa.array(chunk["event_type"].cat.categories.astype(str)),
+            ),
+            pa.array(chunk["amount"].to_numpy(dtype=np.float64)),
+        ],
+        names=["event_id", "event_time", "customer_id", "event_type", "amount"],
+    )
+
+
+def write_events(
+    chunks: Iterator[pd.DataFrame], path: Path, *, overwrite: bool = False, compression: str = "zstd"
+) -> int:
+    """Write event chunks to ``path`` as CSV or Parquet (by suffix) and return the row count.
+
+    Only one chunk is in memory at a time. CSV output uses the layout of the
+    bundled ``tabular_events.csv``; Parquet output writes one row group per chunk.
+    """
+    if path.exists() and not overwrite:
+        raise FileExistsError(f"Target file {path} already exists. Use --overwrite to regenerate.")
+    if path.suffix not in (".csv", ".parquet"):
+        raise ValueError(f"Unsupported events file '{path.name}'. Expected a .csv or .parquet suffix.")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    written = 0
+    if path.suffix == ".csv":
+        with path.open("w", encoding="utf-8", newline="") as fh:
+            for chunk in chunks:
+                chunk.to_csv(
+                    fh,
+                    index=False,
+                    header=written == 0,
+                    date_format="%Y-%m-%dT%H:%M:%SZ",
+                    float_format="%.2f",
+                )
+                written += len(chunk)
+        return written
+
+    try:
+        import pyarrow.parquet as pq
+    except ImportError as exc:
+        raise RuntimeError("Parquet output requires the 'pyarrow' package") from exc
+
+    writer = None
+    try:
+        for chunk in chunks:
+            table = _events_parquet_table(chunk)
+            if writer is None:
+                writer = pq.ParquetWriter(path, table.schema, compression=compression)
+            writer.write_table(table)
+            written += len(chunk)
+    finally:
+        if writer is not None:
+            writer.close()
+    return written
+
+
+class GaussianMixture:
+    """Unit-norm cluster centres with Zipf-weighted sizes, the geometry of real embedding catalogs.
+
+    Points are ``centre + noise`` with noise of expected norm ``spread``, then
+    re-normalized, so cosine similarity to the own centre is about
+    ``1 / sqrt(1 + spread**2)`` whatever the dimension.
+    """
+
+    def __init__(
+        self,
+        dimension: int,
+        *,
+        clusters: int = DEFAULT_CLUSTERS,
+        spread: float = DEFAULT_CLUSTER_SPREAD,
+        seed: int = DEFAULT_SEED,
+    ) -> None:
+        rng = np.random.default_rng(np.random.SeedSequence([seed]))
+        centres = rng.standard_normal((clusters, dimension), dtype=np.float32)
+        self.centres = centres / np.linalg.norm(centres, axis=1, keepdims=True)
+        self.cluster_cdf = _zipf_cdf(clusters, 0.8)
+        self.dimension = dimension
+        self.spread = spread
+        self.seed = seed
+
+    def sample(self, size: int, chunk_index: int) -> tuple[np.ndarray, np.ndarray]:
+        """Return ``(labels, vectors)`` for one chunk; ``vectors`` is a unit-norm float32 matrix."""
+        rng = _chunk_rng(self.seed, chunk_index)
+        labels = _sample(self.cluster_cdf, rng, size)
+        vectors = rng.standard_normal((size, self.dimension), dtype=np.float32)
+        vectors *= np.float32(self.spread / np.sqrt(self.dimension))
+        vectors += self.centres[labels]
+        vectors /= np.linalg.norm(vectors, axis=1, keepdims=True)
+        return labels, vectors
+
+
+def _categories(labels: np.ndarray, categories: Sequence[str]) -> np.ndarray:
+    return np.asarray(categories, dtype=str)[labels % len(categories)]
+
+
+def iter_synthetic_vectors(
+    rows: int,
+    dimension: int,
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    clusters: int = DEFAULT_CLUSTERS,
+    spread: float = DEFAULT_CLUSTER_SPREAD,
+    seed: int = DEFAULT_SEED,
+    categories: Sequence[str] = VECTOR_CATEGORIES,
+    model: Optional[str] = None,
+) -> Iterator[VectorDataset]:
+    """Yield ``rows`` clustered unit vectors as ``VectorDataset`` chunks with ids starting at 1.
+
+    Each cluster maps to one of ``categories``, so category filters select
+    real neighbourhoods. No embedding model is loaded.
+    """
+    mixture = GaussianMixture(dimension, clusters=clusters, spread=spread, seed=seed)
+    for chunk_index, offset in enumerate(range(0, rows, chunk_rows)):
+        size = min(chunk_rows, rows - offset)
+        labels, vectors = mixture.sample(size, chunk_index)
+        yield VectorDataset(
+            np.arange(offset + 1, offset + size + 1, dtype=np.uint32),
+            _categories(labels, categories),
+            vectors,
+            model=model,
+        )
+
+
+def synthetic_vectors(rows: int, dimension: int, **kwargs) -> VectorDataset:
+    chunks = list(iter_synthetic_vectors(rows, dimension, **kwargs))
+    if not chunks:
+        return VectorDataset(
+            np.empty(0, dtype=np.uint32), np.empty(0, dtype=str), np.empty((0, dimension), dtype=np.float32)
+        )
+    return VectorDataset(
+        np.concatenate([chunk.item_ids for chunk in chunks]),
+        np.concatenate([chunk.categories for chunk in chunks]),
+        np.vstack([chunk.vectors for chunk in chunks]),
+        model=chunks[0].model,
+    )
+
+
+def write_synthetic_vectors(
+    path: Path,
+    rows: int,
+    dimension: int,
+    *,
+    chunk_rows: int = DEFAULT_CHUNK_ROWS,
+    overwrite: bool = False,
+    **kwargs,
+) -> Path:
+    """Write synthetic vectors in the ``.npy`` + ``.meta.npz`` layout ``read_vector_dataset`` loads.
+
+    The matrix is filled chunk by chunk through a memory map, so peak memory
+    is one chunk rather than the whole ``rows x dimension`` matrix. ``.npy`` is
+    appended to ``path`` when missing; the path written is returned.
+    """
+    path = vector_dataset_path(path)
+    if not overwrite and (path.exists() or _metadata_path(path).exists()):
+        raise FileExistsError(f"Target file {path} already exists. Use --overwrite to regenerate.")
+    path.parent.mkdir(parents=True, exist_ok=True)
+
+    matrix = np.lib.format.open_memmap(path, mode="w+", dtype=np.float32, shape=(rows, dimension))
+    categories = np.empty(rows, dtype=f"U{max(map(len, kwargs.get('categories', VECTOR_CATEGORIES)))}")
+    model = kwargs.get("model")
+    offset = 0
+    for chunk in iter_synthetic_vectors(rows, dimension, chunk_rows=chunk_rows, **kwargs):
+        matrix[offset : offset + len(chunk)] = chunk.vectors
+        categories[offset : offset + len(chunk)] = chunk.categories
+        offset += len(chunk)
+    matrix.flush()
+    del matrix
+
+    write_vector_metadata(path, np.arange(1, rows + 1, dtype=np.uint32), categories, model=model)
+    return path